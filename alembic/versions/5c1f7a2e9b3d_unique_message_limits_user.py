@@ -0,0 +1,37 @@
+"""Unique message_limits.user_id
+
+Revision ID: 5c1f7a2e9b3d
+Revises: 83d50d243053
+Create Date: 2026-10-18 10:12:41.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f7a2e9b3d'
+down_revision: Union[str, None] = '83d50d243053'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The old limiter inserted a fresh row every hour; keep only the latest row per user.
+    op.execute(
+        """
+        DELETE FROM awesome_chat.message_limits ml
+        USING awesome_chat.message_limits newer
+        WHERE ml.user_id = newer.user_id
+          AND (ml.reset_time, ml.id) < (newer.reset_time, newer.id)
+        """
+    )
+    op.create_unique_constraint(
+        'message_limits_user_id_key', 'message_limits', ['user_id'], schema='awesome_chat'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('message_limits_user_id_key', 'message_limits', schema='awesome_chat', type_='unique')
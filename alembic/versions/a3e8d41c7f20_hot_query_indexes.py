@@ -0,0 +1,39 @@
+"""Indexes for hot queries
+
+Revision ID: a3e8d41c7f20
+Revises: 5c1f7a2e9b3d
+Create Date: 2026-10-18 11:02:17.530114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e8d41c7f20'
+down_revision: Union[str, None] = '5c1f7a2e9b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # message_limits.user_id is already covered by message_limits_user_id_key.
+    op.create_index(
+        'ix_awesome_chat_user_sessions_session_token', 'user_sessions', ['session_token'], schema='awesome_chat'
+    )
+    op.create_index('ix_awesome_chat_user_sessions_user_id', 'user_sessions', ['user_id'], schema='awesome_chat')
+    op.create_index('ix_awesome_chat_messages_timestamp', 'messages', ['timestamp'], schema='awesome_chat')
+    op.create_index('ix_awesome_chat_messages_user_id', 'messages', ['user_id'], schema='awesome_chat')
+    op.create_index(
+        'ix_awesome_chat_private_messages_recipient_id', 'private_messages', ['recipient_id'], schema='awesome_chat'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_awesome_chat_private_messages_recipient_id', 'private_messages', schema='awesome_chat')
+    op.drop_index('ix_awesome_chat_messages_user_id', 'messages', schema='awesome_chat')
+    op.drop_index('ix_awesome_chat_messages_timestamp', 'messages', schema='awesome_chat')
+    op.drop_index('ix_awesome_chat_user_sessions_user_id', 'user_sessions', schema='awesome_chat')
+    op.drop_index('ix_awesome_chat_user_sessions_session_token', 'user_sessions', schema='awesome_chat')
@@ -0,0 +1,138 @@
+"""Partition messages by month
+
+Revision ID: c7d2f9a41b6e
+Revises: a3e8d41c7f20
+Create Date: 2026-10-18 14:21:09.402771
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2f9a41b6e'
+down_revision: Union[str, None] = 'a3e8d41c7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions created ahead of the current month; after this the server's partition maintenance takes over.
+PREMAKE_MONTHS = 3
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    # A unique key on a partitioned table has to include the partition key, so the primary key becomes
+    # (id, timestamp) and private_messages.id can no longer reference messages.id.
+    op.drop_constraint('private_messages_id_fkey', 'private_messages', schema='awesome_chat', type_='foreignkey')
+    # Keep the id sequence when the old table goes.
+    op.execute("ALTER SEQUENCE awesome_chat.messages_id_seq OWNED BY NONE")
+    op.execute(
+        """
+        CREATE TABLE awesome_chat.messages_partitioned (
+            id integer NOT NULL DEFAULT nextval('awesome_chat.messages_id_seq'),
+            user_id integer REFERENCES awesome_chat.users (id),
+            text varchar,
+            timestamp timestamp NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+
+    bind = op.get_bind()
+    first, current = bind.execute(
+        sa.text(
+            "SELECT date_trunc('month', min(timestamp))::date, date_trunc('month', LOCALTIMESTAMP)::date "
+            "FROM awesome_chat.messages"
+        )
+    ).one()
+    # Also the previous month, for rows written just before a month boundary by a server still on the old clock.
+    month = min(first or current, add_months(current, -1))
+    while month <= add_months(current, PREMAKE_MONTHS):
+        op.execute(
+            f"""
+            CREATE TABLE awesome_chat.messages_p{month.year:04d}_{month.month:02d}
+            PARTITION OF awesome_chat.messages_partitioned
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')
+            """
+        )
+        month = add_months(month, 1)
+
+    op.execute(
+        """
+        INSERT INTO awesome_chat.messages_partitioned (id, user_id, text, timestamp)
+        SELECT id, user_id, text, COALESCE(timestamp, now()) FROM awesome_chat.messages
+        """
+    )
+    op.drop_table('messages', schema='awesome_chat')
+    op.execute("ALTER TABLE awesome_chat.messages_partitioned RENAME TO messages")
+    op.execute("ALTER TABLE awesome_chat.messages RENAME CONSTRAINT messages_partitioned_pkey TO messages_pkey")
+    op.execute(
+        "ALTER TABLE awesome_chat.messages "
+        "RENAME CONSTRAINT messages_partitioned_user_id_fkey TO messages_user_id_fkey"
+    )
+    op.execute("ALTER SEQUENCE awesome_chat.messages_id_seq OWNED BY awesome_chat.messages.id")
+    op.create_index('ix_awesome_chat_messages_timestamp', 'messages', ['timestamp'], schema='awesome_chat')
+    op.create_index('ix_awesome_chat_messages_user_id', 'messages', ['user_id'], schema='awesome_chat')
+
+    # Where the partition maintenance moves partitions past the retention period.
+    op.execute("CREATE SCHEMA IF NOT EXISTS awesome_chat_archive")
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS awesome_chat_archive.private_messages (
+            id integer PRIMARY KEY,
+            recipient_id integer
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    # awesome_chat_archive is left as it is, only the live messages are moved back.
+    op.execute("ALTER SEQUENCE awesome_chat.messages_id_seq OWNED BY NONE")
+    op.execute(
+        """
+        CREATE TABLE awesome_chat.messages_plain (
+            id integer NOT NULL DEFAULT nextval('awesome_chat.messages_id_seq'),
+            user_id integer REFERENCES awesome_chat.users (id),
+            text varchar,
+            timestamp timestamp DEFAULT now(),
+            PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO awesome_chat.messages_plain (id, user_id, text, timestamp)
+        SELECT id, user_id, text, timestamp FROM awesome_chat.messages
+        """
+    )
+    op.execute("DROP TABLE awesome_chat.messages CASCADE")
+    op.execute("ALTER TABLE awesome_chat.messages_plain RENAME TO messages")
+    op.execute("ALTER TABLE awesome_chat.messages RENAME CONSTRAINT messages_plain_pkey TO messages_pkey")
+    op.execute("ALTER TABLE awesome_chat.messages RENAME CONSTRAINT messages_plain_user_id_fkey TO messages_user_id_fkey")
+    op.execute("ALTER SEQUENCE awesome_chat.messages_id_seq OWNED BY awesome_chat.messages.id")
+    op.create_index('ix_awesome_chat_messages_timestamp', 'messages', ['timestamp'], schema='awesome_chat')
+    op.create_index('ix_awesome_chat_messages_user_id', 'messages', ['user_id'], schema='awesome_chat')
+    # Private messages whose partition has been dropped or archived have nothing left to reference.
+    op.execute(
+        """
+        DELETE FROM awesome_chat.private_messages pm
+        WHERE NOT EXISTS (SELECT 1 FROM awesome_chat.messages m WHERE m.id = pm.id)
+        """
+    )
+    op.create_foreign_key(
+        'private_messages_id_fkey',
+        'private_messages',
+        'messages',
+        ['id'],
+        ['id'],
+        source_schema='awesome_chat',
+        referent_schema='awesome_chat',
+    )
@@ -0,0 +1,153 @@
+"""Compares requests/sec and p50/p99 latency of /health and /status under each available event loop.
+
+The server runs in a child process with in-memory stand-ins for Auth and MessageSender, so the numbers
+reflect the protocol layer and the event loop rather than Postgres. The load client always uses the
+default asyncio loop.
+
+    python benchmarks/event_loop_benchmark.py --requests 5000 --concurrency 50
+"""
+import sys
+import logging
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.http_protocol.http_protocol import HTTPProtocol  # noqa: E402
+from src.launcher.event_loop import install_event_loop  # noqa: E402
+
+TOKEN = "benchmark-token"
+
+
+class StubAuth:
+    async def create_user_and_token(self):
+        return TOKEN
+
+    async def get_user_id_from_token(self, token):
+        return 1 if token == TOKEN else None
+
+
+class StubMessageSender:
+    messages = [{"id": message_id, "user_id": 1, "text": f"message {message_id}"} for message_id in range(20, 0, -1)]
+
+    async def retrieve_messages(self, since_id=None, user_id=None):
+        return self.messages
+
+    async def is_user_exists(self, user_id):
+        return True
+
+
+async def serve(port: int) -> None:
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: HTTPProtocol(StubAuth(), StubMessageSender()), "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+
+def response_length(head: bytes) -> int:
+    # Fails the run on anything but a 200, so a broken stub can't quietly turn into an error path benchmark.
+    status_line = head.split(b"\r\n", 1)[0]
+    if status_line.split(b" ", 2)[1] != b"200":
+        raise RuntimeError(f"Unexpected response: {status_line.decode()}")
+    return next(
+        int(line.split(b":", 1)[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length")
+    )
+
+
+async def request(port: int, path: str) -> float:
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: {TOKEN}\r\nConnection: close\r\n\r\n".encode()
+    )
+    head = await reader.readuntil(b"\r\n\r\n")
+    await reader.readexactly(response_length(head))
+    writer.close()
+    return time.perf_counter() - started
+
+
+async def run_load(port: int, path: str, total: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            latencies.append(await request(port, path))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Benchmark server did not start on port {port}")
+
+
+def available_loops() -> List[str]:
+    loops = ["asyncio"]
+    try:
+        import uvloop  # noqa: F401
+
+        loops.append("uvloop")
+    except ImportError:
+        pass
+    return loops
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--serve", choices=["asyncio", "uvloop"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        # Request logging would dominate the profile, keep the server quiet.
+        logging.getLogger().setLevel(logging.WARNING)
+        install_event_loop(args.serve)
+        asyncio.run(serve(args.port))
+        return
+
+    print(f"{'loop':<8} {'endpoint':<24} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for loop_name in available_loops():
+        port = free_port()
+        server = subprocess.Popen([sys.executable, __file__, "--serve", loop_name, "--port", str(port)])
+        try:
+            wait_for_port(port)
+            for path in ("/health", "/status?chat_type=common"):
+                result = asyncio.run(run_load(port, path, args.requests, args.concurrency))
+                print(
+                    f"{loop_name:<8} {path:<24} {result['rps']:>9.0f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compares throughput of one connection per request, keep-alive connections and pipelined requests.
+
+Uses the stub server from event_loop_benchmark.py (HTTPProtocol with in-memory Auth/MessageSender) in a
+child process, so only connection handling differs between the runs. For pipelined connections the p99 is
+the latency of a whole batch of --depth requests.
+
+    python benchmarks/keep_alive_benchmark.py --requests 5000 --concurrency 20 --depth 8
+"""
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import event_loop_benchmark  # noqa: E402
+from event_loop_benchmark import TOKEN, free_port, request, response_length, wait_for_port  # noqa: E402
+
+REQUEST = f"GET /status?chat_type=common HTTP/1.1\r\nHost: localhost\r\nAuthorization: {TOKEN}\r\n\r\n".encode()
+
+
+async def read_response(reader: asyncio.StreamReader) -> None:
+    head = await reader.readuntil(b"\r\n\r\n")
+    await reader.readexactly(response_length(head))
+
+
+async def run_workers(worker, total: int, concurrency: int, batch: int = 1) -> Dict[str, float]:
+    latencies: List[float] = []
+    remaining = iter(range(0, total, batch))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(remaining, latencies) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p99_ms": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000,
+    }
+
+
+def new_connection_worker(port: int):
+    async def worker(remaining, latencies):
+        for _ in remaining:
+            latencies.append(await request(port, "/status?chat_type=common"))
+
+    return worker
+
+
+def keep_alive_worker(port: int, depth: int = 1):
+    async def worker(remaining, latencies):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for _ in remaining:
+            started = time.perf_counter()
+            writer.write(REQUEST * depth)
+            for _ in range(depth):
+                await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+        writer.close()
+
+    return worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=8, help="requests in flight per pipelined connection")
+    args = parser.parse_args()
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, event_loop_benchmark.__file__, "--serve", "asyncio", "--port", str(port)]
+    )
+    try:
+        wait_for_port(port)
+        runs = [
+            ("connection per request", new_connection_worker(port), 1),
+            ("keep-alive", keep_alive_worker(port), 1),
+            (f"pipelined x{args.depth}", keep_alive_worker(port, args.depth), args.depth),
+        ]
+        print(f"{'mode':<24} {'req/s':>9} {'p99 ms':>8}")
+        for name, worker, batch in runs:
+            result = asyncio.run(run_workers(worker, args.requests, args.concurrency, batch))
+            print(f"{name:<24} {result['rps']:>9.0f} {result['p99_ms']:>8.2f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Simulates chat users against the server and reports RPS and p50/p95/p99 latency per endpoint as JSON.
+
+Every virtual user calls /connect once and then loops over a weighted mix of common and private sends and
+polls on its own keep-alive connection, sleeping a random think time between requests.
+
+The server under test is one of:
+  --backend memory    `python main.py` in a child process with STORAGE_BACKEND=memory, no database (default)
+  --backend postgres  `python main.py` in a child process, using DATABASE_URL
+  --target URL        an already running server
+
+    python benchmarks/loadgen.py --users 1000 --concurrency 200 --duration 30 --think-time 0.5 --output run.json
+
+The report includes the git commit, so runs from different commits can be compared directly.
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+import urllib.parse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import h11
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.chat_client.async_client import HTTPConnection  # noqa: E402
+
+# action -> default weight
+ACTIONS = {"status_common": 50, "status_private": 20, "send_common": 20, "send_private": 10}
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, endpoint: str, latency: float, status: str) -> None:
+        self.latencies.setdefault(endpoint, []).append(latency)
+        statuses = self.statuses.setdefault(endpoint, {})
+        statuses[status] = statuses.get(status, 0) + 1
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            statuses = self.statuses[endpoint]
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "errors": sum(count for status, count in statuses.items() if not status.startswith("2")),
+                "statuses": statuses,
+                "rps": round(len(latencies) / elapsed, 1),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+                "max_ms": round(latencies[-1] * 1000, 3),
+            }
+        total = sum(endpoint["requests"] for endpoint in endpoints.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total,
+            "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+            "rps": round(total / elapsed, 1),
+            "endpoints": endpoints,
+        }
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(percent / 100 * len(sorted_values))) - 1))
+    return round(sorted_values[index] * 1000, 3)
+
+
+class VirtualUser:
+    def __init__(self, host: str, port: int, stats: Stats, user_ids: List[int], weights: Dict[str, int]) -> None:
+        self.http = HTTPConnection(host, port)
+        self.stats = stats
+        self.user_ids = user_ids
+        self.actions = list(weights)
+        self.weights = list(weights.values())
+        self.token: Optional[str] = None
+        self.cursor: Optional[int] = None
+
+    async def call(self, endpoint: str, method: str, target: str, body: bytes = b"") -> Tuple[int, Dict, bytes]:
+        headers = [("Authorization", self.token)] if self.token else []
+        started = time.perf_counter()
+        try:
+            status, response_headers, response_body = await self.http.request(method, target, headers, body)
+        except (OSError, ConnectionError, h11.ProtocolError) as e:
+            self.stats.record(endpoint, time.perf_counter() - started, type(e).__name__)
+            return 0, {}, b""
+        self.stats.record(endpoint, time.perf_counter() - started, str(status))
+        return status, response_headers, response_body
+
+    async def connect(self) -> None:
+        status, headers, body = await self.call("/connect", "POST", "/connect", b"Initial request")
+        if status == 200:
+            self.token = headers.get(b"authorization", b"").decode()
+            self.user_ids.append(json.loads(body)["user_id"])
+
+    async def step(self) -> None:
+        action = random.choices(self.actions, self.weights)[0]
+        peer = random.choice(self.user_ids)
+        if action == "status_common":
+            target = "/status?chat_type=common"
+            if self.cursor is not None:
+                target += f"&since_id={self.cursor}"
+            status, _, body = await self.call("/status common", "GET", target)
+            if status == 200:
+                self.cursor = json.loads(body).get("cursor", self.cursor)
+        elif action == "status_private":
+            await self.call("/status private", "GET", f"/status?chat_type=private&recipient_id={peer}")
+        elif action == "send_common":
+            await self.call("/send", "POST", "/send", json.dumps({"text": "load test message"}).encode())
+        else:
+            payload = {"text": "load test private message", "recipient_id": peer}
+            await self.call("/send-private", "POST", "/send-private", json.dumps(payload).encode())
+
+
+async def run_load(args: argparse.Namespace, host: str, port: int, weights: Dict[str, int]) -> Dict[str, Any]:
+    stats = Stats()
+    user_ids: List[int] = []
+    users = [VirtualUser(host, port, stats, user_ids, weights) for _ in range(args.users)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    deadline = time.monotonic() + args.duration
+
+    async def run_user(user: VirtualUser) -> None:
+        async with semaphore:
+            await user.connect()
+        if user.token is None:
+            return
+        while time.monotonic() < deadline:
+            if args.think_time:
+                await asyncio.sleep(random.expovariate(1 / args.think_time))
+            async with semaphore:
+                if time.monotonic() >= deadline:
+                    break
+                await user.step()
+        user.http.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(user) for user in users))
+    return stats.report(time.perf_counter() - started)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_server(host: str, port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server did not start on {host}:{port}")
+            await asyncio.sleep(0.1)
+
+
+def start_server(backend: str, port: int) -> subprocess.Popen:
+    command = [sys.executable, str(ROOT / "main.py"), "--host", "127.0.0.1", "--port", str(port), "--workers", "1"]
+    # The hourly message limit would turn most sends into 429s. Settings are read by field name.
+    env = dict(os.environ, STORAGE_BACKEND=backend)
+    env.setdefault("MAX_MESSAGES_PER_HOUR", "1000000000")
+    # Request logs would dominate the profile.
+    env.setdefault("APP_DEBUG_LEVEL", "WARNING")
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+def parse_weights(value: str) -> Dict[str, int]:
+    weights = dict(ACTIONS)
+    for item in filter(None, value.split(",")):
+        name, _, weight = item.partition("=")
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action {name}, expected one of {', '.join(ACTIONS)}")
+        weights[name] = int(weight)
+    return weights
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200, help="virtual users, each on its own connection")
+    parser.add_argument("--concurrency", type=int, default=100, help="requests in flight at most")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run after users connect")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a user's requests, s")
+    parser.add_argument(
+        "--mix", type=parse_weights, default=dict(ACTIONS), help="weights, e.g. status_common=50,send_private=10"
+    )
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory")
+    parser.add_argument("--target", help="URL of a running server, no server is started")
+    parser.add_argument("--output", help="write the JSON report to this file as well")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    server = None
+    if args.target:
+        target = urllib.parse.urlparse(args.target)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = start_server(args.backend, port)
+    try:
+        asyncio.run(wait_for_server(host, port))
+        result = asyncio.run(run_load(args, host, port, args.mix))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "commit": git_commit(),
+        "server": args.target or args.backend,
+        "config": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "think_time_s": args.think_time,
+            "mix": args.mix,
+        },
+        **result,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
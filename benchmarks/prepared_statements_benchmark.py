@@ -0,0 +1,104 @@
+"""Compares query latency with the statement registry prepared at pool init and with plain query text.
+
+Runs the read statements PostgresStorage registers against DATABASE_URL (a migrated database with some users
+and messages) through a fresh pool of --connections connections per mode. "first" is the first run of every
+statement on every connection, which pays the parse and plan unless pool init already did; "steady" is the
+--rounds runs after that. "connect" is the pool start, where the prepared mode pays for the statements instead.
+
+    DATABASE_URL=postgresql://... python benchmarks/prepared_statements_benchmark.py --connections 10 --rounds 50
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db_connector.postgres_connector import AsyncDatabaseConnector  # noqa: E402
+# Importing the storage also registers its statements.
+from src.storage.postgres_storage import NO_TIME_BOUND  # noqa: E402
+
+
+async def sample_calls(database_url: str) -> List[Tuple[str, tuple]]:
+    connection = await asyncpg.connect(database_url)
+    try:
+        session = await connection.fetchrow("SELECT user_id, session_token FROM awesome_chat.user_sessions LIMIT 1")
+        private = await connection.fetchrow(
+            "SELECT m.id, m.user_id, pm.recipient_id FROM awesome_chat.private_messages pm "
+            "JOIN awesome_chat.messages m ON m.id = pm.id ORDER BY pm.id DESC LIMIT 1"
+        )
+        last_id = await connection.fetchval("SELECT coalesce(max(id), 0) FROM awesome_chat.messages")
+    finally:
+        await connection.close()
+    if session is None or private is None:
+        raise SystemExit("The database needs at least one session and one private message")
+    user_id, recipient_id = private["user_id"], private["recipient_id"]
+    return [
+        ("fetchrow", ("session_user", session["session_token"])),
+        ("fetchval", ("user_exists", session["user_id"])),
+        ("fetch", ("latest_common", 200)),
+        ("fetch", ("latest_common", 20)),
+        ("fetch", ("common_since", last_id - 100, 20, NO_TIME_BOUND)),
+        ("fetch", ("private_newest", user_id, recipient_id, 51)),
+        ("fetch", ("private_since", user_id, recipient_id, private["id"] - 100, 51, NO_TIME_BOUND)),
+        ("fetch", ("private_before", user_id, recipient_id, private["id"] + 1, 51)),
+    ]
+
+
+async def timed(db: AsyncDatabaseConnector, method: str, args: tuple) -> float:
+    started = time.perf_counter()
+    await db.run(method, *args)
+    return time.perf_counter() - started
+
+
+async def run_mode(database_url: str, prepared: bool, connections: int, rounds: int, calls) -> Dict[str, Any]:
+    db = AsyncDatabaseConnector(
+        database_url, use_pool=True, min_size=connections, max_size=connections, prepare_statements=prepared
+    )
+    started = time.perf_counter()
+    await db.connect()
+    connect = time.perf_counter() - started
+    first: List[float] = []
+    steady: List[float] = []
+    try:
+        for round_number in range(rounds + 1):
+            for method, args in calls:
+                # As many concurrent calls as connections, so each one runs on its own connection.
+                latencies = await asyncio.gather(*(timed(db, method, args) for _ in range(connections)))
+                (first if round_number == 0 else steady).extend(latencies)
+    finally:
+        await db.close()
+    return {
+        "connect_ms": connect * 1000,
+        "first_p50_ms": statistics.median(first) * 1000,
+        "first_max_ms": max(first) * 1000,
+        "steady_p50_ms": statistics.median(steady) * 1000,
+        "steady_p99_ms": statistics.quantiles(steady, n=100)[98] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("--database-url or DATABASE_URL is required")
+
+    calls = asyncio.run(sample_calls(args.database_url))
+    columns = ["connect_ms", "first_p50_ms", "first_max_ms", "steady_p50_ms", "steady_p99_ms"]
+    print(f"{'mode':<10} " + " ".join(f"{column:>14}" for column in columns))
+    for name, prepared in [("text", False), ("prepared", True)]:
+        result = asyncio.run(run_mode(args.database_url, prepared, args.connections, args.rounds, calls))
+        print(f"{name:<10} " + " ".join(f"{result[column]:>14.2f}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Counts the DB round trips Auth makes for a steady polling workload with and without the session cache.
+
+    python benchmarks/session_cache_benchmark.py --clients 50 --polls 600 --poll-interval 1 --ttl 60
+"""
+import sys
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.auth import session_cache as session_cache_module  # noqa: E402
+from src.auth.auth_simple import Auth  # noqa: E402
+from src.auth.session_cache import SessionCache  # noqa: E402
+from src.db_connector.statements import STATEMENTS  # noqa: E402
+from src.storage.postgres_storage import PostgresStorage  # noqa: E402
+
+
+class CountingDB:
+    def __init__(self):
+        self.calls = 0
+        self.next_user_id = 0
+        self.sessions = {}
+
+    async def run(self, method, name, *args, **kwargs):
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def fetchval(self, query, *args):
+        self.calls += 1
+        self.next_user_id += 1
+        return self.next_user_id
+
+    async def execute(self, query, *args):
+        self.calls += 1
+        user_id, token = args
+        self.sessions[token] = user_id
+
+    async def fetchrow(self, query, token):
+        self.calls += 1
+        user_id = self.sessions.get(token)
+        return {"user_id": user_id} if user_id is not None else None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+async def run(clients, polls, poll_interval, cache):
+    db = CountingDB()
+    auth = Auth(PostgresStorage(db), session_cache=cache)
+    tokens = [await auth.create_user_and_token() for _ in range(clients)]
+    db.calls = 0
+    for _ in range(polls):
+        for token in tokens:
+            await auth.get_user_id_from_token(token)
+        session_cache_module.time.now += poll_interval
+    return db.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=600, help="polls per client")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="simulated seconds between polls")
+    parser.add_argument("--ttl", type=float, default=60.0)
+    parser.add_argument("--size", type=int, default=10000)
+    args = parser.parse_args()
+
+    # Simulated time, so a 10 minute workload runs in well under a second.
+    session_cache_module.time = FakeClock()
+
+    without_cache = asyncio.run(run(args.clients, args.polls, args.poll_interval, None))
+    cache = SessionCache(max_size=args.size, ttl=args.ttl)
+    with_cache = asyncio.run(run(args.clients, args.polls, args.poll_interval, cache))
+
+    requests_total = args.clients * args.polls
+    print(f"auth lookups:            {requests_total}")
+    print(f"DB calls without cache:  {without_cache}")
+    print(f"DB calls with cache:     {with_cache}")
+    print(f"DB calls saved:          {without_cache - with_cache} ({100 * (1 - with_cache / without_cache):.1f}%)")
+    print(f"cache stats:             {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
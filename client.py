@@ -1,15 +1,15 @@
 import json
 import requests
 import logging.config
-from typing import Optional
+from typing import Any, Dict, Iterator, Optional
 
 from dotenv import load_dotenv
 
-from config.logger import LOGGING
+from config.logger import configure_logging
 
 load_dotenv()
 
-logging.config.dictConfig(LOGGING)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -17,11 +17,13 @@ class ChatClient:
     def __init__(self, server_url: str):
         self.server_url = server_url
         self.token: Optional[str] = None
+        # Keeps the connection to the server open between calls.
+        self.session = requests.Session()
 
     def connect(self) -> None:
         try:
             url_to_send = self.server_url + "/connect"
-            response = requests.post(url_to_send, data="Initial request")
+            response = self.session.post(url_to_send, data="Initial request")
             response.raise_for_status()
             self.token = response.headers.get("Authorization")
             if self.token:
@@ -36,7 +38,7 @@ class ChatClient:
         try:
             url_to_send = self.server_url + "/status"
             headers = {"Authorization": self.token} if self.token else {}
-            response = requests.get(url_to_send, headers=headers, params=params)
+            response = self.session.get(url_to_send, headers=headers, params=params)
             response.raise_for_status()
             logger.info(response.text)
             return response
@@ -53,13 +55,22 @@ class ChatClient:
                 data = json.dumps({"text": message})
 
             headers = {"Authorization": self.token, "Content-Type": "application/json"} if self.token else {}
-            response = requests.post(url_to_send, data=data, headers=headers)
+            response = self.session.post(url_to_send, data=data, headers=headers)
             response.raise_for_status()
             logger.info(response.text)
             return response
         except requests.RequestException as e:
             logger.error("Failed to send message: %s", e)
 
+    def subscribe(self) -> Iterator[Dict[str, Any]]:
+        url_to_send = self.server_url + "/subscribe"
+        headers = {"Authorization": self.token} if self.token else {}
+        with self.session.get(url_to_send, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith("data: "):
+                    yield json.loads(line[len("data: "):])
+
 
 def main():
     server_url = "http://127.0.0.1:8000"
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List
 
 from pydantic import Field, BaseModel
 from pydantic_settings import BaseSettings
@@ -18,6 +19,8 @@ class HTTPError(BaseModel):
 
 class ErrorMessages(BaseModel):
     invalid_json_format: HTTPError = HTTPError(message="Invalid JSON format", status_code=400)
+    invalid_parameters: HTTPError = HTTPError(message="Invalid parameters", status_code=400)
+    bad_request: HTTPError = HTTPError(message="Bad Request", status_code=400)
     missing_required_data: HTTPError = HTTPError(message="Missing required data", status_code=400)
     user_has_not_been_found: HTTPError = HTTPError(message="User has not been found", status_code=400)
     unauthorized: HTTPError = HTTPError(message="Unauthorized", status_code=401)
@@ -26,6 +29,8 @@ class ErrorMessages(BaseModel):
     method_not_allowed: HTTPError = HTTPError(message="Method Not Allowed", status_code=405)
     internal_server_error: HTTPError = HTTPError(message="Internal Server Error", status_code=500)
     request_timeout_error: HTTPError = HTTPError(message="Request processing timed out", status_code=408)
+    payload_too_large: HTTPError = HTTPError(message="Payload Too Large", status_code=413)
+    request_header_fields_too_large: HTTPError = HTTPError(message="Request Header Fields Too Large", status_code=431)
     message_limit_reached: HTTPError = HTTPError(message="Message limit reached", status_code=429)
     database_error: HTTPError = HTTPError(message="Database error occurred", status_code=500)
 
@@ -33,10 +38,87 @@ class ErrorMessages(BaseModel):
 class Settings(BaseSettings):
     # Общие настройки
     app_debug_level: str = Field("INFO", env="APP_DEBUG_LEVEL")
+    server_host: str = Field("0.0.0.0", env="SERVER_HOST")
+    server_port: int = Field(8000, env="SERVER_PORT")
+    server_workers: int = Field(1, env="SERVER_WORKERS")
+    # Реализация event loop: "auto" (uvloop, если установлен), "asyncio" или "uvloop"
+    event_loop: str = Field("auto", env="EVENT_LOOP")
+    # JSON-кодек ответов: "auto" (orjson, если установлен), "json" или "orjson"
+    json_codec: str = Field("auto", env="JSON_CODEC")
     base_dir: str = Field(BASE_DIR)
     max_request_time: int = Field(5, env="MAX_REQUEST_TIME")
     max_messages_per_hour: int = Field(20, env="MAX_MESSAGE_PER_HOUR")
     database_url: str = Field(default="NON_VALID_DEFAULT_DATABASE_URL", env="DATABASE_URL")
+    # Реплики для чтения (JSON-список DSN), пауза перед повторным обращением к упавшей реплике (секунды)
+    # и сколько секунд после записи читать данные пользователя/сессии с основной БД (0 - всегда с реплик)
+    database_replica_urls: List[str] = Field(default_factory=list, env="DATABASE_REPLICA_URLS")
+    db_replica_retry_interval: float = Field(5.0, env="DB_REPLICA_RETRY_INTERVAL")
+    db_read_your_writes_window: float = Field(5.0, env="DB_READ_YOUR_WRITES_WINDOW")
+    # Хранилище: "postgres" или "memory" (в процессе, без БД; сообщений на переписку не больше
+    # memory_storage_history_size, 0 - без ограничения)
+    storage_backend: str = Field("postgres", env="STORAGE_BACKEND")
+    memory_storage_history_size: int = Field(10000, env="MEMORY_STORAGE_HISTORY_SIZE")
+    # Keep-alive: закрытие простаивающего соединения (секунды) и лимит запросов на соединение (0 - без лимита)
+    keep_alive_timeout: float = Field(5.0, env="KEEP_ALIVE_TIMEOUT")
+    keep_alive_max_requests: int = Field(1000, env="KEEP_ALIVE_MAX_REQUESTS")
+    # Ограничения размера запроса (байты) и пороги буферов чтения/записи на соединение для backpressure
+    max_header_size: int = Field(16384, env="MAX_HEADER_SIZE")
+    max_body_size: int = Field(1048576, env="MAX_BODY_SIZE")
+    read_buffer_high_water: int = Field(65536, env="READ_BUFFER_HIGH_WATER")
+    write_buffer_high_water: int = Field(65536, env="WRITE_BUFFER_HIGH_WATER")
+    # Закрытие соединений, не приславших заголовки запроса за header_read_timeout секунд (0 - выключено)
+    header_read_timeout: float = Field(10.0, env="HEADER_READ_TIMEOUT")
+    connection_reaper_interval: float = Field(1.0, env="CONNECTION_REAPER_INTERVAL")
+    # Пул соединений с БД
+    db_pool_enabled: bool = Field(True, env="DB_POOL_ENABLED")
+    db_pool_min_size: int = Field(2, env="DB_POOL_MIN_SIZE")
+    db_pool_max_size: int = Field(10, env="DB_POOL_MAX_SIZE")
+    db_pool_acquire_timeout: float = Field(5.0, env="DB_POOL_ACQUIRE_TIMEOUT")
+    db_pool_max_inactive_lifetime: float = Field(300.0, env="DB_POOL_MAX_INACTIVE_LIFETIME")
+    db_pool_health_check_interval: float = Field(30.0, env="DB_POOL_HEALTH_CHECK_INTERVAL")
+    # Подготовка именованных запросов хранилища на каждом новом соединении пула
+    db_prepared_statements_enabled: bool = Field(True, env="DB_PREPARED_STATEMENTS_ENABLED")
+    # История общего чата: размер страницы и кольцевой буфер последних сообщений в памяти
+    common_history_limit: int = Field(20, env="COMMON_HISTORY_LIMIT")
+    common_history_buffer_size: int = Field(200, env="COMMON_HISTORY_BUFFER_SIZE")
+    # История личных сообщений: размер страницы по умолчанию и максимальный
+    private_history_page_size: int = Field(50, env="PRIVATE_HISTORY_PAGE_SIZE")
+    private_history_max_page_size: int = Field(200, env="PRIVATE_HISTORY_MAX_PAGE_SIZE")
+    # Пакетные запросы (/send-batch, /status-batch): сколько сообщений или переписок в одном запросе
+    batch_max_items: int = Field(100, env="BATCH_MAX_ITEMS")
+    # Секции messages по месяцам: сколько месяцев создавать заранее, через сколько дней после конца месяца
+    # секцию отсоединять (0 - хранить всё), что с ней делать ("archive" - в схему awesome_chat_archive, "drop")
+    # и как часто проверять (в секундах)
+    message_partition_maintenance_enabled: bool = Field(True, env="MESSAGE_PARTITION_MAINTENANCE_ENABLED")
+    message_partition_premake_months: int = Field(3, env="MESSAGE_PARTITION_PREMAKE_MONTHS")
+    message_retention_days: int = Field(0, env="MESSAGE_RETENTION_DAYS")
+    message_retention_action: str = Field("archive", env="MESSAGE_RETENTION_ACTION")
+    message_partition_maintenance_interval: float = Field(3600.0, env="MESSAGE_PARTITION_MAINTENANCE_INTERVAL")
+    # Опрос новых сообщений (since_id) читает только секции за последние message_hot_window_days дней,
+    # если курсор не старше этого окна (0 - читать все секции)
+    message_hot_window_days: float = Field(7.0, env="MESSAGE_HOT_WINDOW_DAYS")
+    # Групповая запись сообщений: несколько строк одним INSERT
+    write_batch_enabled: bool = Field(False, env="WRITE_BATCH_ENABLED")
+    write_batch_max_size: int = Field(100, env="WRITE_BATCH_MAX_SIZE")
+    write_batch_max_wait_ms: float = Field(5.0, env="WRITE_BATCH_MAX_WAIT_MS")
+    # Ограничение частоты сообщений: "memory" (в процессе, с периодической записью в БД) или "postgres"
+    rate_limiter_backend: str = Field("memory", env="RATE_LIMITER_BACKEND")
+    rate_limiter_window_seconds: float = Field(3600, env="RATE_LIMITER_WINDOW_SECONDS")
+    rate_limiter_flush_interval: float = Field(5.0, env="RATE_LIMITER_FLUSH_INTERVAL")
+    rate_limiter_flush_batch_size: int = Field(500, env="RATE_LIMITER_FLUSH_BATCH_SIZE")
+    # Кэш сессий (token -> user_id)
+    session_cache_enabled: bool = Field(True, env="SESSION_CACHE_ENABLED")
+    session_cache_size: int = Field(10000, env="SESSION_CACHE_SIZE")
+    session_cache_ttl: float = Field(60.0, env="SESSION_CACHE_TTL")
+    # Подписка на новые сообщения (/subscribe)
+    subscribe_queue_size: int = Field(100, env="SUBSCRIBE_QUEUE_SIZE")
+    subscribe_slow_consumer_policy: str = Field("disconnect", env="SUBSCRIBE_SLOW_CONSUMER_POLICY")
+    subscribe_heartbeat_interval: float = Field(15.0, env="SUBSCRIBE_HEARTBEAT_INTERVAL")
+    # Логирование: запись в фоновом потоке, доля сохраняемых записей ниже WARNING по логгерам
+    # (например {"src.http_protocol": 0.1}) и лимит записей в секунду на логгер (0 - без лимита)
+    log_queue_enabled: bool = Field(True, env="LOG_QUEUE_ENABLED")
+    log_sample_rates: Dict[str, float] = Field(default_factory=dict, env="LOG_SAMPLE_RATES")
+    log_rate_limit: int = Field(0, env="LOG_RATE_LIMIT")
     error_messages: ErrorMessages = ErrorMessages()
 
 
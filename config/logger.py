@@ -1,3 +1,14 @@
+import os
+import copy
+import time
+import queue
+import atexit
+import random
+import logging.config
+import logging.handlers
+import multiprocessing.util
+from typing import Dict, List, Optional
+
 from config.config import settings
 
 LOG_FORMAT = "%(asctime)s - %(name)s -  - [%(filename)s:%(lineno)d] - %(levelname)s - %(message)s"
@@ -30,8 +41,115 @@ LOGGING = {
         },
     },
     "root": {
-        "level": "INFO",
+        "level": settings.app_debug_level,
         "formatter": "verbose",
         "handlers": LOG_DEFAULT_HANDLERS,
     },
 }
+
+
+class SamplingFilter(logging.Filter):
+    # Keeps a share of the records below WARNING per logger (the longest matching prefix of the logger name wins)
+    # and caps every logger at rate_limit records per second. Suppressed records are counted in dropped. The decision
+    # is stored on the record, so one instance can be shared by several handlers.
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None, rate_limit: int = 0) -> None:
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.rate_limit = rate_limit
+        self.dropped = 0
+        self._rates: Dict[str, float] = {}
+        self._windows: Dict[str, List[float]] = {}
+
+    def _sample_rate(self, name: str) -> float:
+        rate = self._rates.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.sample_rates:
+                    rate = self.sample_rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._rates[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        decision = getattr(record, "_sampled", None)
+        if decision is None:
+            decision = record._sampled = self._decide(record)
+        return decision
+
+    def _decide(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and self.sample_rates:
+            rate = self._sample_rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                self.dropped += 1
+                return False
+        if self.rate_limit:
+            now = time.monotonic()
+            window = self._windows.setdefault(record.name, [now, 0])
+            if now - window[0] >= 1.0:
+                window[0], window[1] = now, 0
+            if window[1] >= self.rate_limit:
+                self.dropped += 1
+                return False
+            window[1] += 1
+        return True
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    # Only renders the message on the caller's thread (arguments may be mutated after the call), formatting and I/O
+    # happen on the listener thread.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_configured = False
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _restart_listener() -> None:
+    # Forked workers inherit the queue handler but not the listener thread, and leave through os._exit()
+    # without running atexit hooks.
+    global _listener
+    handler_queue: queue.SimpleQueue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, LogQueueHandler):
+            handler.queue = handler_queue
+    _listener = logging.handlers.QueueListener(handler_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    multiprocessing.util.Finalize(None, stop_logging, exitpriority=0)
+
+
+def stop_logging() -> None:
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+def configure_logging() -> None:
+    global _configured, _listener
+    if _configured:
+        return
+    _configured = True
+    logging.config.dictConfig(LOGGING)
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    sampling_filter = SamplingFilter(settings.log_sample_rates, settings.log_rate_limit)
+    if not settings.log_queue_enabled:
+        for handler in handlers:
+            handler.addFilter(sampling_filter)
+        return
+
+    handler_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = LogQueueHandler(handler_queue)
+    queue_handler.addFilter(sampling_filter)
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(handler_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    os.register_at_fork(after_in_child=_restart_listener)
@@ -1,38 +1,137 @@
+import signal
 import asyncio
+import argparse
 import logging.config
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
 
-from config.logger import LOGGING
+from config.logger import configure_logging
 from config.logger import settings
 from src.auth.auth_simple import Auth
+from src.auth.session_cache import SessionCache
 from src.http_protocol.http_protocol import HTTPProtocol
-from src.db_connector.postgres_connector import AsyncDatabaseConnector
+from src.http_protocol.reaper import ConnectionReaper
+from src.launcher.event_loop import install_event_loop
+from src.launcher.launcher import WorkerSupervisor
 from src.message_sender.message_sender import MessageSender
+from src.metrics.metrics import REGISTRY
+from src.pubsub.hub import MessageHub
+from src.storage.storage import create_storage
 
 # Load environment variables from .env file
 load_dotenv()
 
 
-logging.config.dictConfig(LOGGING)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
-async def main(host, port):
+def per_process_options(workers: int) -> Dict[str, Any]:
+    # In-process state that would diverge between workers: the rate limit must be shared through the
+    # database, the common history buffer and /subscribe would miss messages sent through the other workers
+    # and the session cache would keep accepting tokens deactivated through them.
+    options: Dict[str, Any] = {
+        "rate_limiter_backend": settings.rate_limiter_backend,
+        "history_buffer_size": settings.common_history_buffer_size,
+        "session_cache_enabled": settings.session_cache_enabled,
+        "subscribe_enabled": True,
+    }
+    if workers > 1:
+        if options["rate_limiter_backend"] == "memory":
+            logger.warning("In-memory rate limiter is per process, using the postgres one with %d workers", workers)
+            options["rate_limiter_backend"] = "postgres"
+        logger.warning("/subscribe and the session cache are per process, disabled with %d workers", workers)
+        options.update(history_buffer_size=0, session_cache_enabled=False, subscribe_enabled=False)
+    return options
+
+
+async def main(host, port, workers=1):
     logger.info("Starting server ...")
     loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
 
-    db_connector = AsyncDatabaseConnector(settings.database_url)
-    await db_connector.connect()
-    auth_instance = Auth(db_connector)
-    message_sender_instance = MessageSender(db_connector)
+    options = per_process_options(workers)
+    storage = create_storage(settings.storage_backend, workers=workers)
+    await storage.connect()
+    history_buffer_size = options["history_buffer_size"]
+    if storage.name == "memory":
+        # The storage itself is the history, a second copy in MessageSender would only cost memory.
+        history_buffer_size = 0
+    session_cache = None
+    if options["session_cache_enabled"]:
+        session_cache = SessionCache(max_size=settings.session_cache_size, ttl=settings.session_cache_ttl)
+    auth_instance = Auth(storage, session_cache=session_cache)
+    rate_limiter = storage.create_rate_limiter(options["rate_limiter_backend"])
+    await rate_limiter.start()
+    message_sender_instance = MessageSender(
+        storage,
+        rate_limiter=rate_limiter,
+        history_buffer_size=history_buffer_size,
+    )
+    await message_sender_instance.warm_up()
+    message_hub = None
+    if options["subscribe_enabled"]:
+        message_hub = MessageHub(
+            max_queue_size=settings.subscribe_queue_size, slow_consumer_policy=settings.subscribe_slow_consumer_policy
+        )
+    connection_reaper = ConnectionReaper(
+        header_timeout=settings.header_read_timeout, interval=settings.connection_reaper_interval
+    )
+    await connection_reaper.start()
+
+    storage.register_stats(REGISTRY)
+    if message_hub is not None:
+        REGISTRY.register_stats("chat_pubsub", message_hub.stats, "Subscription hub state")
+    REGISTRY.register_stats("chat_connection_reaper", connection_reaper.stats, "Connection reaper state")
+    if session_cache is not None:
+        REGISTRY.register_stats("chat_session_cache", session_cache.stats, "Session cache state")
 
     def protocol_factory():
-        return HTTPProtocol(auth_instance=auth_instance, message_sender_instance=message_sender_instance)
+        return HTTPProtocol(
+            auth_instance=auth_instance,
+            message_sender_instance=message_sender_instance,
+            message_hub=message_hub,
+            connection_reaper=connection_reaper,
+        )
+
+    server = await loop.create_server(protocol_factory, host, port, reuse_port=workers > 1)
+    logger.info("Sever has been started on %s:%s ...", host, port)
+    try:
+        await stop.wait()
+    finally:
+        server.close()
+        await connection_reaper.close()
+        if message_hub is not None:
+            message_hub.close()
+        await rate_limiter.close()
+        await storage.close()
+
+
+def run_server(host: str, port: int, workers: int = 1) -> None:
+    event_loop = install_event_loop(settings.event_loop)
+    logger.info("Using %s event loop", event_loop)
+    asyncio.run(main(host, port, workers))
+
 
-    server = await loop.create_server(protocol_factory, host, port)
-    logger.info("Sever has been started ...")
-    await server.serve_forever()
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Chat server")
+    parser.add_argument("--host", default=settings.server_host, help="address to listen on")
+    parser.add_argument("--port", type=int, default=settings.server_port, help="port to listen on")
+    parser.add_argument(
+        "--workers", type=int, default=settings.server_workers, help="worker processes sharing the port"
+    )
+    args = parser.parse_args(argv)
+    if args.workers > 1 and settings.storage_backend == "memory":
+        parser.error("the in-memory storage can't be shared between workers, use --workers 1")
+    return args
 
 
-asyncio.run(main("0.0.0.0", 8000))
+if __name__ == "__main__":
+    args = parse_args()
+    if args.workers > 1:
+        WorkerSupervisor(run_server, (args.host, args.port, args.workers), args.workers).run()
+    else:
+        run_server(args.host, args.port)
@@ -1,12 +1,14 @@
 import secrets
 from typing import Optional
 
-from src.db_connector.postgres_connector import AsyncDatabaseConnector
+from src.auth.session_cache import SessionCache
+from src.storage.base import BaseStorage
 
 
 class Auth:
-    def __init__(self, db: AsyncDatabaseConnector):
-        self.db = db
+    def __init__(self, storage: BaseStorage, session_cache: Optional[SessionCache] = None):
+        self.storage = storage
+        self.session_cache = session_cache
 
     async def create_user_and_token(self, username: Optional[str] = None) -> Optional[str]:
         try:
@@ -15,20 +17,10 @@ class Auth:
                 random_part2 = secrets.token_hex(4)
                 username = f"awesome_{random_part1}_user_{random_part2}"
 
-            # SQL query to insert a new user
-            user_insert_query = """
-            INSERT INTO awesome_chat.users (username)
-            VALUES ($1)
-            RETURNING id
-            """
-            user_id = await self.db.fetchval(user_insert_query, username)
+            user_id = await self.storage.create_user(username)
 
             token = secrets.token_urlsafe()
-            session_insert_query = """
-            INSERT INTO awesome_chat.user_sessions (user_id, session_token)
-            VALUES ($1, $2)
-            """
-            await self.db.execute(session_insert_query, user_id, token)
+            await self.storage.create_session(user_id, token)
 
             return token
         except Exception as e:
@@ -36,17 +28,28 @@ class Auth:
             return None
 
     async def get_user_id_from_token(self, token: str) -> Optional[int]:
+        if self.session_cache is not None:
+            user_id = self.session_cache.get(token)
+            if user_id is not None:
+                return user_id
         try:
-            session_select_query = """
-            SELECT user_id
-            FROM awesome_chat.user_sessions
-            WHERE session_token = $1 AND is_active = True
-            """
-            session = await self.db.fetchrow(session_select_query, token)
-            if session:
-                return session["user_id"]
+            user_id = await self.storage.get_session_user(token)
+            if user_id is not None:
+                if self.session_cache is not None:
+                    self.session_cache.set(token, user_id)
+                return user_id
             else:
                 raise ValueError("Invalid or inactive token")
         except Exception as e:
             print(f"Error retrieving user ID from token: {e}")
             return None
+
+    async def deactivate_session(self, token: str) -> None:
+        await self.storage.deactivate_session(token)
+        if self.session_cache is not None:
+            self.session_cache.invalidate(token)
+
+    async def deactivate_user_sessions(self, user_id: int) -> None:
+        await self.storage.deactivate_user_sessions(user_id)
+        if self.session_cache is not None:
+            self.session_cache.invalidate_user(user_id)
@@ -0,0 +1,55 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class SessionCache:
+    # Bounded LRU of token -> user_id where every entry also expires after ttl seconds.
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[int]:
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user_id
+
+    def set(self, token: str, user_id: int) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[token] = (user_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, token: str) -> None:
+        self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int) -> None:
+        for token in [token for token, (cached_id, _) in self._entries.items() if cached_id == user_id]:
+            del self._entries[token]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
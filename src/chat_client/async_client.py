@@ -0,0 +1,228 @@
+import json
+import asyncio
+import logging.config
+import urllib.parse
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import h11
+
+from config.logger import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+class ChatClientError(Exception):
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class HTTPConnection:
+    # One keep-alive HTTP/1.1 connection driven through h11, reopened when the server closes it.
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.connection: Optional[h11.Connection] = None
+
+    async def _open(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.connection = h11.Connection(h11.CLIENT)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.writer = None
+        self.connection = None
+
+    async def _send_request(self, method: str, target: str, headers: List[Tuple[str, str]], body: bytes) -> None:
+        if self.connection is None or self.connection.our_state is not h11.IDLE:
+            self.close()
+            await self._open()
+        request_headers = [("Host", self.host), ("Content-Length", str(len(body))), *headers]
+        self.writer.write(
+            self.connection.send(h11.Request(method=method, target=target, headers=request_headers))
+            + self.connection.send(h11.Data(data=body))
+            + self.connection.send(h11.EndOfMessage())
+        )
+
+    async def _next_event(self) -> Any:
+        while True:
+            event = self.connection.next_event()
+            if event is not h11.NEED_DATA:
+                return event
+            data = await self.reader.read(65536)
+            if not data and self.connection.their_state is h11.SEND_RESPONSE:
+                self.close()
+                raise ConnectionError("Server closed the connection")
+            self.connection.receive_data(data)
+
+    def _finish(self) -> None:
+        if self.connection.our_state is h11.DONE and self.connection.their_state is h11.DONE:
+            self.connection.start_next_cycle()
+        else:
+            self.close()
+
+    async def request(
+        self, method: str, target: str, headers: Optional[List[Tuple[str, str]]] = None, body: bytes = b""
+    ) -> Tuple[int, Dict[bytes, bytes], bytes]:
+        await self._send_request(method, target, headers or [], body)
+        response = None
+        response_body = bytearray()
+        try:
+            while True:
+                event = await self._next_event()
+                if isinstance(event, h11.Response):
+                    response = event
+                elif isinstance(event, h11.Data):
+                    response_body.extend(event.data)
+                elif isinstance(event, (h11.EndOfMessage, h11.ConnectionClosed)):
+                    break
+        except BaseException:
+            self.close()
+            raise
+        self._finish()
+        return response.status_code, dict(response.headers), bytes(response_body)
+
+    async def stream(
+        self, method: str, target: str, headers: Optional[List[Tuple[str, str]]] = None
+    ) -> AsyncIterator[Tuple[int, bytes]]:
+        # Yields (status code, body chunk) as chunks arrive; the connection is closed afterwards.
+        await self._send_request(method, target, headers or [], b"")
+        try:
+            status_code = 0
+            while True:
+                event = await self._next_event()
+                if isinstance(event, h11.Response):
+                    status_code = event.status_code
+                elif isinstance(event, h11.Data):
+                    yield status_code, bytes(event.data)
+                elif isinstance(event, (h11.EndOfMessage, h11.ConnectionClosed)):
+                    return
+        finally:
+            self.close()
+
+
+class ConnectionPool:
+    # Up to max_connections keep-alive connections, the most recently used one is handed out first.
+    def __init__(self, host: str, port: int, max_connections: int = 10) -> None:
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self._idle: List[HTTPConnection] = []
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    async def request(
+        self, method: str, target: str, headers: Optional[List[Tuple[str, str]]] = None, body: bytes = b""
+    ) -> Tuple[int, Dict[bytes, bytes], bytes]:
+        async with self._semaphore:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else HTTPConnection(self.host, self.port)
+            try:
+                try:
+                    result = await connection.request(method, target, headers, body)
+                except ConnectionError:
+                    # The server may have closed an idle keep-alive connection before reading the request.
+                    if not reused:
+                        raise
+                    connection = HTTPConnection(self.host, self.port)
+                    result = await connection.request(method, target, headers, body)
+            except BaseException:
+                connection.close()
+                raise
+            self._idle.append(connection)
+            return result
+
+    def close(self) -> None:
+        for connection in self._idle:
+            connection.close()
+        self._idle.clear()
+
+
+class AsyncChatClient:
+    def __init__(self, server_url: str, max_connections: int = 10, timeout: Optional[float] = 10.0) -> None:
+        parsed_url = urllib.parse.urlparse(server_url)
+        self.host = parsed_url.hostname or "127.0.0.1"
+        self.port = parsed_url.port or 80
+        self.timeout = timeout
+        self.pool = ConnectionPool(self.host, self.port, max_connections)
+        self.token: Optional[str] = None
+        self.user_id: Optional[int] = None
+
+    async def __aenter__(self) -> "AsyncChatClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        self.pool.close()
+
+    def _headers(self) -> List[Tuple[str, str]]:
+        return [("Authorization", self.token)] if self.token else []
+
+    async def _request(self, method: str, target: str, body: bytes = b"") -> Tuple[Dict[bytes, bytes], Any]:
+        status_code, headers, response_body = await asyncio.wait_for(
+            self.pool.request(method, target, self._headers(), body), timeout=self.timeout
+        )
+        payload = json.loads(response_body) if response_body else None
+        if status_code >= 400:
+            message = payload.get("error", "") if isinstance(payload, dict) else ""
+            raise ChatClientError(status_code, message)
+        return headers, payload
+
+    async def connect(self) -> int:
+        headers, payload = await self._request("POST", "/connect", b"Initial request")
+        self.token = headers.get(b"authorization", b"").decode() or None
+        if self.token is None:
+            raise ChatClientError(200, "Authorization token not received")
+        self.user_id = payload["user_id"]
+        return self.user_id
+
+    async def get_status(
+        self,
+        chat_type: str = "common",
+        recipient_id: Optional[int] = None,
+        since_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        params = {
+            "chat_type": chat_type,
+            "recipient_id": recipient_id,
+            "since_id": since_id,
+            "before_id": before_id,
+            "limit": limit,
+        }
+        query = urllib.parse.urlencode({name: value for name, value in params.items() if value is not None})
+        _, payload = await self._request("GET", "/status?" + query)
+        return payload
+
+    async def send_message(self, text: str, recipient_id: Optional[int] = None) -> Dict[str, Any]:
+        if recipient_id is None:
+            _, payload = await self._request("POST", "/send", json.dumps({"text": text}).encode())
+        else:
+            body = json.dumps({"text": text, "recipient_id": recipient_id}).encode()
+            _, payload = await self._request("POST", "/send-private", body)
+        return payload
+
+    async def send_many(self, texts: Iterable[str], recipient_id: Optional[int] = None) -> List[Any]:
+        # Concurrent sends, limited by the pool size. Failed sends are returned as their exception.
+        return await asyncio.gather(*(self.send_message(text, recipient_id) for text in texts), return_exceptions=True)
+
+    async def subscribe(self) -> AsyncIterator[Dict[str, Any]]:
+        # Runs on its own connection, outside the pool, for as long as the caller iterates.
+        connection = HTTPConnection(self.host, self.port)
+        buffer = b""
+        async for status_code, chunk in connection.stream("GET", "/subscribe", self._headers()):
+            if status_code >= 400:
+                raise ChatClientError(status_code, chunk.decode(errors="replace"))
+            buffer += chunk
+            while b"\n\n" in buffer:
+                event, buffer = buffer.split(b"\n\n", 1)
+                for line in event.split(b"\n"):
+                    if line.startswith(b"data: "):
+                        yield json.loads(line[len(b"data: "):])
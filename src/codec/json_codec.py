@@ -0,0 +1,50 @@
+import json
+import logging.config
+from typing import Any, Callable, Iterable, Mapping, Tuple
+
+from config.config import settings
+from config.logger import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+JSON_CODECS = ("auto", "json", "orjson")
+
+# orjson.JSONDecodeError subclasses it, so one except clause covers both backends.
+JSONDecodeError = json.JSONDecodeError
+
+
+def _json_dumps(value: Any) -> bytes:
+    # Same output as orjson: compact and UTF-8.
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def select_codec(name: str) -> Tuple[str, Callable[[Any], bytes], Callable[[Any], Any]]:
+    if name not in JSON_CODECS:
+        raise ValueError(f"Unknown JSON codec: {name}, expected one of {', '.join(JSON_CODECS)}")
+    if name != "json":
+        try:
+            import orjson
+
+            return "orjson", orjson.dumps, orjson.loads
+        except ImportError:
+            if name == "orjson":
+                logger.warning("orjson is not installed, falling back to the json module")
+    return "json", _json_dumps, json.loads
+
+
+JSON_CODEC, dumps, loads = select_codec(settings.json_codec)
+
+
+def encode_messages(messages: Iterable[Mapping[str, Any]]) -> bytes:
+    # Takes asyncpg records as they are, without copying them into dicts first.
+    return b"[" + b",".join(
+        b'{"id":%d,"user_id":%d,"text":%s}' % (message["id"], message["user_id"], dumps(message["text"]))
+        for message in messages
+    ) + b"]"
+
+
+def encode_page(messages: Iterable[Mapping[str, Any]], **fields: Any) -> bytes:
+    parts = [b'"messages":' + encode_messages(messages)]
+    parts.extend(b'"%s":%s' % (name.encode(), dumps(value)) for name, value in fields.items())
+    return b"{" + b",".join(parts) + b"}"
@@ -1,18 +1,125 @@
+import re
+import time
+import asyncio
 import asyncpg
 import logging.config
-from typing import Any, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
 
-from config.logger import LOGGING
+from config.logger import configure_logging
 from src.backoff.backoff import retry_database_connection
+from src.db_connector.statements import STATEMENTS, StatementRegistry
+from src.metrics.metrics import REGISTRY
 
-logging.config.dictConfig(LOGGING)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+QUERY_LATENCY = REGISTRY.histogram(
+    "chat_db_query_duration_seconds", "Query time including the wait for a pool connection", ["query"]
+)
+QUERY_ERRORS = REGISTRY.counter("chat_db_query_errors_total", "Failed queries", ["query"])
+
+_TABLE_RE = re.compile(r"awesome_chat\.(\w+)")
+_query_labels: Dict[str, str] = {}
+
+_WRITE_RE = re.compile(
+    r"\b(insert|update|delete|merge|create|alter|drop|truncate|lock|nextval|setval|pg_advisory\w*|pg_try_advisory\w*)\b"
+    r"|\bfor\s+(no\s+key\s+)?(update|share)\b",
+    re.IGNORECASE,
+)
+_read_only_queries: Dict[str, bool] = {}
+
+# Errors after which a replica is skipped for a while and the read is repeated on the primary: the replica is
+# down, restarting or cancelled the query because of a conflict with recovery.
+REPLICA_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.exceptions.OperatorInterventionError,
+    asyncpg.exceptions.SerializationError,
+)
+
+
+def query_label(query: str) -> str:
+    # "<statement> <first table>", e.g. "select messages", computed once per distinct query text.
+    label = _query_labels.get(query)
+    if label is None:
+        words = query.split(None, 1)
+        table = _TABLE_RE.search(query)
+        label = f"{words[0].lower() if words else ''} {table.group(1) if table else '-'}"
+        _query_labels[query] = label
+    return label
+
+
+def is_read_only(query: str) -> bool:
+    # Only SELECTs (WITH ... SELECT included) that neither write nor lock rows can run on a replica.
+    read_only = _read_only_queries.get(query)
+    if read_only is None:
+        words = query.split(None, 1)
+        read_only = bool(words) and words[0].lower() in ("select", "with") and _WRITE_RE.search(query) is None
+        _read_only_queries[query] = read_only
+    return read_only
+
 
 class AsyncDatabaseConnector:
-    def __init__(self, database_url: str) -> None:
+    def __init__(
+        self,
+        database_url: str,
+        use_pool: bool = False,
+        min_size: int = 2,
+        max_size: int = 10,
+        acquire_timeout: Optional[float] = 5.0,
+        max_inactive_lifetime: float = 300.0,
+        health_check_interval: float = 30.0,
+        replica_urls: Sequence[str] = (),
+        replica_retry_interval: float = 5.0,
+        statements: StatementRegistry = STATEMENTS,
+        prepare_statements: bool = True,
+    ) -> None:
         self.database_url: str = database_url
         self.connection: Optional[asyncpg.Connection] = None
+        self.pool: Optional[asyncpg.Pool] = None
+        self.use_pool = use_pool
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_inactive_lifetime = max_inactive_lifetime
+        self.health_check_interval = health_check_interval
+        # server pid -> monotonic time of the last successful health check
+        self._last_health_check: Dict[int, float] = {}
+        self._acquired = 0
+        self._acquire_timeouts = 0
+        self._health_check_failures = 0
+        # Registered statements are prepared on every new connection and run() executes them by name.
+        self.statements = statements
+        self.prepare_statements = prepare_statements
+        self._read_only = False
+        self._statements_prepared = 0
+        self._statement_prepare_failures = 0
+        # Read-only fetches go round-robin to the replicas, everything else to database_url. A replica that
+        # fails is skipped for replica_retry_interval seconds.
+        self.replicas: List[AsyncDatabaseConnector] = [
+            AsyncDatabaseConnector(
+                url,
+                use_pool=use_pool,
+                min_size=min_size,
+                max_size=max_size,
+                acquire_timeout=acquire_timeout,
+                max_inactive_lifetime=max_inactive_lifetime,
+                health_check_interval=health_check_interval,
+                statements=statements,
+                prepare_statements=prepare_statements,
+            )
+            for url in replica_urls
+        ]
+        for replica in self.replicas:
+            replica._read_only = True
+        self.replica_retry_interval = replica_retry_interval
+        self._replica_down_until = [0.0] * len(self.replicas)
+        self._next_replica = 0
+        self._replica_reads = 0
+        self._replica_failovers = 0
 
     async def _establish_connection(self) -> None:
         try:
@@ -24,42 +131,212 @@ class AsyncDatabaseConnector:
 
     @retry_database_connection()
     async def connect(self) -> None:
+        await self._open()
+        # A replica that is down doesn't hold up the start, reads go to the primary until it is back.
+        await asyncio.gather(*(self._open_replica(index) for index in range(len(self.replicas))))
+
+    async def _open(self) -> None:
+        # Prepared statements stay in the statement cache for the life of the connection instead of the
+        # default 300 seconds, with room for all of them next to the ad hoc queries.
+        cache_options: Dict[str, Any] = {}
+        if self.prepare_statements:
+            cache_options = {
+                "statement_cache_size": 100 + len(self.statements),
+                "max_cached_statement_lifetime": 0,
+            }
         try:
-            self.connection = await asyncpg.connect(self.database_url)
+            if self.use_pool:
+                self.pool = await asyncpg.create_pool(
+                    self.database_url,
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    max_inactive_connection_lifetime=self.max_inactive_lifetime,
+                    setup=self._health_check,
+                    init=self._prepare_statements if self.prepare_statements else None,
+                    **cache_options,
+                )
+            else:
+                self.connection = await asyncpg.connect(self.database_url, **cache_options)
+                if self.prepare_statements:
+                    await self._prepare_statements(self.connection)
         except asyncpg.PostgresError as e:
             logger.error("Error connecting to database: %s", e)
             raise e
 
+    async def _open_replica(self, index: int) -> bool:
+        replica = self.replicas[index]
+        if replica.pool is not None or (replica.connection is not None and not replica.connection.is_closed()):
+            return True
+        try:
+            await asyncio.wait_for(replica._open(), self.acquire_timeout)
+        except REPLICA_ERRORS + (asyncpg.PostgresError,) as e:
+            self._mark_replica_down(index, e)
+            return False
+        return True
+
+    def _mark_replica_down(self, index: int, error: BaseException) -> None:
+        self._replica_down_until[index] = time.monotonic() + self.replica_retry_interval
+        self._replica_failovers += 1
+        logger.warning("Replica %d is unavailable, reading from the primary: %s", index, error)
+
+    def _pick_replica(self) -> Optional[int]:
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            index = self._next_replica
+            self._next_replica = (index + 1) % len(self.replicas)
+            if self._replica_down_until[index] <= now:
+                return index
+        return None
+
+    async def _read(self, method: str, *args: Any) -> Any:
+        index = self._pick_replica()
+        if index is not None and await self._open_replica(index):
+            try:
+                result = await getattr(self.replicas[index], method)(*args)
+            except REPLICA_ERRORS as e:
+                self._mark_replica_down(index, e)
+            else:
+                self._replica_reads += 1
+                return result
+        return await getattr(self, method)(*args, primary=True)
+
     async def close(self) -> None:
+        for replica in self.replicas:
+            await replica.close()
+        if self.pool:
+            await self.pool.close()
         if self.connection:
             await self.connection.close()
 
-    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+    async def _health_check(self, connection: asyncpg.Connection) -> None:
+        # Called by the pool on every acquire; only pings connections that have been idle for a while.
+        pid = connection.get_server_pid()
+        now = time.monotonic()
+        if now - self._last_health_check.get(pid, 0.0) < self.health_check_interval:
+            return
         try:
+            await connection.fetchval("SELECT 1")
+        except Exception:
+            self._health_check_failures += 1
+            self._last_health_check.pop(pid, None)
+            raise
+        if len(self._last_health_check) > 4 * self.max_size:
+            # Drop entries left behind by connections the pool has already recycled.
+            self._last_health_check.clear()
+        self._last_health_check[pid] = now
+
+    async def _prepare_statements(self, connection: asyncpg.Connection) -> None:
+        # Pool init: parse and plan every registered statement before the connection serves its first request.
+        # asyncpg has no call that only fills its statement cache: prepare() returns a separate statement object
+        # that fetch*() and execute() never look at. executemany() does the cache lookup first, preparing and
+        # caching the statement on a miss, and then runs it once per argument tuple, so with an empty list it
+        # stops right after the prepare. Later calls with the same text find it in the cache. A statement that
+        # fails here (e.g. before the migrations ran) is prepared again on first use.
+        for name, query in self.statements.items():
+            if self._read_only and not is_read_only(query):
+                continue
+            try:
+                await connection.executemany(query, [])
+            except asyncpg.PostgresError as e:
+                self._statement_prepare_failures += 1
+                logger.warning("Could not prepare statement %s: %s", name, e)
+            else:
+                self._statements_prepared += 1
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        if not self.use_pool:
             if not self.connection:
                 await self.connect()
-            if kwargs:
-                return await self.connection.execute(query, *args, **kwargs)
-            else:
-                return await self.connection.execute(query, *args)
+            yield self.connection
+            return
+
+        if self.pool is None:
+            await self.connect()
+        try:
+            connection = await self.pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._acquire_timeouts += 1
+            logger.error("Timed out acquiring a database connection from the pool")
+            raise
+        except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError) as e:
+            # The health check closed a dead connection, the pool will open a fresh one.
+            logger.warning("Pool connection failed health check, retrying: %s", e)
+            connection = await self.pool.acquire(timeout=self.acquire_timeout)
+        self._acquired += 1
+        try:
+            yield connection
+        finally:
+            await self.pool.release(connection)
+
+    @asynccontextmanager
+    async def _measure(self, query: str) -> AsyncIterator[None]:
+        label = query_label(query)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            QUERY_ERRORS.labels(label).inc()
+            raise
+        finally:
+            QUERY_LATENCY.labels(label).observe(time.perf_counter() - started)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "mode": "pool" if self.use_pool else "single",
+            "acquired": self._acquired,
+            "acquire_timeouts": self._acquire_timeouts,
+            "health_check_failures": self._health_check_failures,
+        }
+        if self.pool is not None:
+            stats.update(
+                size=self.pool.get_size(),
+                idle=self.pool.get_idle_size(),
+                min_size=self.pool.get_min_size(),
+                max_size=self.pool.get_max_size(),
+            )
+        if self.replicas:
+            now = time.monotonic()
+            stats.update(
+                replicas=len(self.replicas),
+                healthy_replicas=sum(1 for down_until in self._replica_down_until if down_until <= now),
+                replica_reads=self._replica_reads,
+                replica_failovers=self._replica_failovers,
+            )
+        if self.prepare_statements:
+            stats.update(
+                statements_prepared=self._statements_prepared,
+                statement_prepare_failures=self._statement_prepare_failures,
+            )
+        return stats
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        try:
+            async with self._measure(query), self.acquire() as connection:
+                if kwargs:
+                    return await connection.execute(query, *args, **kwargs)
+                else:
+                    return await connection.execute(query, *args)
         except asyncpg.PostgresError as e:
             logger.error("Error executing query: %s", e)
             raise e
 
-    async def fetch(self, query: str, *args: Any) -> list:
+    async def fetch(self, query: str, *args: Any, primary: bool = False) -> list:
+        if self.replicas and not primary and is_read_only(query):
+            return await self._read("fetch", query, *args)
         try:
-            if not self.connection:
-                await self.connect()
-            return await self.connection.fetch(query, *args)
+            async with self._measure(query), self.acquire() as connection:
+                return await connection.fetch(query, *args)
         except asyncpg.PostgresError as e:
             logger.error("Error fetching data: %s", e)
             raise e
 
-    async def fetchrow(self, query: str, *args: Any) -> asyncpg.Record:
+    async def fetchrow(self, query: str, *args: Any, primary: bool = False) -> asyncpg.Record:
+        if self.replicas and not primary and is_read_only(query):
+            return await self._read("fetchrow", query, *args)
         try:
-            if not self.connection:
-                await self.connect()
-            return await self.connection.fetchrow(query, *args)
+            async with self._measure(query), self.acquire() as connection:
+                return await connection.fetchrow(query, *args)
         except asyncpg.PostgresError as e:
             logger.error("Error fetching row: %s", e)
             raise e
@@ -67,14 +344,22 @@ class AsyncDatabaseConnector:
             logger.error("Error fetching row: %s", e)
             raise e
 
-    async def fetchval(self, query: str, *args: Any) -> Any:
+    async def fetchval(self, query: str, *args: Any, primary: bool = False) -> Any:
+        if self.replicas and not primary and is_read_only(query):
+            return await self._read("fetchval", query, *args)
         try:
-            if not self.connection:
-                await self.connect()
-            return await self.connection.fetchval(query, *args)
+            async with self._measure(query), self.acquire() as connection:
+                return await connection.fetchval(query, *args)
         except asyncpg.PostgresError as e:
             logger.error("Error fetching value: %s", e)
             raise e
 
     async def insert_data(self, query: str, *args: Any, **kwargs: Any) -> str:
         return await self.execute(query, *args, **kwargs)
+
+    async def run(self, method: str, name: str, *args: Any, primary: bool = False) -> Any:
+        # Runs a registered statement by name: method is "execute", "fetch", "fetchrow" or "fetchval".
+        query = self.statements[name]
+        if method == "execute":
+            return await self.execute(query, *args)
+        return await getattr(self, method)(query, *args, primary=primary)
@@ -0,0 +1,30 @@
+from typing import Dict, ItemsView
+
+
+class StatementRegistry:
+    # Named SQL statements. AsyncDatabaseConnector prepares every one of them on each new connection and
+    # runs them by name with run().
+    def __init__(self) -> None:
+        self._queries: Dict[str, str] = {}
+
+    def register(self, name: str, query: str) -> str:
+        existing = self._queries.get(name)
+        if existing is not None and existing != query:
+            raise ValueError(f"Statement {name} is already registered with a different query")
+        self._queries[name] = query
+        return query
+
+    def __getitem__(self, name: str) -> str:
+        return self._queries[name]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._queries
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def items(self) -> ItemsView[str, str]:
+        return self._queries.items()
+
+
+STATEMENTS = StatementRegistry()
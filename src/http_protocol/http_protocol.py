@@ -1,4 +1,4 @@
-import json
+import time
 import urllib.parse
 import logging.config
 from typing import Any, Optional, Dict, List, Tuple
@@ -8,54 +8,280 @@ import asyncio
 import asyncpg
 
 from config.config import settings
-from config.logger import LOGGING
-from src.message_sender.message_sender import MessageLimitReachedError
+from config.logger import configure_logging
+from src.codec.json_codec import JSONDecodeError, dumps, encode_page, loads
+from src.http_protocol.responses import (
+    END_OF_MESSAGE,
+    HEALTH_OK,
+    MESSAGE_RECEIVED,
+    PreparedResponse,
+    error_response,
+    method_not_allowed,
+)
+from src.http_protocol.reaper import ConnectionReaper
+from src.metrics.metrics import REGISTRY
+from src.message_sender.message_sender import MessageLimitReachedError, RecipientNotFoundError
+from src.pubsub.hub import MessageHub, Subscription
 
-logging.config.dictConfig(LOGGING)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
+# path -> {method: handler name}. Handlers take (parsed_target, request_headers, request_body).
+ROUTES: Dict[str, Dict[bytes, str]] = {
+    "/status": {b"GET": "route_status"},
+    "/health": {b"GET": "route_health"},
+    "/metrics": {b"GET": "route_metrics"},
+    "/subscribe": {b"GET": "route_subscribe"},
+    "/connect": {b"POST": "route_connect"},
+    "/send": {b"POST": "route_send"},
+    "/send-private": {b"POST": "route_send_private"},
+    "/send-batch": {b"POST": "route_send_batch"},
+    "/status-batch": {b"POST": "route_status_batch"},
+}
+# Event streams stay open for as long as the client listens, so max_request_time doesn't apply.
+STREAMING_ROUTES = {"/subscribe"}
+
+
+def allowed_methods(path: str) -> List[bytes]:
+    # HEAD runs the GET handler and sends the response head only; event streams have no head to send on its own.
+    methods = list(ROUTES[path])
+    if b"GET" in methods and path not in STREAMING_ROUTES:
+        methods.append(b"HEAD")
+    return methods
+
+
+METHOD_NOT_ALLOWED = {path: method_not_allowed(allowed_methods(path)) for path in ROUTES}
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REQUESTS = REGISTRY.counter("chat_http_requests_total", "Handled requests", ["route", "status"])
+REQUEST_LATENCY = REGISTRY.histogram("chat_http_request_duration_seconds", "Request handling time", ["route"])
+REQUEST_TIMEOUTS = REGISTRY.counter("chat_http_request_timeouts_total", "Requests cut off by max_request_time")
+RATE_LIMITED = REGISTRY.counter("chat_rate_limit_rejections_total", "Sends rejected by the message rate limit")
+OPEN_CONNECTIONS = REGISTRY.gauge("chat_http_open_connections", "Open client connections")
+IN_FLIGHT = REGISTRY.gauge("chat_http_requests_in_flight", "Request tasks currently running")
+
+
 class HTTPProtocol(asyncio.Protocol):
-    def __init__(self, auth_instance: Any, message_sender_instance: Any) -> None:
-        self.connection: h11.Connection = h11.Connection(h11.SERVER)
+    def __init__(
+        self,
+        auth_instance: Any,
+        message_sender_instance: Any,
+        message_hub: Optional[MessageHub] = None,
+        connection_reaper: Optional[ConnectionReaper] = None,
+    ) -> None:
+        self.connection: h11.Connection = h11.Connection(
+            h11.SERVER, max_incomplete_event_size=settings.max_header_size
+        )
         self.auth_instance = auth_instance
         self.message_sender_instance = message_sender_instance
+        self.message_hub = message_hub
+        self.connection_reaper = connection_reaper
+        # When the first byte of a request head arrived, until the head is complete.
+        self.header_started: Optional[float] = None
+        self.subscription: Optional[Subscription] = None
         self.request_buffer: bytearray = bytearray()
         self.current_request: Optional[h11.Request] = None
         self.transport: Optional[asyncio.transports.Transport] = None
+        self.request_task: Optional[asyncio.Task] = None
+        self.idle_timer: Optional[asyncio.TimerHandle] = None
+        self.requests_served = 0
+        self.close_after_response = False
+        # Responses to HEAD requests go out without their body.
+        self.head_request = False
+        self.response_status = 0
+        self.reading_paused = False
+        self.writing_paused = False
+        self.can_write = asyncio.Event()
+        self.can_write.set()
 
     def connection_made(self, transport: asyncio.transports.Transport) -> None:
         self.transport = transport
-        logger.info("New connection has been made ...")
+        OPEN_CONNECTIONS.inc()
+        transport.set_write_buffer_limits(high=settings.write_buffer_high_water)
+        logger.debug("New connection has been made ...")
+        if self.connection_reaper is not None:
+            self.connection_reaper.register(self)
+        self._reset_idle_timer()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        OPEN_CONNECTIONS.dec()
+        self._cancel_idle_timer()
+        self.can_write.set()
+        if self.connection_reaper is not None:
+            self.connection_reaper.unregister(self)
+        if self.subscription is not None:
+            self.message_hub.unsubscribe(self.subscription)
 
     def data_received(self, data: bytes) -> None:
+        if self.transport.is_closing():
+            return
+        self._cancel_idle_timer()
+        if self.header_started is None and self.request_task is None and self.connection.their_state is h11.IDLE:
+            self.header_started = time.monotonic()
         self.connection.receive_data(data)
-        while True:
-            event = self.connection.next_event()
-            logger.info("Event to handle %s", event)
-            if event is h11.NEED_DATA:
+        self._process_events()
+        if self.request_task is None and not self.transport.is_closing():
+            self._reset_idle_timer()
+        self._update_reading()
+
+    def pause_writing(self) -> None:
+        self.writing_paused = True
+        self.can_write.clear()
+        self._update_reading()
+
+    def resume_writing(self) -> None:
+        self.writing_paused = False
+        self.can_write.set()
+        self._update_reading()
+
+    async def drain(self) -> None:
+        if self.writing_paused:
+            await self.can_write.wait()
+
+    def _update_reading(self) -> None:
+        # Stop reading while the client doesn't read our responses, or while pipelined requests pile up behind
+        # the one being handled.
+        if self.transport.is_closing():
+            return
+        should_pause = self.writing_paused or (
+            self.request_task is not None
+            and len(self.connection.trailing_data[0]) > settings.read_buffer_high_water
+        )
+        if should_pause and not self.reading_paused:
+            self.transport.pause_reading()
+            self.reading_paused = True
+        elif not should_pause and self.reading_paused:
+            self.transport.resume_reading()
+            self.reading_paused = False
+
+    def _process_events(self) -> None:
+        # One request at a time: pipelined requests wait in the h11 buffer until the current response is complete,
+        # so responses go out in request order.
+        debug = logger.isEnabledFor(logging.DEBUG)
+        while self.request_task is None:
+            event = self._next_event()
+            if debug:
+                logger.debug("Event to handle %s", type(event).__name__)
+            if event is None or event is h11.NEED_DATA or event is h11.PAUSED:
                 break
 
             if isinstance(event, h11.Request):
-                self.current_request = event
-                self.request_buffer.clear()
+                if not self._start_request(event):
+                    break
 
             elif isinstance(event, h11.Data):
-                logger.info("Received data new %s", event.data)
+                if len(self.request_buffer) + len(event.data) > settings.max_body_size:
+                    self._reject(settings.error_messages.payload_too_large)
+                    break
                 self.request_buffer.extend(event.data)
 
             elif isinstance(event, h11.EndOfMessage):
-                logger.info("Request buffer sent to event loop %s", self.request_buffer)
                 request_copy = self.current_request
                 buffer_copy = self.request_buffer.copy()
-                asyncio.create_task(self.handle_request(request_copy, buffer_copy))
+                self.request_task = asyncio.create_task(self._run_request(request_copy, buffer_copy))
+                IN_FLIGHT.inc()
                 self.current_request = None
                 self.request_buffer.clear()
 
             elif isinstance(event, h11.ConnectionClosed):
-                # Handling the connection close event
-                if self.connection.our_state is h11.MUST_CLOSE:
-                    self.transport.close()
+                self.transport.close()
+                break
+
+    def _next_event(self) -> Any:
+        try:
+            return self.connection.next_event()
+        except h11.RemoteProtocolError as e:
+            if e.error_status_hint == 431:
+                self._reject(settings.error_messages.request_header_fields_too_large)
+            else:
+                self._reject(settings.error_messages.bad_request)
+            return None
+
+    def _start_request(self, request: h11.Request) -> bool:
+        self.header_started = None
+        self.current_request = request
+        self.request_buffer.clear()
+        self.requests_served += 1
+        self.head_request = request.method.upper() == b"HEAD"
+        max_requests = settings.keep_alive_max_requests
+        self.close_after_response = bool(max_requests) and self.requests_served >= max_requests
+        # h11 only limits headers that arrive in pieces, a complete head can be larger.
+        header_size = len(request.target) + sum(len(name) + len(value) + 4 for name, value in request.headers)
+        if header_size > settings.max_header_size:
+            self._reject(settings.error_messages.request_header_fields_too_large)
+            return False
+        if self._content_length(request) > settings.max_body_size:
+            self._reject(settings.error_messages.payload_too_large)
+            return False
+        return True
+
+    def _content_length(self, request: h11.Request) -> int:
+        for name, value in request.headers:
+            if name == b"content-length":
+                return int(value)
+        return 0
+
+    def _reject(self, error: Any) -> None:
+        # The rest of the request is never read, so the connection can't be reused.
+        logger.warning("Rejecting request: %s", error.message)
+        self.close_after_response = True
+        if self.connection.our_state in (h11.IDLE, h11.SEND_RESPONSE):
+            self.send_error_response(error)
+        self.transport.close()
+
+    async def _run_request(self, request_headers: h11.Request, request_body: bytes) -> None:
+        try:
+            try:
+                await self.handle_request(request_headers, request_body)
+            except Exception as e:
+                logger.error("Unhandled error in handle_request: %s", e)
+                if self.connection.our_state is h11.SEND_RESPONSE:
+                    self.send_error_response(settings.error_messages.internal_server_error)
+            # Don't start on the next pipelined request while the client isn't reading responses.
+            await self.drain()
+        finally:
+            self.request_task = None
+            IN_FLIGHT.dec()
+        self._finish_cycle()
+
+    def _finish_cycle(self) -> None:
+        if self.transport.is_closing():
+            return
+        if self.connection.our_state is h11.SEND_RESPONSE:
+            # The handler returned without answering.
+            self.send_error_response(settings.error_messages.not_found)
+        if self.connection.our_state is h11.DONE and self.connection.their_state is h11.DONE:
+            self.connection.start_next_cycle()
+            self.head_request = False
+            self._process_events()
+            if self.request_task is None and not self.transport.is_closing():
+                self._reset_idle_timer()
+            self._update_reading()
+        else:
+            # Connection: close from either side, or a response that was cut short.
+            self.transport.close()
+
+    def _reset_idle_timer(self) -> None:
+        self._cancel_idle_timer()
+        if settings.keep_alive_timeout > 0:
+            loop = asyncio.get_running_loop()
+            self.idle_timer = loop.call_later(settings.keep_alive_timeout, self._close_idle_connection)
+
+    def _cancel_idle_timer(self) -> None:
+        if self.idle_timer is not None:
+            self.idle_timer.cancel()
+            self.idle_timer = None
+
+    def reap(self) -> None:
+        logger.debug("Closing connection that didn't send a complete request head")
+        self.header_started = None
+        self.transport.close()
+
+    def _close_idle_connection(self) -> None:
+        logger.debug("Closing idle keep-alive connection")
+        self.idle_timer = None
+        self.transport.close()
 
     def _extract_token(self, headers: List[Tuple[bytes, bytes]]) -> Optional[str]:
         for name, value in headers:
@@ -64,63 +290,111 @@ class HTTPProtocol(asyncio.Protocol):
         return None
 
     async def handle_request(self, request_headers: h11.Request, request_body: bytes) -> None:
-        logger.info("Proceeding with headers %s  and body  %s", request_headers, request_body)
+        logger.debug(
+            "Handling %s %s with a %d byte body", request_headers.method, request_headers.target, len(request_body)
+        )
+        started = time.perf_counter()
+        self.response_status = 0
         parsed_target = urllib.parse.urlparse(request_headers.target.decode("utf-8"))
+        # Unknown paths share one label, so scanners can't grow the metrics without bound.
+        route = parsed_target.path if parsed_target.path in ROUTES else "unmatched"
+        try:
+            await self._dispatch(parsed_target, request_headers, request_body)
+        finally:
+            REQUESTS.labels(route, self.response_status).inc()
+            if route not in STREAMING_ROUTES:
+                REQUEST_LATENCY.labels(route).observe(time.perf_counter() - started)
+
+    async def _dispatch(
+        self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
+    ) -> None:
+        routes = ROUTES.get(parsed_target.path)
+        if routes is None:
+            self.send_error_response(settings.error_messages.not_found)
+            return
         method = request_headers.method.upper()
+        if method == b"HEAD" and method not in routes and b"HEAD" in allowed_methods(parsed_target.path):
+            method = b"GET"
+        handler_name = routes.get(method)
+        if handler_name is None:
+            self.send_prepared(METHOD_NOT_ALLOWED[parsed_target.path])
+            return
+        handler = getattr(self, handler_name)
         try:
-            if method == b"GET":
-                await asyncio.wait_for(
-                    self.handle_get_request(parsed_target, request_headers, request_body),
-                    timeout=settings.max_request_time,
-                )
-            elif method == b"POST":
+            if parsed_target.path in STREAMING_ROUTES:
+                await handler(parsed_target, request_headers, request_body)
+            else:
                 await asyncio.wait_for(
-                    self.handle_post_request(parsed_target, request_headers, request_body),
-                    timeout=settings.max_request_time,
+                    handler(parsed_target, request_headers, request_body), timeout=settings.max_request_time
                 )
         except asyncio.TimeoutError:
             logger.error("Request processing timed out")
+            REQUEST_TIMEOUTS.inc()
             self.send_error_response(settings.error_messages.request_timeout_error)
 
-    async def handle_get_request(
+    async def route_status(
+        self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
+    ) -> None:
+        await self.handle_status(parsed_target, self._extract_token(request_headers.headers))
+
+    async def route_health(
+        self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
+    ) -> None:
+        await self.handle_health()
+
+    async def route_subscribe(
         self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
     ) -> None:
-        if parsed_target.path == "/status":
-            token = self._extract_token(request_headers.headers)
-            await self.handle_status(parsed_target, token)
-        elif parsed_target.path == "/health":
-            await self.handle_health()
+        await self.handle_subscribe(self._extract_token(request_headers.headers))
 
-    async def handle_post_request(
+    async def route_metrics(
+        self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
+    ) -> None:
+        self.send_response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+    async def route_connect(
+        self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
+    ) -> None:
+        await self.handle_connect()
+
+    async def route_send(
+        self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
+    ) -> None:
+        await self.handle_send(request_body, self._extract_token(request_headers.headers))
+
+    async def route_send_private(
         self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
     ) -> None:
         token = self._extract_token(request_headers.headers)
-        if parsed_target.path == "/connect":
-            await self.handle_connect()
-        elif parsed_target.path == "/send":
-            await self.handle_send(request_body, token)
-        elif parsed_target.path == "/send-private":
-            await self.handle_send(request_body, token, message_type="private")
+        await self.handle_send(request_body, token, message_type="private")
+
+    async def route_send_batch(
+        self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
+    ) -> None:
+        await self.handle_send_batch(request_body, self._extract_token(request_headers.headers))
+
+    async def route_status_batch(
+        self, parsed_target: urllib.parse.ParseResult, request_headers: h11.Request, request_body: bytes
+    ) -> None:
+        await self.handle_status_batch(request_body, self._extract_token(request_headers.headers))
 
     async def handle_health(self) -> None:
         try:
-            response = {"status": "OK"}
-            response_info = json.dumps(response).encode()
-            self.send_response(response_info)
+            self.send_prepared(HEALTH_OK)
         except Exception as e:
             logger.error("Error in handle_health: %s", e)
             self.send_error_response(settings.error_messages.internal_server_error)
 
     async def handle_connect(self) -> None:
         try:
-            logger.info("User auth starting ...")
+            logger.debug("User auth starting ...")
             token = await self.auth_instance.create_user_and_token()
 
             if token is not None:
                 user_id = await self.auth_instance.get_user_id_from_token(token)
                 if user_id is not None:
                     response = {"status": "success", "user_id": user_id}
-                    connection_info = json.dumps(response).encode()
+                    connection_info = dumps(response)
                     self.send_response(connection_info, token)
                 else:
                     self.send_error_response(settings.error_messages.unauthorized)
@@ -134,11 +408,14 @@ class HTTPProtocol(asyncio.Protocol):
         query_params = urllib.parse.parse_qs(parsed_url.query)
         return {k: v[0] for k, v in query_params.items()}
 
+    def _get_int_param(self, query_params: Dict[str, str], name: str) -> Optional[int]:
+        value = query_params.get(name)
+        return int(value) if value is not None else None
+
     async def handle_status(self, parsed_target: urllib.parse.ParseResult, token: Optional[str] = None) -> None:
         try:
             query_params = self._parse_query_params(parsed_target)
             chat_type = query_params.get("chat_type")
-            recipient_id = query_params.get("recipient_id")
 
             if not token:
                 self.send_error_response(settings.error_messages.unauthorized)
@@ -149,60 +426,91 @@ class HTTPProtocol(asyncio.Protocol):
                 self.send_error_response(settings.error_messages.unauthorized)
                 return
 
+            try:
+                recipient_id = self._get_int_param(query_params, "recipient_id")
+                since_id = self._get_int_param(query_params, "since_id")
+                before_id = self._get_int_param(query_params, "before_id")
+                limit = self._get_int_param(query_params, "limit")
+            except ValueError:
+                self.send_error_response(settings.error_messages.invalid_parameters)
+                return
+
             if chat_type == "common":
-                all_messages = await self.message_sender_instance.retrieve_messages()
-                response = {"messages": all_messages}
+                messages = await self.message_sender_instance.retrieve_messages(since_id=since_id, user_id=user_id)
+                # The client passes "cursor" back as since_id on its next poll to receive only newer messages.
+                cursor = max((message["id"] for message in messages), default=since_id)
+                response = {"messages": messages, "cursor": cursor}
             elif chat_type == "private" and recipient_id:
-                recipient_id = int(recipient_id)
-                if await self.message_sender_instance.is_user_exists(recipient_id):
-                    private_messages = await self.message_sender_instance.retrieve_private_messages(
-                        user_id, recipient_id
-                    )
-                else:
-                    logger.error("Error: Recipient user has not been found")
-                    self.send_error_response(settings.error_messages.user_has_not_been_found)
+                response = await self._private_status(user_id, recipient_id, since_id, before_id, limit)
+                if response is None:
                     return
-                response = {"messages": private_messages}
             else:
                 self.send_error_response(settings.error_messages.invalid_parameters)
                 return
 
-            status_info = json.dumps(response).encode()
+            status_info = encode_page(**response)
             self.send_response(status_info)
 
         except Exception as e:
             logger.error("Error in handle_status: %s", e)
             self.send_error_response(settings.error_messages.internal_server_error)
 
+    async def _private_status(
+        self,
+        user_id: int,
+        recipient_id: int,
+        since_id: Optional[int],
+        before_id: Optional[int],
+        limit: Optional[int],
+    ) -> Optional[Dict[str, Any]]:
+        if (since_id is not None and before_id is not None) or (limit is not None and limit <= 0):
+            self.send_error_response(settings.error_messages.invalid_parameters)
+            return None
+        if not await self.message_sender_instance.is_user_exists(recipient_id):
+            logger.error("Error: Recipient user has not been found")
+            self.send_error_response(settings.error_messages.user_has_not_been_found)
+            return None
+
+        page_size = min(limit or settings.private_history_page_size, settings.private_history_max_page_size)
+        # One extra row tells whether there is another page.
+        messages = await self.message_sender_instance.retrieve_private_messages(
+            user_id, recipient_id, since_id=since_id, before_id=before_id, limit=page_size + 1
+        )
+        has_more = len(messages) > page_size
+        messages = messages[:page_size]
+        # "cursor" is the since_id for the next poll, "next_cursor" the before_id of the next (older) page.
+        cursor = None if before_id is not None else max((message["id"] for message in messages), default=since_id)
+        next_cursor = messages[-1]["id"] if has_more and since_id is None else None
+        return {"messages": messages, "cursor": cursor, "next_cursor": next_cursor}
+
     async def handle_send(self, request_body: bytes, token: str, message_type: Optional[str] = None) -> None:
         try:
-            logger.info("Received data %s", request_body)
             user_id = await self.auth_instance.get_user_id_from_token(token)
             if user_id:
-                message_data = json.loads(request_body.decode("utf-8"))
+                message_data = loads(request_body)
                 text = message_data["text"]
-                recipient_id = message_data.get("recipient_id")
+                recipient_id = message_data.get("recipient_id") if message_type == "private" else None
 
-                message_id = await self.message_sender_instance.send_message(user_id, text)
-                if message_type == "private" and recipient_id is not None:
+                if recipient_id is not None:
                     recipient_id = int(recipient_id)
-                    if await self.message_sender_instance.is_user_exists(recipient_id):
-                        await self.message_sender_instance.insert_private_message(message_id, recipient_id)
-                    else:
-                        logger.error("Error: Recipient user has not been found")
-                        self.send_error_response(settings.error_messages.user_has_not_been_found)
-                        return
-                response_body = json.dumps({"message": "Message received."}).encode("utf-8")
-                self.send_response(response_body)
+                    message_id = await self.message_sender_instance.send_private_message(user_id, recipient_id, text)
+                else:
+                    message_id = await self.message_sender_instance.send_message(user_id, text)
+                self.send_prepared(MESSAGE_RECEIVED)
+                self._publish(message_id, user_id, text, recipient_id)
             else:
                 logger.error("Error: User has not been found")
                 self.send_error_response(settings.error_messages.user_has_not_been_found)
-        except json.JSONDecodeError:
+        except JSONDecodeError:
             self.send_error_response(settings.error_messages.invalid_json_format)
         except KeyError:
             self.send_error_response(settings.error_messages.missing_required_data)
         except MessageLimitReachedError:
+            RATE_LIMITED.inc()
             self.send_error_response(settings.error_messages.message_limit_reached)
+        except RecipientNotFoundError:
+            logger.error("Error: Recipient user has not been found")
+            self.send_error_response(settings.error_messages.user_has_not_been_found)
         except asyncpg.PostgresError:
             logger.error("Database error occurred.")
             self.send_error_response(settings.error_messages.database_error)
@@ -210,29 +518,203 @@ class HTTPProtocol(asyncio.Protocol):
             logger.error("Unexpected error: %s", e)
             self.send_error_response(settings.error_messages.internal_server_error)
 
-    def send_response(self, body: bytes, token: Optional[str] = None) -> None:
+    def _batch_items(self, data: Dict[str, Any], key: str) -> Optional[List[Any]]:
+        # The list under key of a batch request, None (with the error sent) if it isn't a usable one.
+        items = data[key]
+        if not isinstance(items, list) or not 0 < len(items) <= settings.batch_max_items:
+            self.send_error_response(settings.error_messages.invalid_parameters)
+            return None
+        return items
+
+    def _batch_messages(self, data: Dict[str, Any]) -> Optional[List[Tuple[int, str]]]:
+        items = self._batch_items(data, "messages")
+        if items is None:
+            return None
+        try:
+            messages = [(int(item["recipient_id"]), item["text"]) for item in items]
+        except (TypeError, ValueError):
+            messages = []
+        if not messages or not all(isinstance(text, str) for _, text in messages):
+            self.send_error_response(settings.error_messages.invalid_parameters)
+            return None
+        return messages
+
+    def _batch_conversations(
+        self, data: Dict[str, Any]
+    ) -> Optional[Tuple[List[Tuple[int, Optional[int]]], Optional[int]]]:
+        items = self._batch_items(data, "conversations")
+        if items is None:
+            return None
+        try:
+            conversations = [
+                (int(item["recipient_id"]), None if item.get("since_id") is None else int(item["since_id"]))
+                for item in items
+            ]
+            limit = None if data.get("limit") is None else int(data["limit"])
+        except (AttributeError, TypeError, ValueError):
+            conversations, limit = [], None
+        recipient_ids = {recipient_id for recipient_id, _ in conversations}
+        if not conversations or len(recipient_ids) != len(conversations) or (limit is not None and limit <= 0):
+            self.send_error_response(settings.error_messages.invalid_parameters)
+            return None
+        return conversations, limit
+
+    async def handle_send_batch(self, request_body: bytes, token: Optional[str]) -> None:
+        try:
+            user_id = await self.auth_instance.get_user_id_from_token(token) if token else None
+            if not user_id:
+                logger.error("Error: User has not been found")
+                self.send_error_response(settings.error_messages.user_has_not_been_found)
+                return
+            messages = self._batch_messages(loads(request_body))
+            if messages is None:
+                return
+
+            sent = await self.message_sender_instance.send_private_messages(user_id, messages)
+            results = []
+            for (recipient_id, text), outcome in zip(messages, sent):
+                if isinstance(outcome, Exception):
+                    results.append({"recipient_id": recipient_id, **self._batch_error(outcome)})
+                else:
+                    results.append({"recipient_id": recipient_id, "status_code": 200, "message_id": outcome})
+                    self._publish(outcome, user_id, text, recipient_id)
+            self.send_response(dumps({"results": results}))
+        except JSONDecodeError:
+            self.send_error_response(settings.error_messages.invalid_json_format)
+        except (KeyError, TypeError):
+            self.send_error_response(settings.error_messages.missing_required_data)
+        except asyncpg.PostgresError:
+            logger.error("Database error occurred.")
+            self.send_error_response(settings.error_messages.database_error)
+        except Exception as e:
+            logger.error("Unexpected error: %s", e)
+            self.send_error_response(settings.error_messages.internal_server_error)
+
+    def _batch_error(self, error: Exception) -> Dict[str, Any]:
+        if isinstance(error, MessageLimitReachedError):
+            RATE_LIMITED.inc()
+            http_error = settings.error_messages.message_limit_reached
+        else:
+            http_error = settings.error_messages.user_has_not_been_found
+        return {"status_code": http_error.status_code, "error": http_error.message}
+
+    async def handle_status_batch(self, request_body: bytes, token: Optional[str]) -> None:
+        try:
+            user_id = await self.auth_instance.get_user_id_from_token(token) if token else None
+            if user_id is None:
+                self.send_error_response(settings.error_messages.unauthorized)
+                return
+            parsed = self._batch_conversations(loads(request_body))
+            if parsed is None:
+                return
+            conversations, limit = parsed
+
+            # One existence check and one read for all the conversations.
+            existing = await self.message_sender_instance.existing_users([item[0] for item in conversations])
+            found = [conversation for conversation in conversations if conversation[0] in existing]
+            page_size = min(limit or settings.private_history_page_size, settings.private_history_max_page_size)
+            pages = {}
+            if found:
+                pages = await self.message_sender_instance.retrieve_private_conversations(
+                    user_id, found, limit=page_size + 1
+                )
+            parts = []
+            for recipient_id, since_id in conversations:
+                if recipient_id not in existing:
+                    parts.append(dumps({"recipient_id": recipient_id, **self._batch_error(RecipientNotFoundError())}))
+                    continue
+                messages = pages[recipient_id]
+                has_more = len(messages) > page_size
+                messages = messages[:page_size]
+                # Same cursors as a private /status: "cursor" for the next poll, "next_cursor" for older pages.
+                cursor = max((message["id"] for message in messages), default=since_id)
+                next_cursor = messages[-1]["id"] if has_more and since_id is None else None
+                parts.append(encode_page(messages, recipient_id=recipient_id, cursor=cursor, next_cursor=next_cursor))
+            self.send_response(b'{"conversations":[' + b",".join(parts) + b"]}")
+        except JSONDecodeError:
+            self.send_error_response(settings.error_messages.invalid_json_format)
+        except (KeyError, TypeError):
+            self.send_error_response(settings.error_messages.missing_required_data)
+        except Exception as e:
+            logger.error("Error in handle_status_batch: %s", e)
+            self.send_error_response(settings.error_messages.internal_server_error)
+
+    def _publish(self, message_id: int, user_id: int, text: str, recipient_id: Optional[int]) -> None:
+        if self.message_hub is None:
+            return
+        message = {"id": message_id, "user_id": user_id, "text": text}
+        if recipient_id is None:
+            message["chat_type"] = "common"
+        else:
+            message["chat_type"] = "private"
+            message["recipient_id"] = recipient_id
+        self.message_hub.publish(message, recipient_id=recipient_id)
+
+    async def handle_subscribe(self, token: Optional[str]) -> None:
+        if self.message_hub is None:
+            self.send_error_response(settings.error_messages.not_found)
+            return
+        user_id = await self.auth_instance.get_user_id_from_token(token) if token else None
+        if user_id is None:
+            self.send_error_response(settings.error_messages.unauthorized)
+            return
+
+        subscription = self.message_hub.subscribe(user_id)
+        self.subscription = subscription
+        try:
+            headers = [("Content-Type", "text/event-stream"), ("Cache-Control", "no-cache")]
+            self.send(h11.Response(status_code=200, headers=headers))
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.get(), timeout=settings.subscribe_heartbeat_interval
+                    )
+                except asyncio.TimeoutError:
+                    self.send(h11.Data(data=b": keep-alive\n\n"))
+                    continue
+                if message is None:
+                    break
+                event = b"id: %d\nevent: message\ndata: %s\n\n" % (message["id"], dumps(message))
+                self.send(h11.Data(data=event))
+                # A stalled reader backs up its hub queue, where the slow consumer policy applies.
+                await self.drain()
+            self.send(h11.EndOfMessage())
+        finally:
+            self.message_hub.unsubscribe(subscription)
+            self.subscription = None
+        # The hub ends the stream only for slow consumers, those are disconnected.
+        self.transport.close()
+
+    def send_response(self, body: bytes, token: Optional[str] = None, content_type: str = "application/json") -> None:
         headers = [
-            ("Content-Type", "application/json"),
+            ("Content-Type", content_type),
             ("content-length", str(len(body))),
         ]
         if token:
             headers.append((("Authorization", str(token))))
         response = h11.Response(status_code=200, headers=headers)
-        self.send(response)
-        self.send(h11.Data(data=body))
-        self.send(h11.EndOfMessage())
+        self.send(response, h11.Data(data=body), END_OF_MESSAGE)
 
     def send_error_response(self, error: Any) -> None:
-        response_body = json.dumps({"error": error.message}).encode("utf-8")
-        headers = [
-            ("Content-Type", "application/json"),
-            ("Content-Length", str(len(response_body))),
-        ]
-        response = h11.Response(status_code=error.status_code, headers=headers)
-        self.send(response)
-        self.send(h11.Data(data=response_body))
-        self.send(h11.EndOfMessage())
-
-    def send(self, event: h11.Event) -> None:
-        data = self.connection.send(event)
-        self.transport.write(data)
+        self.send_prepared(error_response(error))
+
+    def send_prepared(self, prepared: PreparedResponse) -> None:
+        self.send(prepared.response, prepared.data, END_OF_MESSAGE)
+
+    def send(self, *events: h11.Event) -> None:
+        if self.head_request:
+            events = tuple(event for event in events if not isinstance(event, h11.Data))
+        data = b"".join(self.connection.send(self._prepare_event(event)) for event in events)
+        if not self.transport.is_closing():
+            self.transport.write(data)
+
+    def _prepare_event(self, event: h11.Event) -> h11.Event:
+        if isinstance(event, h11.Response):
+            self.response_status = event.status_code
+            if self.close_after_response:
+                return h11.Response(
+                    status_code=event.status_code,
+                    headers=[*event.headers, (b"connection", b"close")],
+                    reason=event.reason,
+                )
+        return event
@@ -0,0 +1,64 @@
+import time
+import asyncio
+import logging.config
+from typing import Any, Dict, Optional, Set
+
+from config.logger import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+class ConnectionReaper:
+    # Closes connections that started sending a request but didn't finish its head within header_timeout seconds.
+    # One periodic sweep over all connections instead of a timer per connection and chunk.
+    def __init__(self, header_timeout: float = 10.0, interval: float = 1.0) -> None:
+        self.header_timeout = header_timeout
+        self.interval = interval
+        self.connections: Set[Any] = set()
+        self.reaped = 0
+        self.sweeps = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, protocol: Any) -> None:
+        self.connections.add(protocol)
+
+    def unregister(self, protocol: Any) -> None:
+        self.connections.discard(protocol)
+
+    async def start(self) -> None:
+        if self._task is None and self.header_timeout > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sweep()
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        deadline = (now if now is not None else time.monotonic()) - self.header_timeout
+        expired = [
+            protocol
+            for protocol in self.connections
+            if protocol.header_started is not None and protocol.header_started < deadline
+        ]
+        for protocol in expired:
+            protocol.reap()
+            self.connections.discard(protocol)
+        self.sweeps += 1
+        self.reaped += len(expired)
+        if expired:
+            logger.warning("Reaped %d connections without a request head in %ss", len(expired), self.header_timeout)
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        return {"connections": len(self.connections), "reaped": self.reaped, "sweeps": self.sweeps}
@@ -0,0 +1,47 @@
+from typing import Any, Dict, Sequence, Tuple
+
+import h11
+
+from config.config import settings, ErrorMessages, HTTPError
+from src.codec.json_codec import dumps
+
+END_OF_MESSAGE = h11.EndOfMessage()
+
+
+class PreparedResponse:
+    # h11 events for a response whose body never changes, built once and sent as they are.
+    __slots__ = ("body", "response", "data")
+
+    def __init__(self, status_code: int, body: bytes, headers: Sequence[Tuple[str, str]] = ()) -> None:
+        self.body = body
+        self.response = h11.Response(
+            status_code=status_code,
+            headers=[("Content-Type", "application/json"), ("Content-Length", str(len(body))), *headers],
+        )
+        self.data = h11.Data(data=body)
+
+
+def json_response(status_code: int, payload: Any, headers: Sequence[Tuple[str, str]] = ()) -> PreparedResponse:
+    return PreparedResponse(status_code, dumps(payload), headers)
+
+
+HEALTH_OK = json_response(200, {"status": "OK"})
+MESSAGE_RECEIVED = json_response(200, {"message": "Message received."})
+
+ERROR_RESPONSES: Dict[Tuple[int, str], PreparedResponse] = {}
+for _name in ErrorMessages.model_fields:
+    _error = getattr(settings.error_messages, _name)
+    ERROR_RESPONSES[(_error.status_code, _error.message)] = json_response(_error.status_code, {"error": _error.message})
+
+
+def error_response(error: HTTPError) -> PreparedResponse:
+    prepared = ERROR_RESPONSES.get((error.status_code, error.message))
+    if prepared is None:
+        prepared = json_response(error.status_code, {"error": error.message})
+    return prepared
+
+
+def method_not_allowed(allowed_methods: Sequence[bytes]) -> PreparedResponse:
+    error = settings.error_messages.method_not_allowed
+    allow = ", ".join(method.decode() for method in allowed_methods)
+    return json_response(error.status_code, {"error": error.message}, [("Allow", allow)])
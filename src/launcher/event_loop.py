@@ -0,0 +1,27 @@
+import asyncio
+import logging.config
+
+from config.logger import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+EVENT_LOOPS = ("auto", "asyncio", "uvloop")
+
+
+def install_event_loop(name: str) -> str:
+    # Sets the loop policy used by the next asyncio.run() and returns the implementation actually selected.
+    if name not in EVENT_LOOPS:
+        raise ValueError(f"Unknown event loop: {name}, expected one of {', '.join(EVENT_LOOPS)}")
+    if name == "asyncio":
+        asyncio.set_event_loop_policy(None)
+        return "asyncio"
+    try:
+        import uvloop
+    except ImportError:
+        if name == "uvloop":
+            logger.warning("uvloop is not installed, falling back to the default asyncio event loop")
+        asyncio.set_event_loop_policy(None)
+        return "asyncio"
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
@@ -0,0 +1,98 @@
+import time
+import signal
+import logging.config
+import multiprocessing
+from multiprocessing.connection import wait
+from typing import Any, Callable, List, Optional, Tuple
+
+from config.logger import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+class WorkerSlot:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restart_at = 0.0
+        self.restart_delay = 0.0
+        self.restarts = 0
+
+
+class WorkerSupervisor:
+    # Workers that die sooner than this after starting are restarted with an increasing delay.
+    min_uptime = 5.0
+    max_restart_delay = 30.0
+
+    def __init__(
+        self,
+        target: Callable[..., Any],
+        args: Tuple[Any, ...],
+        workers: int,
+        shutdown_timeout: float = 10.0,
+        poll_interval: float = 0.2,
+    ) -> None:
+        self.target = target
+        self.args = args
+        self.slots: List[WorkerSlot] = [WorkerSlot(index) for index in range(workers)]
+        self.shutdown_timeout = shutdown_timeout
+        self.poll_interval = poll_interval
+        self._stopping = False
+
+    def stop(self, *_: Any) -> None:
+        self._stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for slot in self.slots:
+            self._start(slot)
+        logger.info("Started %d workers", len(self.slots))
+        try:
+            while not self._stopping:
+                sentinels = [slot.process.sentinel for slot in self.slots if slot.process is not None]
+                wait(sentinels, timeout=self.poll_interval)
+                self._reap_and_restart()
+        finally:
+            self._shutdown()
+
+    def _start(self, slot: WorkerSlot) -> None:
+        process = multiprocessing.Process(target=self.target, args=self.args, name=f"worker-{slot.index}")
+        process.start()
+        slot.process = process
+        slot.started_at = time.monotonic()
+        logger.info("Worker %d started with pid %s", slot.index, process.pid)
+
+    def _reap_and_restart(self) -> None:
+        now = time.monotonic()
+        for slot in self.slots:
+            process = slot.process
+            if process is not None and not process.is_alive():
+                process.join()
+                uptime = now - slot.started_at
+                logger.error("Worker %d (pid %s) exited with code %s", slot.index, process.pid, process.exitcode)
+                if uptime < self.min_uptime:
+                    slot.restart_delay = min(max(slot.restart_delay * 2, 0.5), self.max_restart_delay)
+                else:
+                    slot.restart_delay = 0.0
+                slot.restart_at = now + slot.restart_delay
+                slot.process = None
+            if slot.process is None and now >= slot.restart_at and not self._stopping:
+                slot.restarts += 1
+                self._start(slot)
+
+    def _shutdown(self) -> None:
+        logger.info("Stopping workers ...")
+        processes = [slot.process for slot in self.slots if slot.process is not None and slot.process.is_alive()]
+        for process in processes:
+            process.terminate()
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.error("Worker pid %s did not stop in time, killing it", process.pid)
+                process.kill()
+                process.join()
+        logger.info("All workers stopped")
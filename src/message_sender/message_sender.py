@@ -1,13 +1,14 @@
 import logging.config
-from typing import Any, List, Dict
-from datetime import datetime, timedelta
-
-import asyncpg
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, List, Dict, Mapping, Optional, Sequence, Set, Tuple, Union
 
 from config.config import settings
-from config.logger import LOGGING
+from config.logger import configure_logging
+from src.rate_limiter.rate_limiter import BaseRateLimiter
+from src.storage.base import BaseStorage
 
-logging.config.dictConfig(LOGGING)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -15,121 +16,173 @@ class MessageLimitReachedError(Exception):
     pass
 
 
+class RecipientNotFoundError(Exception):
+    pass
+
+
 class MessageSender:
-    def __init__(self, db_connector: asyncpg.Connection):
-        self.db_connector = db_connector
+    def __init__(
+        self,
+        storage: BaseStorage,
+        rate_limiter: Optional[BaseRateLimiter] = None,
+        history_buffer_size: int = 0,
+    ):
+        self.storage = storage
+        self.rate_limiter = rate_limiter or storage.create_rate_limiter("postgres")
+        # Ring buffer of the latest common messages, oldest first. Every common message with an id greater than
+        # _recent_floor is in it; None means the buffer hasn't been warmed up and reads go to the storage.
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=history_buffer_size)
+        self._recent_floor: Optional[int] = None
+
+    async def warm_up(self) -> None:
+        if not self._recent.maxlen:
+            return
+        messages = await self.storage.latest_common_messages(self._recent.maxlen)
+        self._recent.clear()
+        self._recent.extend(dict(message) for message in reversed(messages))
+        if len(messages) == self._recent.maxlen:
+            self._recent_floor = messages[-1]["id"] - 1
+        else:
+            self._recent_floor = 0
+        logger.info("Warmed up common history buffer with %d messages", len(messages))
+
+    def _remember(self, message: Dict[str, Any]) -> None:
+        recent = self._recent
+        if self._recent_floor is None or message["id"] <= self._recent_floor:
+            return
+        if not recent or message["id"] > recent[-1]["id"]:
+            if len(recent) == recent.maxlen:
+                self._recent_floor = recent[0]["id"]
+            recent.append(message)
+            return
+        # Concurrent sends can finish out of id order, keep the buffer sorted.
+        messages = sorted([*recent, message], key=lambda item: item["id"])
+        if len(messages) > recent.maxlen:
+            self._recent_floor = messages[-recent.maxlen - 1]["id"]
+            messages = messages[-recent.maxlen:]
+        recent.clear()
+        recent.extend(messages)
+
+    def _recent_messages(self, since_id: Optional[int]) -> Optional[List[Mapping[str, Any]]]:
+        if self._recent_floor is None:
+            return None
+        limit = settings.common_history_limit
+        if since_id is None:
+            if len(self._recent) < limit and self._recent_floor:
+                return None
+            return list(islice(reversed(self._recent), limit))
+        if since_id < self._recent_floor:
+            return None
+        return list(islice((message for message in self._recent if message["id"] > since_id), limit))
 
     async def send_message(self, user_id: int, text: str) -> int:
         if not await self._can_send_message(user_id):
             raise MessageLimitReachedError("Message limit reached. Please wait until the limit is reset.")
-        try:
-            message_id = await self.insert_message(user_id, text)
-        except asyncpg.PostgresError as e:
-            logger.error("Error establishing database connection: %s", e)
-            raise
-        except Exception as e:
-            logger.error("Error establishing database connection: %s", e)
+        message_id = await self.storage.insert_message(user_id, text)
+        self._remember({"id": message_id, "user_id": user_id, "text": text})
         return message_id
 
     async def send_private_message(self, user_id: int, recipient_id: int, text: str) -> int:
-        try:
-            message_id = await self.insert_message(user_id, text)
-            await self.insert_private_message(message_id, recipient_id)
-        except asyncpg.PostgresError as e:
-            logger.error("Error establishing database connection: %s", e)
-            raise
-        return message_id
-
-    async def _can_send_message(self, user_id: int) -> bool:
-        current_time = datetime.utcnow()
-        try:
-            message_limit = await self.db_connector.fetchrow(
-                "SELECT message_count, reset_time FROM awesome_chat.message_limits WHERE user_id = $1", user_id
-            )
-        except asyncpg.PostgresError as e:
-            logger.error("Error establishing database connection: %s", e)
-            raise
-        logger.info("Message limit is %s", message_limit)
-
-        if not message_limit or message_limit["reset_time"] <= current_time:
-            await self.db_connector.insert_data(
-                "INSERT INTO awesome_chat.message_limits (user_id, message_count, reset_time) " "VALUES ($1, 1, $2) ",
-                user_id,
-                current_time + timedelta(hours=1),
-            )
-            return True
-
-        elif message_limit["message_count"] < settings.max_messages_per_hour:
-            await self.db_connector.execute(
-                "UPDATE awesome_chat.message_limits SET message_count = message_count + 1 WHERE user_id = $1", user_id
+        if self.rate_limiter.in_process:
+            if not await self._can_send_message(user_id):
+                raise MessageLimitReachedError("Message limit reached. Please wait until the limit is reset.")
+            result = await self.storage.insert_private_message(user_id, recipient_id, text)
+            if not result["recipient_exists"]:
+                # Nothing was sent, so like the quota statement the send doesn't count.
+                await self.rate_limiter.release(user_id)
+        else:
+            # The storage takes the quota together with the insert.
+            result = await self.storage.insert_private_message(
+                user_id, recipient_id, text, rate_limiter=self.rate_limiter
             )
-            return True
-
+        if not result["recipient_exists"]:
+            raise RecipientNotFoundError(f"Recipient {recipient_id} has not been found")
+        if not result["within_limit"]:
+            raise MessageLimitReachedError("Message limit reached. Please wait until the limit is reset.")
+        return result["message_id"]
+
+    async def send_private_messages(
+        self, user_id: int, messages: Sequence[Tuple[int, str]]
+    ) -> List[Union[int, Exception]]:
+        # One result per (recipient_id, text), in order: the message id, or the error send_private_message
+        # would have raised for it.
+        if self.rate_limiter.in_process:
+            results = await self._insert_within_process_quota(user_id, messages)
         else:
-            return False
-
-    async def insert_message(self, user_id: int, text: str) -> int:
-        query = """
-        INSERT INTO awesome_chat.messages (user_id, text, timestamp)
-        VALUES ($1, $2, CURRENT_TIMESTAMP)
-        RETURNING id
-        """
-        try:
-            message_id = await self.db_connector.fetchval(query, user_id, text)
-        except asyncpg.PostgresError as e:
-            logger.error("Error establishing database connection: %s", e)
-            raise
-        return message_id
+            results = await self.storage.insert_private_messages(user_id, messages, rate_limiter=self.rate_limiter)
+        sent: List[Union[int, Exception]] = []
+        for (recipient_id, _), result in zip(messages, results):
+            if not result["recipient_exists"]:
+                sent.append(RecipientNotFoundError(f"Recipient {recipient_id} has not been found"))
+            elif not result["within_limit"]:
+                sent.append(MessageLimitReachedError("Message limit reached. Please wait until the limit is reset."))
+            else:
+                sent.append(result["message_id"])
+        return sent
+
+    async def _insert_within_process_quota(
+        self, user_id: int, messages: Sequence[Tuple[int, str]]
+    ) -> List[Optional[Mapping[str, Any]]]:
+        # Like send_private_batch_with_quota: only messages to existing recipients take the quota, in order, until
+        # it runs out.
+        existing = await self.storage.existing_users([recipient_id for recipient_id, _ in messages])
+        results: List[Optional[Mapping[str, Any]]] = []
+        granted: List[int] = []
+        limit_reached = False
+        for position, (recipient_id, _) in enumerate(messages):
+            if recipient_id not in existing:
+                results.append({"recipient_exists": False, "within_limit": True})
+            elif not limit_reached and await self._can_send_message(user_id):
+                granted.append(position)
+                results.append(None)
+            else:
+                limit_reached = True
+                results.append({"recipient_exists": True, "within_limit": False})
+        if granted:
+            inserted = await self.storage.insert_private_messages(user_id, [messages[position] for position in granted])
+            for position, result in zip(granted, inserted):
+                results[position] = result
+        return results
 
-    async def insert_private_message(self, message_id: int, recipient_id: int) -> None:
-        query = """
-        INSERT INTO awesome_chat.private_messages (id, recipient_id)
-        VALUES ($1, $2)
-        """
-        try:
-            await self.db_connector.execute(query, message_id, recipient_id)
-        except asyncpg.PostgresError as e:
-            logger.error("Error establishing database connection: %s", e)
-            raise
-
-    async def retrieve_messages(self) -> List[Dict[str, Any]]:
-        query = """
-        SELECT m.user_id, m.text
-        FROM awesome_chat.messages m
-        LEFT JOIN awesome_chat.private_messages pm ON m.id = pm.id
-        WHERE pm.id IS NULL
-        ORDER BY m.timestamp DESC
-        LIMIT 20
-        """
-        try:
-            messages = await self.db_connector.fetch(query)
-        except asyncpg.PostgresError as e:
-            logger.error("Error establishing database connection: %s", e)
-            raise
-        return [dict(message) for message in messages]
-
-    async def retrieve_private_messages(self, user_id: int, recipient_id: int) -> List[Dict[str, Any]]:
-        query = """
-        SELECT m.user_id, m.text
-        FROM awesome_chat.messages m
-        JOIN awesome_chat.private_messages pm ON m.id = pm.id
-        WHERE (pm.recipient_id = $1 AND m.user_id = $2) OR (pm.recipient_id = $2 AND m.user_id = $1)
-        ORDER BY m.timestamp DESC
-        """
-        try:
-            private_messages = await self.db_connector.fetch(query, user_id, recipient_id)
-        except asyncpg.PostgresError as e:
-            logger.error("Error establishing database connection: %s", e)
-            raise
-        return [dict(message) for message in private_messages]
+    async def _can_send_message(self, user_id: int) -> bool:
+        return await self.rate_limiter.try_acquire(user_id)
+
+    async def retrieve_messages(
+        self, since_id: Optional[int] = None, user_id: Optional[int] = None
+    ) -> List[Mapping[str, Any]]:
+        # Without a cursor: the newest messages, newest first. With since_id: only newer ones, oldest first.
+        # Rows come back as the storage returns them (asyncpg records for Postgres), the HTTP layer encodes them
+        # without copying.
+        recent_messages = self._recent_messages(since_id)
+        if recent_messages is not None:
+            return recent_messages
+        return await self.storage.common_messages(settings.common_history_limit, since_id=since_id, user_id=user_id)
+
+    async def retrieve_private_messages(
+        self,
+        user_id: int,
+        recipient_id: int,
+        since_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Mapping[str, Any]]:
+        # since_id reads forward (oldest first), otherwise pages go backwards from before_id (newest first).
+        limit = limit or settings.private_history_page_size
+        return await self.storage.private_messages(
+            user_id, recipient_id, limit, since_id=since_id, before_id=before_id
+        )
+
+    async def retrieve_private_conversations(
+        self, user_id: int, conversations: Sequence[Tuple[int, Optional[int]]], limit: Optional[int] = None
+    ) -> Dict[int, List[Mapping[str, Any]]]:
+        # retrieve_private_messages for several (recipient_id, since_id) conversations, keyed by recipient_id.
+        limit = limit or settings.private_history_page_size
+        return await self.storage.private_conversations(user_id, conversations, limit)
+
+    async def existing_users(self, user_ids: Sequence[int]) -> Set[int]:
+        return await self.storage.existing_users(user_ids)
 
     async def is_user_exists(self, user_id: int) -> bool:
-        exists = False
-        query = "SELECT EXISTS(SELECT 1 FROM awesome_chat.users WHERE id = $1)"
-        try:
-            exists = await self.db_connector.fetchval(query, user_id)
-            logger.info("Cheking is user %s exists, result %s ", user_id, exists)
-        except Exception as e:
-            logger.error("Error checking user existence: %s", e)
-            raise
+        exists = await self.storage.user_exists(user_id)
+        logger.debug("Cheking is user %s exists, result %s ", user_id, exists)
         return exists
@@ -0,0 +1,117 @@
+import asyncio
+import logging.config
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.logger import configure_logging
+from src.db_connector.statements import STATEMENTS
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+# Group commit of queued common messages. Rows are numbered by position, so ids come out of nextval() in the
+# order the messages were queued.
+INSERT_MESSAGE_BATCH_QUERY = STATEMENTS.register(
+    "insert_message_batch",
+    """
+INSERT INTO awesome_chat.messages (user_id, text, timestamp)
+SELECT batch.user_id, batch.text, CURRENT_TIMESTAMP
+FROM unnest($1::int[], $2::text[]) WITH ORDINALITY AS batch(user_id, text, position)
+ORDER BY batch.position
+RETURNING id
+""",
+)
+
+
+class MessageWriteBatcher:
+    def __init__(self, db_connector: Any, max_batch_size: int = 100, max_wait: float = 0.005) -> None:
+        self.db_connector = db_connector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        # None in the queue tells the writer to stop once everything queued before it has been written.
+        self._queue: "asyncio.Queue[Optional[Tuple[int, str, asyncio.Future]]]" = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.batches = 0
+        self.messages = 0
+        self.max_fill = 0
+        self.failed_batches = 0
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._queue.put_nowait(None)
+        self._full.set()
+        await self._task
+        self._task = None
+
+    async def insert(self, user_id: int, text: str) -> int:
+        if self._task is None or self._stopping:
+            raise RuntimeError("Write batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((user_id, text, future))
+        if self._queue.qsize() >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if self.max_wait > 0 and self._queue.qsize() < self.max_batch_size - 1:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+            if stop:
+                return
+
+    async def _write(self, batch: List[Tuple[int, str, asyncio.Future]]) -> None:
+        try:
+            rows = await self.db_connector.run(
+                "fetch", "insert_message_batch", [user_id for user_id, _, _ in batch], [text for _, text, _ in batch]
+            )
+            message_ids = sorted(row["id"] for row in rows)
+            if len(message_ids) != len(batch):
+                raise RuntimeError(f"Inserted {len(message_ids)} messages for a batch of {len(batch)}")
+        except Exception as e:
+            logger.error("Error writing message batch of %d: %s", len(batch), e)
+            self.failed_batches += 1
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.messages += len(batch)
+        self.max_fill = max(self.max_fill, len(batch))
+        for (_, _, future), message_id in zip(batch, message_ids):
+            if not future.done():
+                future.set_result(message_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "messages": self.messages,
+            "failed_batches": self.failed_batches,
+            "pending": self._queue.qsize(),
+            "max_fill": self.max_fill,
+            "average_fill": self.messages / self.batches if self.batches else 0.0,
+            "fill_ratio": self.messages / (self.batches * self.max_batch_size) if self.batches else 0.0,
+        }
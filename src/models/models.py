@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import expression, func
 
@@ -21,12 +21,13 @@ class User(Base):
 
 class Message(Base):
     __tablename__ = "messages"
-    __table_args__ = {"schema": "awesome_chat"}
+    # Range partitioned by month, partitions are created by the server's PartitionMaintainer.
+    __table_args__ = {"schema": "awesome_chat", "postgresql_partition_by": "RANGE (timestamp)"}
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("awesome_chat.users.id"))
+    user_id = Column(Integer, ForeignKey("awesome_chat.users.id"), index=True)
     text = Column(String)
-    timestamp = Column(DateTime, server_default=func.now())
+    timestamp = Column(DateTime, primary_key=True, server_default=func.now(), index=True)
 
     user = relationship("User", back_populates="messages")
 
@@ -35,18 +36,21 @@ class PrivateMessage(Message):
     __tablename__ = "private_messages"
     __table_args__ = {"schema": "awesome_chat"}
 
-    id = Column(Integer, ForeignKey("awesome_chat.messages.id"), primary_key=True)
-    recipient_id = Column(Integer, ForeignKey("awesome_chat.users.id"))
+    # No foreign key: messages.id alone isn't unique on the partitioned table.
+    id = column_property(Column(Integer, primary_key=True, autoincrement=False), Message.id)
+    recipient_id = Column(Integer, ForeignKey("awesome_chat.users.id"), index=True)
 
     recipient = relationship("User")
 
+    __mapper_args__ = {"inherit_condition": id.columns[0] == Message.id}
+
 
 class UserSession(Base):
     __tablename__ = "user_sessions"
     __table_args__ = {"schema": "awesome_chat"}
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("awesome_chat.users.id"))
-    session_token = Column(String)
+    user_id = Column(Integer, ForeignKey("awesome_chat.users.id"), index=True)
+    session_token = Column(String, index=True)
     is_active = Column(Boolean, server_default=expression.true())
 
     user = relationship("User", back_populates="sessions")
@@ -67,7 +71,7 @@ class MessageLimit(Base):
     __tablename__ = "message_limits"
     __table_args__ = {"schema": "awesome_chat"}
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("awesome_chat.users.id"))
+    user_id = Column(Integer, ForeignKey("awesome_chat.users.id"), unique=True)
     message_count = Column(Integer, server_default=expression.literal(0))
     reset_time = Column(DateTime, server_default=func.now())
 
@@ -0,0 +1,206 @@
+import re
+import asyncio
+import logging.config
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import asyncpg
+
+from config.logger import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Any value works as long as nothing else in the database takes the same advisory lock.
+MAINTENANCE_LOCK_ID = 7_310_422
+ARCHIVE_SCHEMA = "awesome_chat_archive"
+PARTITION_RE = re.compile(r"^messages_p(\d{4})_(\d{2})$")
+
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"messages_p{month.year:04d}_{month.month:02d}"
+
+
+class PartitionMaintainer:
+    # awesome_chat.messages is range partitioned by timestamp, one partition per month (see the
+    # partition_messages migration). Keeps premake_months partitions ahead of the current month and detaches
+    # the ones that ended more than retention_days ago, moving them with their private_messages rows to
+    # awesome_chat_archive or dropping them. retention_days=0 keeps everything.
+    partitions_query = """
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+    WHERE ns.nspname = 'awesome_chat' AND parent.relname = 'messages'
+    """
+    # Month tables that have been detached but not archived or dropped yet, including ones left by a run that
+    # failed in between.
+    detached_query = """
+    SELECT c.relname
+    FROM pg_class c
+    JOIN pg_namespace ns ON ns.oid = c.relnamespace
+    WHERE ns.nspname = 'awesome_chat' AND c.relkind = 'r' AND NOT c.relispartition
+      AND c.relname ~ '^messages_p[0-9]{4}_[0-9]{2}$'
+    ORDER BY c.relname
+    """
+
+    def __init__(
+        self,
+        db_connector: Any,
+        premake_months: int = 3,
+        retention_days: int = 0,
+        retention_action: str = "archive",
+        interval: float = 3600.0,
+    ) -> None:
+        if retention_action not in ("archive", "drop"):
+            raise ValueError(f"Unknown retention action: {retention_action}")
+        self.db_connector = db_connector
+        self.premake_months = premake_months
+        self.retention_days = retention_days
+        self.retention_action = retention_action
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.skipped_runs = 0
+        self.failed_runs = 0
+        self.created = 0
+        self.archived = 0
+        self.dropped = 0
+
+    async def start(self) -> None:
+        await self.run()
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self) -> None:
+        try:
+            async with self.db_connector.acquire() as connection:
+                # With several workers only one of them does the DDL, the others skip this round. A session lock,
+                # since retiring a partition takes several transactions.
+                if not await connection.fetchval("SELECT pg_try_advisory_lock($1)", MAINTENANCE_LOCK_ID):
+                    self.skipped_runs += 1
+                    return
+                try:
+                    await self._maintain(connection)
+                finally:
+                    await connection.fetchval("SELECT pg_advisory_unlock($1)", MAINTENANCE_LOCK_ID)
+        except (asyncpg.PostgresError, OSError) as e:
+            self.failed_runs += 1
+            logger.error("Error maintaining message partitions: %s", e)
+            return
+        self.runs += 1
+
+    async def _maintain(self, connection: asyncpg.Connection) -> None:
+        # Stored timestamps come from CURRENT_TIMESTAMP in the session time zone, so compare against the
+        # database's clock rather than ours.
+        now = await connection.fetchval("SELECT LOCALTIMESTAMP")
+        existing = {row["relname"] for row in await connection.fetch(self.partitions_query)}
+        current = month_start(now)
+        async with connection.transaction():
+            for offset in range(self.premake_months + 1):
+                month = add_months(current, offset)
+                if partition_name(month) not in existing:
+                    await self._create(connection, month)
+        if self.retention_days > 0:
+            cutoff = now - timedelta(days=self.retention_days)
+            # The detach holds ACCESS EXCLUSIVE on awesome_chat.messages, blocking every send and read, so it
+            # commits on its own and the rows are copied or deleted afterwards from the detached table.
+            for month in self._expired(existing, cutoff):
+                async with connection.transaction():
+                    await connection.execute(
+                        f"ALTER TABLE awesome_chat.messages DETACH PARTITION awesome_chat.{partition_name(month)}"
+                    )
+            for row in await connection.fetch(self.detached_query):
+                async with connection.transaction():
+                    await self._retire(connection, row["relname"])
+
+    def _expired(self, partitions: Iterable[str], cutoff: datetime) -> List[date]:
+        months = []
+        for name in partitions:
+            match = PARTITION_RE.match(name)
+            if match is None:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            # A partition goes once every row it can hold is older than the retention period.
+            if datetime.combine(add_months(month, 1), datetime.min.time()) <= cutoff:
+                months.append(month)
+        return sorted(months)
+
+    async def _create(self, connection: asyncpg.Connection, month: date) -> None:
+        await connection.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS awesome_chat.{partition_name(month)}
+            PARTITION OF awesome_chat.messages
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')
+            """
+        )
+        self.created += 1
+        logger.info("Created message partition %s", partition_name(month))
+
+    async def _retire(self, connection: asyncpg.Connection, name: str) -> None:
+        if self.retention_action == "archive":
+            await connection.execute(f"ALTER TABLE awesome_chat.{name} SET SCHEMA {ARCHIVE_SCHEMA}")
+            await connection.execute(
+                f"""
+                INSERT INTO {ARCHIVE_SCHEMA}.private_messages (id, recipient_id)
+                SELECT pm.id, pm.recipient_id
+                FROM awesome_chat.private_messages pm
+                JOIN {ARCHIVE_SCHEMA}.{name} m ON m.id = pm.id
+                ON CONFLICT (id) DO NOTHING
+                """
+            )
+            await connection.execute(
+                f"""
+                DELETE FROM awesome_chat.private_messages pm
+                USING {ARCHIVE_SCHEMA}.{name} m
+                WHERE pm.id = m.id
+                """
+            )
+            self.archived += 1
+            logger.info("Archived message partition %s to %s", name, ARCHIVE_SCHEMA)
+        else:
+            await connection.execute(
+                f"""
+                DELETE FROM awesome_chat.private_messages pm
+                USING awesome_chat.{name} m
+                WHERE pm.id = m.id
+                """
+            )
+            await connection.execute(f"DROP TABLE awesome_chat.{name}")
+            self.dropped += 1
+            logger.info("Dropped message partition %s", name)
+
+    async def _run_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "runs": self.runs,
+            "skipped_runs": self.skipped_runs,
+            "failed_runs": self.failed_runs,
+            "created": self.created,
+            "archived": self.archived,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,92 @@
+import asyncio
+import logging.config
+from typing import Any, Dict, Optional, Set
+
+from config.logger import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    def __init__(self, user_id: int, max_queue_size: int) -> None:
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=max_queue_size)
+        self.closed = False
+        self.dropped = 0
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        # None means the subscription has been closed and the stream should end.
+        if self.closed and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        # Pending messages are discarded, the consumer only needs to see the end of the stream.
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class MessageHub:
+    def __init__(self, max_queue_size: int = 100, slow_consumer_policy: str = "disconnect") -> None:
+        if slow_consumer_policy not in ("disconnect", "drop"):
+            raise ValueError(f"Unknown slow consumer policy: {slow_consumer_policy}")
+        self.max_queue_size = max_queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self._subscribers: Set[Subscription] = set()
+        self._by_user: Dict[int, Set[Subscription]] = {}
+        self.published = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.max_queue_size)
+        self._subscribers.add(subscription)
+        self._by_user.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        self._subscribers.discard(subscription)
+        user_subscriptions = self._by_user.get(subscription.user_id)
+        if user_subscriptions is not None:
+            user_subscriptions.discard(subscription)
+            if not user_subscriptions:
+                del self._by_user[subscription.user_id]
+
+    def publish(self, message: Dict[str, Any], recipient_id: Optional[int] = None) -> None:
+        self.published += 1
+        if recipient_id is None:
+            targets = self._subscribers
+        else:
+            targets = self._by_user.get(message["user_id"], set()) | self._by_user.get(recipient_id, set())
+        for subscription in list(targets):
+            self._deliver(subscription, message)
+
+    def _deliver(self, subscription: Subscription, message: Dict[str, Any]) -> None:
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            if self.slow_consumer_policy == "drop":
+                subscription.dropped += 1
+                self.dropped += 1
+            else:
+                logger.warning("Disconnecting slow subscriber of user %s", subscription.user_id)
+                self.disconnected += 1
+                self.unsubscribe(subscription)
+
+    def close(self) -> None:
+        for subscription in list(self._subscribers):
+            self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+        }
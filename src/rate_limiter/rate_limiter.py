@@ -0,0 +1,218 @@
+import time
+import asyncio
+import logging.config
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, Optional, Set
+
+import asyncpg
+
+from config.config import settings
+from config.logger import configure_logging
+from src.db_connector.statements import STATEMENTS
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# InMemoryRateLimiter: the live windows are written back in batches and read again at startup.
+FLUSH_LIMITS_QUERY = STATEMENTS.register(
+    "flush_message_limits",
+    """
+INSERT INTO awesome_chat.message_limits (user_id, message_count, reset_time)
+SELECT * FROM unnest($1::int[], $2::int[], $3::timestamp[])
+ON CONFLICT (user_id) DO UPDATE
+SET message_count = EXCLUDED.message_count, reset_time = EXCLUDED.reset_time
+""",
+)
+LOAD_LIMITS_QUERY = STATEMENTS.register(
+    "load_message_limits",
+    """
+SELECT user_id, message_count, reset_time
+FROM awesome_chat.message_limits
+WHERE reset_time > $1
+""",
+)
+# PostgresRateLimiter: one message more for the user, no row returned once the limit is reached.
+ACQUIRE_LIMIT_QUERY = STATEMENTS.register(
+    "acquire_message_limit",
+    """
+INSERT INTO awesome_chat.message_limits AS ml (user_id, message_count, reset_time)
+VALUES ($1, 1, $2::timestamp + $3::interval)
+ON CONFLICT (user_id) DO UPDATE
+SET message_count = CASE WHEN ml.reset_time <= $2 THEN 1 ELSE ml.message_count + 1 END,
+    reset_time = CASE WHEN ml.reset_time <= $2 THEN $2::timestamp + $3::interval ELSE ml.reset_time END
+WHERE ml.reset_time <= $2 OR ml.message_count < $4
+RETURNING message_count
+""",
+)
+
+
+class BaseRateLimiter(ABC):
+    # True when the limiter decides without a DB round trip.
+    in_process: bool = False
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    # Records one message for user_id and returns False if that would exceed the limit.
+    @abstractmethod
+    async def try_acquire(self, user_id: int) -> bool:
+        ...
+
+    # Gives back the message try_acquire recorded when it ended up not being sent.
+    async def release(self, user_id: int) -> None:
+        pass
+
+
+class InMemoryRateLimiter(BaseRateLimiter):
+    in_process = True
+
+    def __init__(
+        self,
+        max_messages: int,
+        window_seconds: float = 3600,
+        db_connector: Any = None,
+        flush_interval: float = 5.0,
+        flush_batch_size: int = 500,
+    ) -> None:
+        self.max_messages = max_messages
+        self.window_seconds = window_seconds
+        self.db_connector = db_connector
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        # user_id -> send times (time.time()) inside the current sliding window, oldest first
+        self._windows: Dict[int, Deque[float]] = {}
+        self._dirty: Set[int] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.db_connector is None:
+            return
+        await self.load()
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self.db_connector is not None:
+            await self.flush()
+
+    async def try_acquire(self, user_id: int) -> bool:
+        # No awaits between the check and the update, so concurrent sends can't both take the last slot.
+        now = time.time()
+        window = self._windows.get(user_id)
+        if window is None:
+            window = self._windows[user_id] = deque()
+        self._expire(window, now)
+        if len(window) >= self.max_messages:
+            return False
+        window.append(now)
+        self._dirty.add(user_id)
+        return True
+
+    async def release(self, user_id: int) -> None:
+        window = self._windows.get(user_id)
+        if window:
+            window.pop()
+            self._dirty.add(user_id)
+
+    def _expire(self, window: Deque[float], now: float) -> None:
+        cutoff = now - self.window_seconds
+        while window and window[0] <= cutoff:
+            window.popleft()
+
+    async def load(self) -> None:
+        rows = await self.db_connector.run("fetch", "load_message_limits", datetime.utcnow())
+        for row in rows:
+            # Per-message times aren't persisted: treat the stored count as sent together, expiring at reset_time.
+            sent_at = (row["reset_time"] - datetime(1970, 1, 1)).total_seconds() - self.window_seconds
+            count = min(row["message_count"] or 0, self.max_messages)
+            self._windows[row["user_id"]] = deque([sent_at] * count)
+        logger.info("Loaded message limits for %d users", len(rows))
+
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        now = time.time()
+        user_ids, counts, reset_times = [], [], []
+        for user_id in dirty:
+            window = self._windows.get(user_id)
+            if window is None:
+                continue
+            self._expire(window, now)
+            user_ids.append(user_id)
+            counts.append(len(window))
+            reset_at = window[0] + self.window_seconds if window else now
+            reset_times.append(datetime.utcfromtimestamp(reset_at))
+            if not window:
+                del self._windows[user_id]
+
+        for start in range(0, len(user_ids), self.flush_batch_size):
+            end = start + self.flush_batch_size
+            try:
+                await self.db_connector.run(
+                    "execute", "flush_message_limits", user_ids[start:end], counts[start:end], reset_times[start:end]
+                )
+            except (asyncpg.PostgresError, OSError) as e:
+                logger.error("Error flushing message limits: %s", e)
+                self._dirty.update(user_ids[start:])
+                return
+
+    def prune(self) -> None:
+        now = time.time()
+        for user_id in [user_id for user_id, window in self._windows.items() if user_id not in self._dirty]:
+            window = self._windows[user_id]
+            self._expire(window, now)
+            if not window:
+                del self._windows[user_id]
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            self.prune()
+
+
+class PostgresRateLimiter(BaseRateLimiter):
+    # Single-statement fixed-window counter, safe with several server processes sharing one database.
+    def __init__(self, db_connector: Any, max_messages: int, window_seconds: float = 3600) -> None:
+        self.db_connector = db_connector
+        self.max_messages = max_messages
+        self.window = timedelta(seconds=window_seconds)
+
+    async def try_acquire(self, user_id: int) -> bool:
+        try:
+            message_count = await self.db_connector.run(
+                "fetchval", "acquire_message_limit", user_id, datetime.utcnow(), self.window, self.max_messages
+            )
+        except asyncpg.PostgresError as e:
+            logger.error("Error updating message limit: %s", e)
+            raise
+        return message_count is not None
+
+
+def create_rate_limiter(db_connector: Any, backend: Optional[str] = None) -> BaseRateLimiter:
+    backend = backend or settings.rate_limiter_backend
+    if backend == "memory":
+        return InMemoryRateLimiter(
+            settings.max_messages_per_hour,
+            window_seconds=settings.rate_limiter_window_seconds,
+            db_connector=db_connector,
+            flush_interval=settings.rate_limiter_flush_interval,
+            flush_batch_size=settings.rate_limiter_flush_batch_size,
+        )
+    if backend == "postgres":
+        return PostgresRateLimiter(
+            db_connector, settings.max_messages_per_hour, window_seconds=settings.rate_limiter_window_seconds
+        )
+    raise ValueError(f"Unknown rate limiter backend: {backend}")
@@ -0,0 +1,110 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from src.metrics.metrics import MetricsRegistry
+from src.rate_limiter.rate_limiter import BaseRateLimiter
+
+
+class BaseStorage(ABC):
+    # Everything Auth and MessageSender keep: users, sessions, common and private messages, and where the
+    # rate limiter keeps its counters. Message rows are mappings with id, user_id and text.
+    name: str = ""
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def register_stats(self, registry: MetricsRegistry) -> None:
+        pass
+
+    @abstractmethod
+    def create_rate_limiter(self, backend: Optional[str] = None) -> BaseRateLimiter:
+        ...
+
+    @abstractmethod
+    async def create_user(self, username: str) -> int:
+        ...
+
+    @abstractmethod
+    async def user_exists(self, user_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def create_session(self, user_id: int, token: str) -> None:
+        ...
+
+    # user_id of an active session, None for unknown or deactivated tokens.
+    @abstractmethod
+    async def get_session_user(self, token: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    async def deactivate_session(self, token: str) -> None:
+        ...
+
+    @abstractmethod
+    async def deactivate_user_sessions(self, user_id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def insert_message(self, user_id: int, text: str) -> int:
+        ...
+
+    # Checks the recipient and inserts the message in one step. With a rate_limiter that keeps its counters
+    # in this storage (in_process is False) the quota is taken in the same step, and only if the recipient
+    # exists. Returns recipient_exists, within_limit and message_id (None unless both hold).
+    @abstractmethod
+    async def insert_private_message(
+        self, user_id: int, recipient_id: int, text: str, rate_limiter: Optional[BaseRateLimiter] = None
+    ) -> Mapping[str, Any]:
+        ...
+
+    # insert_private_message for several (recipient_id, text) pairs at once, one result per pair in the same
+    # order. The quota covers as many messages to existing recipients as it has room for, in order.
+    @abstractmethod
+    async def insert_private_messages(
+        self,
+        user_id: int,
+        messages: Sequence[Tuple[int, str]],
+        rate_limiter: Optional[BaseRateLimiter] = None,
+    ) -> List[Mapping[str, Any]]:
+        ...
+
+    # The given user ids that exist.
+    @abstractmethod
+    async def existing_users(self, user_ids: Sequence[int]) -> Set[int]:
+        ...
+
+    # Newest common messages by id, newest first.
+    @abstractmethod
+    async def latest_common_messages(self, limit: int) -> List[Mapping[str, Any]]:
+        ...
+
+    # Without since_id: the newest common messages, newest first. With it: newer ones, oldest first.
+    # user_id is the reader, storages with replicas use it to show users their own messages.
+    @abstractmethod
+    async def common_messages(
+        self, limit: int, since_id: Optional[int] = None, user_id: Optional[int] = None
+    ) -> List[Mapping[str, Any]]:
+        ...
+
+    # since_id reads forward (oldest first), otherwise pages go backwards from before_id (newest first).
+    @abstractmethod
+    async def private_messages(
+        self,
+        user_id: int,
+        recipient_id: int,
+        limit: int,
+        since_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> List[Mapping[str, Any]]:
+        ...
+
+    # private_messages for several (recipient_id, since_id) conversations at once, keyed by recipient_id.
+    @abstractmethod
+    async def private_conversations(
+        self, user_id: int, conversations: Sequence[Tuple[int, Optional[int]]], limit: int
+    ) -> Dict[int, List[Mapping[str, Any]]]:
+        ...
@@ -0,0 +1,161 @@
+import itertools
+import logging.config
+from collections import deque
+from typing import Any, Deque, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from config.config import settings
+from config.logger import configure_logging
+from src.metrics.metrics import MetricsRegistry
+from src.rate_limiter.rate_limiter import BaseRateLimiter, create_rate_limiter
+from src.storage.base import BaseStorage
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+def _first_after(messages: Deque[Dict[str, Any]], message_id: int) -> int:
+    # Index of the first message with a greater id; ids only grow within a conversation.
+    low, high = 0, len(messages)
+    while low < high:
+        middle = (low + high) // 2
+        if messages[middle]["id"] <= message_id:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+class InMemoryStorage(BaseStorage):
+    # Process-local and lost on restart: users and sessions in dicts, each conversation a deque of its
+    # latest history_size messages, oldest first.
+    name = "memory"
+
+    def __init__(self, history_size: int = 10000) -> None:
+        self.history_size = history_size or None
+        self._user_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._users: Dict[int, str] = {}
+        self._usernames: Set[str] = set()
+        # Active sessions only: token -> user_id, and user_id -> tokens for deactivating a user.
+        self._sessions: Dict[str, int] = {}
+        self._user_sessions: Dict[int, Set[str]] = {}
+        self._common: Deque[Dict[str, Any]] = deque(maxlen=self.history_size)
+        # (smaller user_id, larger user_id) -> messages between the two
+        self._private: Dict[Tuple[int, int], Deque[Dict[str, Any]]] = {}
+
+    def register_stats(self, registry: MetricsRegistry) -> None:
+        registry.register_stats("chat_memory_storage", self.stats, "In-memory storage state")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._users),
+            "sessions": len(self._sessions),
+            "common_messages": len(self._common),
+            "conversations": len(self._private),
+        }
+
+    def create_rate_limiter(self, backend: Optional[str] = None) -> BaseRateLimiter:
+        if (backend or settings.rate_limiter_backend) != "memory":
+            logger.warning("In-memory storage keeps message limits in process, using the memory rate limiter")
+        return create_rate_limiter(None, backend="memory")
+
+    async def create_user(self, username: str) -> int:
+        if username in self._usernames:
+            raise ValueError(f"User {username} already exists")
+        user_id = next(self._user_ids)
+        self._users[user_id] = username
+        self._usernames.add(username)
+        return user_id
+
+    async def user_exists(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    async def create_session(self, user_id: int, token: str) -> None:
+        self._sessions[token] = user_id
+        self._user_sessions.setdefault(user_id, set()).add(token)
+
+    async def get_session_user(self, token: str) -> Optional[int]:
+        return self._sessions.get(token)
+
+    async def deactivate_session(self, token: str) -> None:
+        user_id = self._sessions.pop(token, None)
+        if user_id is None:
+            return
+        tokens = self._user_sessions[user_id]
+        tokens.discard(token)
+        if not tokens:
+            del self._user_sessions[user_id]
+
+    async def deactivate_user_sessions(self, user_id: int) -> None:
+        for token in self._user_sessions.pop(user_id, ()):
+            del self._sessions[token]
+
+    async def insert_message(self, user_id: int, text: str) -> int:
+        message_id = next(self._message_ids)
+        self._common.append({"id": message_id, "user_id": user_id, "text": text})
+        return message_id
+
+    async def insert_private_message(
+        self, user_id: int, recipient_id: int, text: str, rate_limiter: Optional[BaseRateLimiter] = None
+    ) -> Mapping[str, Any]:
+        if recipient_id not in self._users:
+            return {"recipient_exists": False, "within_limit": True, "message_id": None}
+        if rate_limiter is not None and not rate_limiter.in_process and not await rate_limiter.try_acquire(user_id):
+            return {"recipient_exists": True, "within_limit": False, "message_id": None}
+        message_id = next(self._message_ids)
+        key = (min(user_id, recipient_id), max(user_id, recipient_id))
+        conversation = self._private.get(key)
+        if conversation is None:
+            conversation = self._private[key] = deque(maxlen=self.history_size)
+        conversation.append({"id": message_id, "user_id": user_id, "text": text})
+        return {"recipient_exists": True, "within_limit": True, "message_id": message_id}
+
+    async def insert_private_messages(
+        self,
+        user_id: int,
+        messages: Sequence[Tuple[int, str]],
+        rate_limiter: Optional[BaseRateLimiter] = None,
+    ) -> List[Mapping[str, Any]]:
+        return [
+            await self.insert_private_message(user_id, recipient_id, text, rate_limiter=rate_limiter)
+            for recipient_id, text in messages
+        ]
+
+    async def existing_users(self, user_ids: Sequence[int]) -> Set[int]:
+        return {user_id for user_id in user_ids if user_id in self._users}
+
+    async def latest_common_messages(self, limit: int) -> List[Mapping[str, Any]]:
+        return list(itertools.islice(reversed(self._common), limit))
+
+    async def common_messages(
+        self, limit: int, since_id: Optional[int] = None, user_id: Optional[int] = None
+    ) -> List[Mapping[str, Any]]:
+        if since_id is None:
+            return list(itertools.islice(reversed(self._common), limit))
+        start = _first_after(self._common, since_id)
+        return [self._common[index] for index in range(start, min(start + limit, len(self._common)))]
+
+    async def private_messages(
+        self,
+        user_id: int,
+        recipient_id: int,
+        limit: int,
+        since_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> List[Mapping[str, Any]]:
+        conversation = self._private.get((min(user_id, recipient_id), max(user_id, recipient_id)))
+        if not conversation:
+            return []
+        if since_id is not None:
+            start = _first_after(conversation, since_id)
+            return [conversation[index] for index in range(start, min(start + limit, len(conversation)))]
+        end = len(conversation) if before_id is None else _first_after(conversation, before_id - 1)
+        return [conversation[index] for index in range(end - 1, max(end - limit, 0) - 1, -1)]
+
+    async def private_conversations(
+        self, user_id: int, conversations: Sequence[Tuple[int, Optional[int]]], limit: int
+    ) -> Dict[int, List[Mapping[str, Any]]]:
+        return {
+            recipient_id: await self.private_messages(user_id, recipient_id, limit, since_id=since_id)
+            for recipient_id, since_id in conversations
+        }
@@ -0,0 +1,608 @@
+import logging.config
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+import asyncpg
+
+from config.logger import configure_logging
+from src.db_connector.postgres_connector import AsyncDatabaseConnector
+from src.db_connector.statements import STATEMENTS
+from src.message_sender.write_batcher import MessageWriteBatcher
+from src.metrics.metrics import MetricsRegistry
+from src.partitions.partition_maintainer import PartitionMaintainer
+from src.rate_limiter.rate_limiter import BaseRateLimiter, create_rate_limiter
+from src.storage.base import BaseStorage
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Lower timestamp bound that keeps every partition.
+NO_TIME_BOUND = datetime.min
+HOT_FLOOR_REFRESH_INTERVAL = 600.0
+
+
+# Private send in one statement (and so one transaction): recipient check and both inserts.
+SEND_PRIVATE_QUERY = STATEMENTS.register(
+    "send_private",
+    """
+WITH recipient AS (
+    SELECT id FROM awesome_chat.users WHERE id = $2
+),
+message AS (
+    INSERT INTO awesome_chat.messages (user_id, text, timestamp)
+    SELECT $1, $3, CURRENT_TIMESTAMP FROM recipient
+    RETURNING id
+),
+private_message AS (
+    INSERT INTO awesome_chat.private_messages (id, recipient_id)
+    SELECT id, $2 FROM message
+    RETURNING id
+)
+SELECT EXISTS(SELECT 1 FROM recipient) AS recipient_exists, TRUE AS within_limit,
+       (SELECT id FROM private_message) AS message_id
+""",
+)
+
+# Same, plus the PostgresRateLimiter quota upsert, which only happens when the recipient exists.
+SEND_PRIVATE_WITH_QUOTA_QUERY = STATEMENTS.register(
+    "send_private_with_quota",
+    """
+WITH recipient AS (
+    SELECT id FROM awesome_chat.users WHERE id = $2
+),
+quota AS (
+    INSERT INTO awesome_chat.message_limits AS ml (user_id, message_count, reset_time)
+    SELECT $1, 1, $4::timestamp + $5::interval FROM recipient
+    ON CONFLICT (user_id) DO UPDATE
+    SET message_count = CASE WHEN ml.reset_time <= $4 THEN 1 ELSE ml.message_count + 1 END,
+        reset_time = CASE WHEN ml.reset_time <= $4 THEN $4::timestamp + $5::interval ELSE ml.reset_time END
+    WHERE ml.reset_time <= $4 OR ml.message_count < $6
+    RETURNING message_count
+),
+message AS (
+    INSERT INTO awesome_chat.messages (user_id, text, timestamp)
+    SELECT $1, $3, CURRENT_TIMESTAMP FROM quota
+    RETURNING id
+),
+private_message AS (
+    INSERT INTO awesome_chat.private_messages (id, recipient_id)
+    SELECT id, $2 FROM message
+    RETURNING id
+)
+SELECT EXISTS(SELECT 1 FROM recipient) AS recipient_exists, EXISTS(SELECT 1 FROM quota) AS within_limit,
+       (SELECT id FROM private_message) AS message_id
+""",
+)
+
+# Newest common messages, in the id order the since_id cursor follows: warm-up and reads without a cursor.
+LATEST_COMMON_QUERY = STATEMENTS.register(
+    "latest_common",
+    """
+SELECT m.id, m.user_id, m.text
+FROM awesome_chat.messages m
+LEFT JOIN awesome_chat.private_messages pm ON m.id = pm.id
+WHERE pm.id IS NULL
+ORDER BY m.id DESC
+LIMIT $1
+""",
+)
+
+# Without a foreign key from private_messages (messages is partitioned) the planner expects a short id range
+# to be all private and hash-joins the whole of private_messages. OFFSET 0 keeps NOT EXISTS a per-row index
+# probe, so the scan walks the partitions in id order and stops at the limit. $3 is a lower bound on the
+# timestamps of the rows after the cursor (see PostgresStorage._since_bound), so only recent partitions are read.
+COMMON_SINCE_QUERY = STATEMENTS.register(
+    "common_since",
+    """
+SELECT m.id, m.user_id, m.text
+FROM awesome_chat.messages m
+WHERE m.id > $1
+  AND m.timestamp >= $3
+  AND NOT EXISTS (SELECT 1 FROM awesome_chat.private_messages pm WHERE pm.id = m.id OFFSET 0)
+ORDER BY m.id
+LIMIT $2
+""",
+)
+
+PRIVATE_SINCE_QUERY = STATEMENTS.register(
+    "private_since",
+    """
+SELECT m.id, m.user_id, m.text
+FROM awesome_chat.messages m
+JOIN awesome_chat.private_messages pm ON m.id = pm.id
+WHERE ((pm.recipient_id = $1 AND m.user_id = $2) OR (pm.recipient_id = $2 AND m.user_id = $1))
+  AND m.id > $3
+  AND m.timestamp >= $5
+ORDER BY m.id
+LIMIT $4
+""",
+)
+
+PRIVATE_BEFORE_QUERY = STATEMENTS.register(
+    "private_before",
+    """
+SELECT m.id, m.user_id, m.text
+FROM awesome_chat.messages m
+JOIN awesome_chat.private_messages pm ON m.id = pm.id
+WHERE ((pm.recipient_id = $1 AND m.user_id = $2) OR (pm.recipient_id = $2 AND m.user_id = $1))
+  AND m.id < $3
+ORDER BY m.id DESC
+LIMIT $4
+""",
+)
+
+# The newest page and older pages have no time bound: a conversation's history can be in any partition.
+PRIVATE_NEWEST_QUERY = STATEMENTS.register(
+    "private_newest",
+    """
+SELECT m.id, m.user_id, m.text
+FROM awesome_chat.messages m
+JOIN awesome_chat.private_messages pm ON m.id = pm.id
+WHERE (pm.recipient_id = $1 AND m.user_id = $2) OR (pm.recipient_id = $2 AND m.user_id = $1)
+ORDER BY m.id DESC
+LIMIT $3
+""",
+)
+
+# Batch of private sends from $1: $2 recipient ids and $3 texts, one recipient check (ANY) for all of them.
+# Messages to existing recipients are inserted in input order, so their ids match their positions.
+SEND_PRIVATE_BATCH_QUERY = STATEMENTS.register(
+    "send_private_batch",
+    """
+WITH item AS (
+    SELECT batch.position, batch.recipient_id, batch.text
+    FROM unnest($2::int[], $3::text[]) WITH ORDINALITY AS batch(recipient_id, text, position)
+),
+recipient AS (
+    SELECT id FROM awesome_chat.users WHERE id = ANY($2::int[])
+),
+allowed AS (
+    SELECT item.position, item.recipient_id, item.text, row_number() OVER (ORDER BY item.position) AS n
+    FROM item
+    JOIN recipient ON recipient.id = item.recipient_id
+),
+message AS (
+    INSERT INTO awesome_chat.messages (user_id, text, timestamp)
+    SELECT $1, allowed.text, CURRENT_TIMESTAMP FROM allowed
+    ORDER BY allowed.position
+    RETURNING id
+),
+sent AS (
+    SELECT id, row_number() OVER (ORDER BY id) AS n FROM message
+),
+private_message AS (
+    INSERT INTO awesome_chat.private_messages (id, recipient_id)
+    SELECT sent.id, allowed.recipient_id FROM sent JOIN allowed ON allowed.n = sent.n
+)
+SELECT recipient.id IS NOT NULL AS recipient_exists, TRUE AS within_limit, sent.id AS message_id
+FROM item
+LEFT JOIN recipient ON recipient.id = item.recipient_id
+LEFT JOIN allowed ON allowed.position = item.position
+LEFT JOIN sent ON sent.n = allowed.n
+ORDER BY item.position
+""",
+)
+
+# Same with the PostgresRateLimiter quota: as many messages to existing recipients as the quota has room for are
+# sent, in input order. The limits row is locked first, expired or not, so a concurrent batch waits and then reads
+# the count this one left. A user's first batch has no row to lock; if another first batch inserts it meanwhile,
+# the upsert's WHERE refuses to go over the limit and nothing is sent.
+SEND_PRIVATE_BATCH_WITH_QUOTA_QUERY = STATEMENTS.register(
+    "send_private_batch_with_quota",
+    """
+WITH item AS (
+    SELECT batch.position, batch.recipient_id, batch.text
+    FROM unnest($2::int[], $3::text[]) WITH ORDINALITY AS batch(recipient_id, text, position)
+),
+recipient AS (
+    SELECT id FROM awesome_chat.users WHERE id = ANY($2::int[])
+),
+valid AS (
+    SELECT item.position, item.recipient_id, item.text, row_number() OVER (ORDER BY item.position) AS n
+    FROM item
+    JOIN recipient ON recipient.id = item.recipient_id
+),
+current_limit AS (
+    SELECT message_count, reset_time FROM awesome_chat.message_limits
+    WHERE user_id = $1
+    FOR UPDATE
+),
+quota AS (
+    SELECT LEAST(
+        (SELECT count(*) FROM valid),
+        GREATEST($6 - COALESCE((SELECT message_count FROM current_limit WHERE reset_time > $4), 0), 0)
+    ) AS granted
+),
+quota_update AS (
+    INSERT INTO awesome_chat.message_limits AS ml (user_id, message_count, reset_time)
+    SELECT $1, quota.granted, $4::timestamp + $5::interval FROM quota WHERE quota.granted > 0
+    ON CONFLICT (user_id) DO UPDATE
+    SET message_count = CASE WHEN ml.reset_time <= $4 THEN EXCLUDED.message_count
+                             ELSE ml.message_count + EXCLUDED.message_count END,
+        reset_time = CASE WHEN ml.reset_time <= $4 THEN EXCLUDED.reset_time ELSE ml.reset_time END
+    WHERE ml.reset_time <= $4 OR ml.message_count + EXCLUDED.message_count <= $6
+    RETURNING ml.user_id
+),
+allowed AS (
+    SELECT valid.* FROM valid, quota WHERE valid.n <= quota.granted AND EXISTS (SELECT 1 FROM quota_update)
+),
+message AS (
+    INSERT INTO awesome_chat.messages (user_id, text, timestamp)
+    SELECT $1, allowed.text, CURRENT_TIMESTAMP FROM allowed
+    ORDER BY allowed.position
+    RETURNING id
+),
+sent AS (
+    SELECT id, row_number() OVER (ORDER BY id) AS n FROM message
+),
+private_message AS (
+    INSERT INTO awesome_chat.private_messages (id, recipient_id)
+    SELECT sent.id, allowed.recipient_id FROM sent JOIN allowed ON allowed.n = sent.n
+)
+SELECT recipient.id IS NOT NULL AS recipient_exists, allowed.position IS NOT NULL AS within_limit,
+       sent.id AS message_id
+FROM item
+LEFT JOIN recipient ON recipient.id = item.recipient_id
+LEFT JOIN allowed ON allowed.position = item.position
+LEFT JOIN sent ON sent.n = allowed.n
+ORDER BY item.position
+""",
+)
+
+EXISTING_USERS_QUERY = STATEMENTS.register(
+    "existing_users", "SELECT id FROM awesome_chat.users WHERE id = ANY($1::int[])"
+)
+
+# Several conversations of $1 at once: $2 recipient ids with $3 since ids (NULL for the newest page) and $5
+# their timestamp bounds, up to $4 messages each, read like PRIVATE_SINCE_QUERY and PRIVATE_NEWEST_QUERY.
+# The bound changes per conversation, so old partitions are skipped at run time rather than planning time.
+PRIVATE_CONVERSATIONS_QUERY = STATEMENTS.register(
+    "private_conversations",
+    """
+WITH conversation AS (
+    SELECT batch.recipient_id, batch.since_id, batch.since_time
+    FROM unnest($2::int[], $3::int[], $5::timestamp[]) AS batch(recipient_id, since_id, since_time)
+)
+SELECT conversation.recipient_id, page.id, page.user_id, page.text
+FROM conversation
+CROSS JOIN LATERAL (
+    SELECT m.id, m.user_id, m.text
+    FROM awesome_chat.messages m
+    JOIN awesome_chat.private_messages pm ON m.id = pm.id
+    WHERE ((pm.recipient_id = $1 AND m.user_id = conversation.recipient_id)
+           OR (pm.recipient_id = conversation.recipient_id AND m.user_id = $1))
+      AND m.id > conversation.since_id
+      AND m.timestamp >= conversation.since_time
+    ORDER BY m.id
+    LIMIT $4
+) page
+WHERE conversation.since_id IS NOT NULL
+UNION ALL
+SELECT conversation.recipient_id, page.id, page.user_id, page.text
+FROM conversation
+CROSS JOIN LATERAL (
+    SELECT m.id, m.user_id, m.text
+    FROM awesome_chat.messages m
+    JOIN awesome_chat.private_messages pm ON m.id = pm.id
+    WHERE (pm.recipient_id = $1 AND m.user_id = conversation.recipient_id)
+       OR (pm.recipient_id = conversation.recipient_id AND m.user_id = $1)
+    ORDER BY m.id DESC
+    LIMIT $4
+) page
+WHERE conversation.since_id IS NULL
+""",
+)
+
+# (id, since) such that every message with a greater id was written at or after since, $1 ago. max(id) is only
+# looked for in the last hour of messages before since, which assumes no insert takes its id more than an hour
+# after its transaction (and so its timestamp) started.
+HOT_FLOOR_QUERY = STATEMENTS.register(
+    "hot_floor",
+    """
+SELECT bound.since,
+       (SELECT COALESCE(max(m.id), 0)
+        FROM awesome_chat.messages m
+        WHERE m.timestamp < bound.since
+          AND m.timestamp >= (
+              SELECT max(last.timestamp) FROM awesome_chat.messages last WHERE last.timestamp < bound.since
+          ) - interval '1 hour') AS id
+FROM (SELECT LOCALTIMESTAMP - $1::interval AS since) bound
+""",
+)
+
+CREATE_USER_QUERY = STATEMENTS.register(
+    "create_user",
+    """
+INSERT INTO awesome_chat.users (username)
+VALUES ($1)
+RETURNING id
+""",
+)
+
+USER_EXISTS_QUERY = STATEMENTS.register(
+    "user_exists", "SELECT EXISTS(SELECT 1 FROM awesome_chat.users WHERE id = $1)"
+)
+
+CREATE_SESSION_QUERY = STATEMENTS.register(
+    "create_session",
+    """
+INSERT INTO awesome_chat.user_sessions (user_id, session_token)
+VALUES ($1, $2)
+""",
+)
+
+SESSION_USER_QUERY = STATEMENTS.register(
+    "session_user",
+    """
+SELECT user_id
+FROM awesome_chat.user_sessions
+WHERE session_token = $1 AND is_active = True
+""",
+)
+
+DEACTIVATE_SESSION_QUERY = STATEMENTS.register(
+    "deactivate_session",
+    """
+UPDATE awesome_chat.user_sessions
+SET is_active = False
+WHERE session_token = $1
+""",
+)
+
+DEACTIVATE_USER_SESSIONS_QUERY = STATEMENTS.register(
+    "deactivate_user_sessions",
+    """
+UPDATE awesome_chat.user_sessions
+SET is_active = False
+WHERE user_id = $1
+""",
+)
+
+# Same, returning the tokens so their lookups can be sent to the primary (read_your_writes_window).
+DEACTIVATE_USER_SESSIONS_RETURNING_QUERY = STATEMENTS.register(
+    "deactivate_user_sessions_returning",
+    DEACTIVATE_USER_SESSIONS_QUERY + "RETURNING session_token\n",
+)
+
+INSERT_MESSAGE_QUERY = STATEMENTS.register(
+    "insert_message",
+    """
+INSERT INTO awesome_chat.messages (user_id, text, timestamp)
+VALUES ($1, $2, CURRENT_TIMESTAMP)
+RETURNING id
+""",
+)
+
+
+class PostgresStorage(BaseStorage):
+    name = "postgres"
+
+    def __init__(
+        self,
+        db_connector: AsyncDatabaseConnector,
+        write_batcher: Optional[MessageWriteBatcher] = None,
+        partition_maintainer: Optional[PartitionMaintainer] = None,
+        read_your_writes_window: float = 0.0,
+        hot_window: float = 0.0,
+        shared_by_workers: bool = False,
+    ):
+        self.db_connector = db_connector
+        self.write_batcher = write_batcher
+        self.partition_maintainer = partition_maintainer
+        # With replicas a user's reads and a session token's lookups go to the primary for
+        # read_your_writes_window seconds after they were written, so they never miss their own writes.
+        self.read_your_writes_window = read_your_writes_window
+        self._primary_until: Dict[Any, float] = {}
+        # A worker only sees the writes made through it, so when several share the database the user's reads
+        # and the session lookups always go to the primary.
+        self.shared_by_workers = shared_by_workers
+        # Reads after a cursor newer than the hot floor only touch the partitions of the last hot_window seconds.
+        # The floor is refreshed every HOT_FLOOR_REFRESH_INTERVAL seconds; an older one stays correct, it just
+        # keeps more partitions. 0 turns the bound off.
+        self.hot_window = hot_window
+        self._hot_floor: Optional[Tuple[int, datetime]] = None
+        self._hot_floor_expires = 0.0
+        self._hot_floor_refreshing = False
+
+    async def connect(self) -> None:
+        await self.db_connector.connect()
+        if self.partition_maintainer is not None:
+            await self.partition_maintainer.start()
+        if self.write_batcher is not None:
+            await self.write_batcher.start()
+
+    async def close(self) -> None:
+        if self.write_batcher is not None:
+            await self.write_batcher.close()
+        if self.partition_maintainer is not None:
+            await self.partition_maintainer.close()
+        await self.db_connector.close()
+
+    def register_stats(self, registry: MetricsRegistry) -> None:
+        registry.register_stats("chat_db_pool", self.db_connector.pool_stats, "Database pool state")
+        if self.write_batcher is not None:
+            registry.register_stats("chat_write_batcher", self.write_batcher.stats, "Message write batcher state")
+        if self.partition_maintainer is not None:
+            registry.register_stats(
+                "chat_partition_maintenance", self.partition_maintainer.stats, "Message partition maintenance runs"
+            )
+
+    def create_rate_limiter(self, backend: Optional[str] = None) -> BaseRateLimiter:
+        return create_rate_limiter(self.db_connector, backend=backend)
+
+    def _wrote(self, *keys: Any) -> None:
+        if not self.read_your_writes_window:
+            return
+        now = time.monotonic()
+        if len(self._primary_until) > 10000:
+            self._primary_until = {key: until for key, until in self._primary_until.items() if until > now}
+        for key in keys:
+            self._primary_until[key] = now + self.read_your_writes_window
+
+    def _reads_primary(self, key: Any) -> bool:
+        if self.shared_by_workers:
+            return True
+        until = self._primary_until.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._primary_until[key]
+            return False
+        return True
+
+    async def _since_bound(self, since_id: int) -> datetime:
+        # Lower bound on the timestamps of the messages after since_id.
+        if self.hot_window <= 0:
+            return NO_TIME_BOUND
+        if not self._hot_floor_refreshing and time.monotonic() >= self._hot_floor_expires:
+            self._hot_floor_refreshing = True
+            try:
+                row = await self._call("fetchrow", "hot_floor", timedelta(seconds=self.hot_window))
+                self._hot_floor = (row["id"], row["since"])
+                self._hot_floor_expires = time.monotonic() + HOT_FLOOR_REFRESH_INTERVAL
+            finally:
+                self._hot_floor_refreshing = False
+        if self._hot_floor is None or since_id < self._hot_floor[0]:
+            return NO_TIME_BOUND
+        return self._hot_floor[1]
+
+    async def _call(self, method: str, name: str, *args: Any, primary: bool = False) -> Any:
+        # Runs a statement registered in STATEMENTS by name.
+        try:
+            if primary:
+                return await self.db_connector.run(method, name, *args, primary=True)
+            return await self.db_connector.run(method, name, *args)
+        except asyncpg.PostgresError as e:
+            logger.error("Statement %s failed: %s", name, e)
+            raise
+
+    async def create_user(self, username: str) -> int:
+        user_id = await self._call("fetchval", "create_user", username)
+        self._wrote(user_id)
+        return user_id
+
+    async def user_exists(self, user_id: int) -> bool:
+        return await self._call("fetchval", "user_exists", user_id, primary=self._reads_primary(user_id))
+
+    async def create_session(self, user_id: int, token: str) -> None:
+        await self._call("execute", "create_session", user_id, token)
+        self._wrote(token)
+
+    async def get_session_user(self, token: str) -> Optional[int]:
+        session = await self._call("fetchrow", "session_user", token, primary=self._reads_primary(token))
+        return session["user_id"] if session else None
+
+    async def deactivate_session(self, token: str) -> None:
+        await self._call("execute", "deactivate_session", token)
+        self._wrote(token)
+
+    async def deactivate_user_sessions(self, user_id: int) -> None:
+        if not self.read_your_writes_window:
+            await self._call("execute", "deactivate_user_sessions", user_id)
+            return
+        rows = await self._call("fetch", "deactivate_user_sessions_returning", user_id)
+        self._wrote(*(row["session_token"] for row in rows))
+
+    async def insert_message(self, user_id: int, text: str) -> int:
+        self._wrote(user_id)
+        if self.write_batcher is not None:
+            return await self.write_batcher.insert(user_id, text)
+        return await self._call("fetchval", "insert_message", user_id, text)
+
+    async def insert_private_message(
+        self, user_id: int, recipient_id: int, text: str, rate_limiter: Optional[BaseRateLimiter] = None
+    ) -> Mapping[str, Any]:
+        self._wrote(user_id)
+        if rate_limiter is None or rate_limiter.in_process:
+            return await self._call("fetchrow", "send_private", user_id, recipient_id, text)
+        return await self._call(
+            "fetchrow",
+            "send_private_with_quota",
+            user_id,
+            recipient_id,
+            text,
+            datetime.utcnow(),
+            rate_limiter.window,
+            rate_limiter.max_messages,
+        )
+
+    async def insert_private_messages(
+        self,
+        user_id: int,
+        messages: Sequence[Tuple[int, str]],
+        rate_limiter: Optional[BaseRateLimiter] = None,
+    ) -> List[Mapping[str, Any]]:
+        self._wrote(user_id)
+        recipient_ids = [recipient_id for recipient_id, _ in messages]
+        texts = [text for _, text in messages]
+        if rate_limiter is None or rate_limiter.in_process:
+            return await self._call("fetch", "send_private_batch", user_id, recipient_ids, texts)
+        return await self._call(
+            "fetch",
+            "send_private_batch_with_quota",
+            user_id,
+            recipient_ids,
+            texts,
+            datetime.utcnow(),
+            rate_limiter.window,
+            rate_limiter.max_messages,
+        )
+
+    async def existing_users(self, user_ids: Sequence[int]) -> Set[int]:
+        rows = await self._call("fetch", "existing_users", list(user_ids))
+        return {row["id"] for row in rows}
+
+    async def latest_common_messages(self, limit: int) -> List[Mapping[str, Any]]:
+        return await self._call("fetch", "latest_common", limit)
+
+    async def common_messages(
+        self, limit: int, since_id: Optional[int] = None, user_id: Optional[int] = None
+    ) -> List[Mapping[str, Any]]:
+        primary = user_id is not None and self._reads_primary(user_id)
+        if since_id is None:
+            return await self._call("fetch", "latest_common", limit, primary=primary)
+        bound = await self._since_bound(since_id)
+        return await self._call("fetch", "common_since", since_id, limit, bound, primary=primary)
+
+    async def private_messages(
+        self,
+        user_id: int,
+        recipient_id: int,
+        limit: int,
+        since_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> List[Mapping[str, Any]]:
+        primary = self._reads_primary(user_id)
+        if since_id is not None:
+            bound = await self._since_bound(since_id)
+            return await self._call(
+                "fetch", "private_since", user_id, recipient_id, since_id, limit, bound, primary=primary
+            )
+        if before_id is not None:
+            return await self._call(
+                "fetch", "private_before", user_id, recipient_id, before_id, limit, primary=primary
+            )
+        return await self._call("fetch", "private_newest", user_id, recipient_id, limit, primary=primary)
+
+    async def private_conversations(
+        self, user_id: int, conversations: Sequence[Tuple[int, Optional[int]]], limit: int
+    ) -> Dict[int, List[Mapping[str, Any]]]:
+        rows = await self._call(
+            "fetch",
+            "private_conversations",
+            user_id,
+            [recipient_id for recipient_id, _ in conversations],
+            [since_id for _, since_id in conversations],
+            limit,
+            [NO_TIME_BOUND if since_id is None else await self._since_bound(since_id) for _, since_id in conversations],
+            primary=self._reads_primary(user_id),
+        )
+        pages: Dict[int, List[Mapping[str, Any]]] = {recipient_id: [] for recipient_id, _ in conversations}
+        for row in rows:
+            pages[row["recipient_id"]].append(row)
+        # UNION ALL keeps no order between the two halves: pages after since_id read oldest first, the
+        # newest pages newest first, as in private_messages.
+        for recipient_id, since_id in conversations:
+            pages[recipient_id].sort(key=lambda row: row["id"], reverse=since_id is None)
+        return pages
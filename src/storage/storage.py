@@ -0,0 +1,53 @@
+from typing import Optional
+
+from config.config import settings
+from src.db_connector.postgres_connector import AsyncDatabaseConnector
+from src.message_sender.write_batcher import MessageWriteBatcher
+from src.partitions.partition_maintainer import PartitionMaintainer
+from src.storage.base import BaseStorage
+from src.storage.memory_storage import InMemoryStorage
+from src.storage.postgres_storage import PostgresStorage
+
+
+def create_storage(backend: Optional[str] = None, workers: int = 1) -> BaseStorage:
+    backend = backend or settings.storage_backend
+    if backend == "memory":
+        return InMemoryStorage(history_size=settings.memory_storage_history_size)
+    if backend == "postgres":
+        db_connector = AsyncDatabaseConnector(
+            settings.database_url,
+            use_pool=settings.db_pool_enabled,
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            acquire_timeout=settings.db_pool_acquire_timeout,
+            max_inactive_lifetime=settings.db_pool_max_inactive_lifetime,
+            health_check_interval=settings.db_pool_health_check_interval,
+            replica_urls=settings.database_replica_urls,
+            replica_retry_interval=settings.db_replica_retry_interval,
+            prepare_statements=settings.db_prepared_statements_enabled,
+        )
+        write_batcher = None
+        if settings.write_batch_enabled:
+            write_batcher = MessageWriteBatcher(
+                db_connector,
+                max_batch_size=settings.write_batch_max_size,
+                max_wait=settings.write_batch_max_wait_ms / 1000,
+            )
+        partition_maintainer = None
+        if settings.message_partition_maintenance_enabled:
+            partition_maintainer = PartitionMaintainer(
+                db_connector,
+                premake_months=settings.message_partition_premake_months,
+                retention_days=settings.message_retention_days,
+                retention_action=settings.message_retention_action,
+                interval=settings.message_partition_maintenance_interval,
+            )
+        return PostgresStorage(
+            db_connector,
+            write_batcher=write_batcher,
+            partition_maintainer=partition_maintainer,
+            read_your_writes_window=settings.db_read_your_writes_window if settings.database_replica_urls else 0.0,
+            hot_window=settings.message_hot_window_days * 86400,
+            shared_by_workers=workers > 1 and bool(settings.database_replica_urls),
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
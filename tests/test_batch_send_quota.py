@@ -0,0 +1,98 @@
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage.postgres_storage import STATEMENTS
+
+# Two batches of the same user race for one quota window. Runs against a migrated database (`alembic upgrade head`);
+# the statement has to commit to release its lock, so the rows made here are deleted afterwards.
+DATABASE_URL = os.getenv("DATABASE_URL")
+WINDOW = timedelta(minutes=1)
+MAX_MESSAGES = 3
+
+
+async def connect():
+    try:
+        return await asyncpg.connect(DATABASE_URL, timeout=5)
+    except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+
+
+@pytest_asyncio.fixture
+async def user_id():
+    if not DATABASE_URL:
+        pytest.skip("DATABASE_URL is not set")
+    connection = await connect()
+    user_id = await connection.fetchval(
+        "INSERT INTO awesome_chat.users (username) VALUES ('quota_race_test') RETURNING id"
+    )
+    try:
+        yield user_id
+    finally:
+        await connection.execute(
+            """
+            DELETE FROM awesome_chat.private_messages
+            WHERE id IN (SELECT id FROM awesome_chat.messages WHERE user_id = $1)
+            """,
+            user_id,
+        )
+        await connection.execute("DELETE FROM awesome_chat.messages WHERE user_id = $1", user_id)
+        await connection.execute("DELETE FROM awesome_chat.message_limits WHERE user_id = $1", user_id)
+        await connection.execute("DELETE FROM awesome_chat.users WHERE id = $1", user_id)
+        await connection.close()
+
+
+async def send_batch(connection, user_id):
+    rows = await connection.fetch(
+        STATEMENTS["send_private_batch_with_quota"],
+        user_id,
+        [user_id] * MAX_MESSAGES,
+        ["hello"] * MAX_MESSAGES,
+        datetime.utcnow(),
+        WINDOW,
+        MAX_MESSAGES,
+    )
+    return [row["message_id"] for row in rows if row["message_id"] is not None]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limit_row", ["expired", "missing"])
+async def test_concurrent_batches_share_one_quota(user_id, limit_row):
+    first, second = await connect(), await connect()
+    try:
+        if limit_row == "expired":
+            await first.execute(
+                "INSERT INTO awesome_chat.message_limits (user_id, message_count, reset_time) VALUES ($1, $2, $3)",
+                user_id,
+                MAX_MESSAGES,
+                datetime.utcnow() - WINDOW,
+            )
+        transaction = first.transaction()
+        await transaction.start()
+        sent_first = await send_batch(first, user_id)
+        # The second batch has to wait for the first one's lock on the limits row.
+        waiting = asyncio.ensure_future(send_batch(second, user_id))
+        await asyncio.sleep(0.5)
+        assert not waiting.done()
+        await transaction.commit()
+        sent_second = await waiting
+
+        assert len(sent_first) == MAX_MESSAGES
+        assert sent_second == []
+        assert await first.fetchval(
+            "SELECT message_count FROM awesome_chat.message_limits WHERE user_id = $1", user_id
+        ) == MAX_MESSAGES
+        assert await first.fetchval(
+            "SELECT count(*) FROM awesome_chat.messages WHERE user_id = $1", user_id
+        ) == MAX_MESSAGES
+    finally:
+        await first.close()
+        await second.close()
@@ -0,0 +1,104 @@
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.partitions.partition_maintainer import ARCHIVE_SCHEMA, PartitionMaintainer
+
+# private_messages has no foreign key to the partitioned messages table, so retiring a partition has to take its
+# private rows along. Runs the retention job against a migrated database (`alembic upgrade head`) inside one
+# transaction that is rolled back at the end.
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Only the partition made here ended that long ago.
+RETENTION_DAYS = 365 * 20
+
+
+class TransactionConnector:
+    def __init__(self, connection):
+        self.connection = connection
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.connection
+
+
+@pytest_asyncio.fixture
+async def connection():
+    if not DATABASE_URL:
+        pytest.skip("DATABASE_URL is not set")
+    try:
+        connection = await asyncpg.connect(DATABASE_URL, timeout=5)
+    except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+    transaction = connection.transaction()
+    await transaction.start()
+    try:
+        user_id = await connection.fetchval(
+            "INSERT INTO awesome_chat.users (username) VALUES ('retention_test') RETURNING id"
+        )
+        await connection.execute(
+            """
+            CREATE TABLE awesome_chat.messages_p2000_01 PARTITION OF awesome_chat.messages
+            FOR VALUES FROM ('2000-01-01') TO ('2000-02-01')
+            """
+        )
+        await connection.execute(
+            """
+            INSERT INTO awesome_chat.messages (id, user_id, text, timestamp)
+            SELECT g, $1, 'old', '2000-01-10' FROM generate_series(990001, 990010) g
+            """,
+            user_id,
+        )
+        await connection.execute(
+            """
+            INSERT INTO awesome_chat.private_messages (id, recipient_id)
+            SELECT g, $1 FROM generate_series(990001, 990010, 2) g
+            """,
+            user_id,
+        )
+        yield connection
+    finally:
+        await transaction.rollback()
+        await connection.close()
+
+
+async def stored_ids(connection, table):
+    rows = await connection.fetch(f"SELECT id FROM {table} WHERE id BETWEEN 990001 AND 990010 ORDER BY id")
+    return [row["id"] for row in rows]
+
+
+async def orphaned_private_messages(connection):
+    return await connection.fetchval(
+        """
+        SELECT count(*) FROM awesome_chat.private_messages pm
+        WHERE NOT EXISTS (SELECT 1 FROM awesome_chat.messages m WHERE m.id = pm.id)
+        """
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("action", ["archive", "drop"])
+async def test_retired_partition_takes_its_private_messages_along(connection, action):
+    orphaned = await orphaned_private_messages(connection)
+    maintainer = PartitionMaintainer(
+        TransactionConnector(connection), retention_days=RETENTION_DAYS, retention_action=action
+    )
+
+    await maintainer.run()
+
+    assert maintainer.stats()["failed_runs"] == 0
+    assert await stored_ids(connection, "awesome_chat.private_messages") == []
+    assert await orphaned_private_messages(connection) == orphaned
+    assert await stored_ids(connection, "awesome_chat.messages") == []
+    if action == "archive":
+        archived = await stored_ids(connection, f"{ARCHIVE_SCHEMA}.private_messages")
+        assert archived == [990001, 990003, 990005, 990007, 990009]
+        assert await connection.fetchval(f"SELECT count(*) FROM {ARCHIVE_SCHEMA}.messages_p2000_01") == 10
+    else:
+        assert await connection.fetchval("SELECT to_regclass('awesome_chat.messages_p2000_01')") is None
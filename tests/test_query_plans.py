@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.auth.auth_simple import Auth
+from src.message_sender.message_sender import MessageSender
+from src.rate_limiter.rate_limiter import InMemoryRateLimiter, PostgresRateLimiter
+from src.db_connector.statements import STATEMENTS
+from src.storage.postgres_storage import PostgresStorage
+
+# Runs every query issued by Auth and MessageSender through EXPLAIN against a seeded, migrated database
+# (`alembic upgrade head`) and fails if the planner falls back to a sequential scan.
+# Everything happens inside one transaction that is rolled back at the end.
+DATABASE_URL = os.getenv("QUERY_PLAN_DATABASE_URL", os.getenv("DATABASE_URL"))
+
+SEED_QUERIES = [
+    """
+    INSERT INTO awesome_chat.users (id, username)
+    SELECT g, 'plan_user_' || g FROM generate_series(1000001, 1005000) g
+    """,
+    """
+    INSERT INTO awesome_chat.user_sessions (user_id, session_token, is_active)
+    SELECT g, 'plan_token_' || g, g % 10 <> 0 FROM generate_series(1000001, 1005000) g
+    """,
+    """
+    INSERT INTO awesome_chat.message_limits (user_id, message_count, reset_time)
+    SELECT g, 1, now() FROM generate_series(1000001, 1005000) g
+    """,
+    """
+    INSERT INTO awesome_chat.messages (id, user_id, text, timestamp)
+    SELECT g, 1000001 + g % 5000, 'plan message ' || g, now() - ((1050000 - g) || ' seconds')::interval
+    FROM generate_series(1000001, 1050000) g
+    """,
+    """
+    INSERT INTO awesome_chat.private_messages (id, recipient_id)
+    SELECT g, 1000001 + (g * 7) % 5000 FROM generate_series(1000001, 1050000, 5) g
+    """,
+    "ANALYZE awesome_chat.users",
+    "ANALYZE awesome_chat.user_sessions",
+    "ANALYZE awesome_chat.message_limits",
+    "ANALYZE awesome_chat.messages",
+    "ANALYZE awesome_chat.private_messages",
+]
+
+
+class ExplainingConnector:
+    def __init__(self, connection, analyze=False):
+        self.connection = connection
+        self.analyze = analyze
+        self.plans = []
+
+    async def run(self, method, name, *args, **kwargs):
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def _explain(self, query, *args):
+        options = "ANALYZE, FORMAT JSON" if self.analyze else "FORMAT JSON"
+        plan = await self.connection.fetchval(f"EXPLAIN ({options}) " + query, *args)
+        self.plans.append((" ".join(query.split()), json.loads(plan)[0]["Plan"]))
+
+    async def execute(self, query, *args):
+        await self._explain(query, *args)
+        return await self.connection.execute(query, *args)
+
+    async def insert_data(self, query, *args):
+        return await self.execute(query, *args)
+
+    async def fetch(self, query, *args):
+        await self._explain(query, *args)
+        return await self.connection.fetch(query, *args)
+
+    async def fetchrow(self, query, *args):
+        await self._explain(query, *args)
+        return await self.connection.fetchrow(query, *args)
+
+    async def fetchval(self, query, *args):
+        await self._explain(query, *args)
+        return await self.connection.fetchval(query, *args)
+
+
+def iter_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from iter_nodes(child)
+
+
+def assert_no_seq_scans(plans):
+    offenders = [
+        (query, node.get("Relation Name"))
+        for query, plan in plans
+        for node in iter_nodes(plan)
+        # A scan costed at zero reads no pages: the empty messages partitions created ahead of time.
+        if node["Node Type"] == "Seq Scan" and node["Total Cost"] > 0
+    ]
+    assert not offenders, f"Sequential scans found: {offenders}"
+
+
+@pytest_asyncio.fixture
+async def db():
+    if not DATABASE_URL:
+        pytest.skip("DATABASE_URL is not set")
+    try:
+        connection = await asyncpg.connect(DATABASE_URL, timeout=5)
+    except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+    transaction = connection.transaction()
+    await transaction.start()
+    try:
+        for query in SEED_QUERIES:
+            await connection.execute(query)
+        yield ExplainingConnector(connection)
+    finally:
+        await transaction.rollback()
+        await connection.close()
+
+
+@pytest.mark.asyncio
+async def test_auth_queries_use_indexes(db):
+    auth = Auth(PostgresStorage(db))
+
+    assert await auth.get_user_id_from_token("plan_token_1000001") == 1000001
+    await auth.deactivate_session("plan_token_1000002")
+    await auth.deactivate_user_sessions(1000003)
+
+    assert len(db.plans) == 3
+    assert_no_seq_scans(db.plans)
+
+
+@pytest.mark.asyncio
+async def test_message_sender_queries_use_indexes(db):
+    message_sender = MessageSender(PostgresStorage(db), rate_limiter=PostgresRateLimiter(db, max_messages=20))
+
+    await message_sender.send_message(1000001, "plan check")
+    await message_sender.send_private_message(1000001, 1000002, "plan check")
+    await MessageSender(PostgresStorage(db), rate_limiter=InMemoryRateLimiter(max_messages=20)).send_private_message(
+        1000001, 1000002, "plan check"
+    )
+    await message_sender.retrieve_messages()
+    await message_sender.retrieve_messages(since_id=1049000)
+    await message_sender.retrieve_private_messages(1000001, 1000002)
+    await message_sender.retrieve_private_messages(1000001, 1000002, since_id=1049000)
+    await message_sender.retrieve_private_messages(1000001, 1000002, before_id=1049000, limit=51)
+    await message_sender.is_user_exists(1000002)
+    await message_sender.send_private_messages(1000001, [(1000002, "plan check"), (1000003, "plan check")])
+    await MessageSender(PostgresStorage(db), rate_limiter=InMemoryRateLimiter(max_messages=20)).send_private_messages(
+        1000001, [(1000002, "plan check"), (999, "plan check")]
+    )
+    await message_sender.existing_users([1000002, 1000003, 999])
+    await message_sender.retrieve_private_conversations(1000001, [(1000002, None), (1000003, 1049000)])
+    await MessageSender(PostgresStorage(db), rate_limiter=message_sender.rate_limiter, history_buffer_size=200).warm_up()
+
+    assert_no_seq_scans(db.plans)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_queries_use_indexes(db):
+    # load() reads every live limit once at startup, a sequential scan is expected there.
+    limiter = InMemoryRateLimiter(max_messages=20, db_connector=db)
+
+    await limiter.try_acquire(1000001)
+    await limiter.flush()
+
+    assert_no_seq_scans(db.plans)
+
+
+@pytest.mark.asyncio
+async def test_polls_only_read_recent_partitions(db):
+    await db.connection.execute(
+        """
+        CREATE TABLE awesome_chat.messages_p2000_01 PARTITION OF awesome_chat.messages
+        FOR VALUES FROM ('2000-01-01') TO ('2000-02-01')
+        """
+    )
+    await db.connection.execute(
+        """
+        INSERT INTO awesome_chat.messages (id, user_id, text, timestamp)
+        SELECT g, 1000001 + g % 5000, 'old message', '2000-01-10' FROM generate_series(990001, 991000) g
+        """
+    )
+    # ANALYZE runs the reads, so partitions skipped at run time show up as never executed.
+    explaining = ExplainingConnector(db.connection, analyze=True)
+    storage = PostgresStorage(explaining, hot_window=7 * 86400)
+
+    await storage.common_messages(20, since_id=1049000)
+    await storage.private_messages(1000001, 1000002, 51, since_id=1049000)
+    await storage.private_conversations(1000001, [(1000002, 1049000), (1000003, 1040000)], 51)
+
+    hot_floor = " ".join(STATEMENTS["hot_floor"].split())
+    reads = [(query, plan) for query, plan in explaining.plans if query != hot_floor]
+    assert len(reads) == 3
+    touched = [
+        node["Relation Name"]
+        for _, plan in reads
+        for node in iter_nodes(plan)
+        if node.get("Relation Name", "").startswith("messages_p") and node.get("Actual Loops", 0) > 0
+    ]
+    assert touched and "messages_p2000_01" not in touched
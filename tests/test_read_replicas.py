@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import secrets
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db_connector.postgres_connector import AsyncDatabaseConnector
+from src.storage.postgres_storage import PostgresStorage
+
+# Needs a migrated primary (DATABASE_URL) and a streaming replica of it (DATABASE_REPLICA_URLS, a JSON list),
+# e.g. a second local instance made with `pg_basebackup -R`. The rows written here are deleted at the end.
+DATABASE_URL = os.getenv("DATABASE_URL")
+REPLICA_URLS = json.loads(os.getenv("DATABASE_REPLICA_URLS") or "[]")
+
+
+@pytest_asyncio.fixture
+async def db():
+    if not DATABASE_URL or not REPLICA_URLS:
+        pytest.skip("DATABASE_URL and DATABASE_REPLICA_URLS are not set")
+    db = AsyncDatabaseConnector(DATABASE_URL, use_pool=True, min_size=1, replica_urls=REPLICA_URLS[:1])
+    try:
+        await db.connect()
+    except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+        pytest.skip(f"Postgres is not reachable: {e}")
+    if db.pool_stats()["healthy_replicas"] == 0:
+        await db.close()
+        pytest.skip("The replica is not reachable")
+    yield db
+    await db.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_the_replica_and_writes_to_the_primary(db):
+    assert await db.fetchval("SELECT pg_is_in_recovery()") is True
+    assert await db.fetchval("SELECT pg_is_in_recovery()", primary=True) is False
+    # A write through fetchval must not end up on the read-only replica.
+    assert await db.fetchval("SELECT pg_is_in_recovery() FROM nextval('awesome_chat.messages_id_seq')") is False
+
+
+@pytest.mark.asyncio
+async def test_session_reads_its_own_writes(db):
+    storage = PostgresStorage(db, read_your_writes_window=5)
+    token = secrets.token_urlsafe()
+    user_id = await storage.create_user(f"replica_test_{secrets.token_hex(4)}")
+    try:
+        await storage.create_session(user_id, token)
+        message_id = await storage.insert_message(user_id, "hello")
+        replica_reads = db.pool_stats()["replica_reads"]
+
+        assert await storage.get_session_user(token) == user_id
+        messages = await storage.common_messages(20, since_id=message_id - 1, user_id=user_id)
+        assert [message["id"] for message in messages] == [message_id]
+        assert db.pool_stats()["replica_reads"] == replica_reads
+
+        await storage.common_messages(20, since_id=message_id - 1)
+        assert db.pool_stats()["replica_reads"] == replica_reads + 1
+    finally:
+        await db.execute("DELETE FROM awesome_chat.messages WHERE user_id = $1", user_id)
+        await db.execute("DELETE FROM awesome_chat.user_sessions WHERE user_id = $1", user_id)
+        await db.execute("DELETE FROM awesome_chat.users WHERE id = $1", user_id)
+
+
+@pytest.mark.asyncio
+async def test_workers_read_each_others_writes(db):
+    # Two workers: the user connects and sends through one, the next requests land on the other.
+    writer = PostgresStorage(db, read_your_writes_window=5, shared_by_workers=True)
+    reader = PostgresStorage(db, read_your_writes_window=5, shared_by_workers=True)
+    token = secrets.token_urlsafe()
+    user_id = await writer.create_user(f"replica_test_{secrets.token_hex(4)}")
+    try:
+        await writer.create_session(user_id, token)
+        message_id = await writer.insert_message(user_id, "hello")
+        replica_reads = db.pool_stats()["replica_reads"]
+
+        assert await reader.get_session_user(token) == user_id
+        assert await reader.user_exists(user_id) is True
+        messages = await reader.common_messages(20, since_id=message_id - 1, user_id=user_id)
+        assert [message["id"] for message in messages] == [message_id]
+        assert db.pool_stats()["replica_reads"] == replica_reads
+
+        await reader.common_messages(20, since_id=message_id - 1)
+        assert db.pool_stats()["replica_reads"] == replica_reads + 1
+    finally:
+        await db.execute("DELETE FROM awesome_chat.messages WHERE user_id = $1", user_id)
+        await db.execute("DELETE FROM awesome_chat.user_sessions WHERE user_id = $1", user_id)
+        await db.execute("DELETE FROM awesome_chat.users WHERE id = $1", user_id)
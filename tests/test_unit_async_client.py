@@ -0,0 +1,114 @@
+import sys
+import asyncio
+import itertools
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.config import settings
+from src.chat_client.async_client import AsyncChatClient, ChatClientError
+from src.http_protocol.http_protocol import HTTPProtocol
+from src.pubsub.hub import MessageHub
+
+
+class FakeAuth:
+    def __init__(self):
+        self.user_ids = itertools.count(1)
+        self.tokens = {}
+
+    async def create_user_and_token(self):
+        user_id = next(self.user_ids)
+        self.tokens[f"token-{user_id}"] = user_id
+        return f"token-{user_id}"
+
+    async def get_user_id_from_token(self, token):
+        return self.tokens.get(token)
+
+
+class FakeMessageSender:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, user_id, text):
+        self.messages.append({"id": len(self.messages) + 1, "user_id": user_id, "text": text})
+        return len(self.messages)
+
+    async def retrieve_messages(self, since_id=None, user_id=None):
+        return [message for message in self.messages if since_id is None or message["id"] > since_id]
+
+
+@pytest_asyncio.fixture
+async def server():
+    hub = MessageHub()
+    connections = []
+
+    def protocol_factory():
+        connections.append(HTTPProtocol(FakeAuth.instance, FakeMessageSender.instance, message_hub=hub))
+        return connections[-1]
+
+    FakeAuth.instance = FakeAuth()
+    FakeMessageSender.instance = FakeMessageSender()
+    server = await asyncio.get_running_loop().create_server(protocol_factory, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", connections
+    server.close()
+    for protocol in connections:
+        protocol.transport.close()
+    await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_requests_reuse_pooled_connections(server):
+    url, connections = server
+    async with AsyncChatClient(url, max_connections=2) as client:
+        assert await client.connect() == 1
+        results = await client.send_many([f"message {number}" for number in range(10)])
+        status = await client.get_status(since_id=5)
+
+    assert results == [{"message": "Message received."}] * 10
+    assert [message["id"] for message in status["messages"]] == [6, 7, 8, 9, 10]
+    assert status["cursor"] == 10
+    assert len(connections) <= 2
+
+
+@pytest.mark.asyncio
+async def test_errors_raise_chat_client_error(server):
+    url, _ = server
+    async with AsyncChatClient(url) as client:
+        with pytest.raises(ChatClientError) as error:
+            await client.get_status()
+
+    assert error.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_subscribe_yields_published_messages(server):
+    url, _ = server
+    async with AsyncChatClient(url) as sender, AsyncChatClient(url) as listener:
+        await sender.connect()
+        await listener.connect()
+        messages = listener.subscribe()
+        first = asyncio.ensure_future(messages.__anext__())
+        await asyncio.sleep(0.05)
+
+        await sender.send_message("hello")
+        message = await asyncio.wait_for(first, timeout=1)
+        await messages.aclose()
+
+    assert message == {"id": 1, "user_id": 1, "text": "hello", "chat_type": "common"}
+
+
+@pytest.mark.asyncio
+async def test_reconnects_after_server_closes_idle_connection(server, monkeypatch):
+    monkeypatch.setattr(settings, "keep_alive_timeout", 0.01)
+    url, connections = server
+    async with AsyncChatClient(url, max_connections=1) as client:
+        await client.connect()
+        await asyncio.sleep(0.05)
+        status = await client.get_status()
+
+    assert status["messages"] == []
+    assert len(connections) == 2
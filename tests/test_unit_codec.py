@@ -0,0 +1,47 @@
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.config import settings
+from src.codec.json_codec import encode_messages, encode_page, select_codec
+from src.http_protocol.responses import ERROR_RESPONSES, error_response
+
+MESSAGES = [
+    {"id": 2, "user_id": 1, "text": 'quote " and backslash \\'},
+    {"id": 1, "user_id": 3, "text": "привет\n"},
+]
+
+
+def test_encode_messages_matches_json():
+    assert json.loads(encode_messages(MESSAGES)) == MESSAGES
+    assert encode_messages([]) == b"[]"
+
+
+def test_encode_page_adds_fields():
+    page = json.loads(encode_page(MESSAGES, cursor=2, next_cursor=None))
+
+    assert page == {"messages": MESSAGES, "cursor": 2, "next_cursor": None}
+
+
+def test_select_codec_falls_back_to_json(monkeypatch):
+    monkeypatch.setitem(sys.modules, "orjson", None)
+
+    name, dumps, loads = select_codec("orjson")
+
+    assert name == "json"
+    assert dumps({"text": "é"}) == '{"text":"é"}'.encode()
+    assert loads(b'{"a": 1}') == {"a": 1}
+    with pytest.raises(ValueError):
+        select_codec("ujson")
+
+
+def test_every_error_is_prepared():
+    for error in settings.error_messages.__dict__.values():
+        prepared = error_response(error)
+        assert prepared is ERROR_RESPONSES[(error.status_code, error.message)]
+        assert prepared.response.status_code == error.status_code
+        assert json.loads(prepared.body) == {"error": error.message}
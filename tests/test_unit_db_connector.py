@@ -0,0 +1,277 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db_connector import postgres_connector
+from src.db_connector.postgres_connector import AsyncDatabaseConnector, is_read_only
+from src.db_connector.statements import STATEMENTS, StatementRegistry
+from src.storage.postgres_storage import PostgresStorage
+
+
+class FakeConnection:
+    def __init__(self, pid):
+        self.pid = pid
+        self.queries = []
+        self.broken = False
+
+    def get_server_pid(self):
+        return self.pid
+
+    async def fetchval(self, query, *args):
+        self.queries.append(query)
+        return 1
+
+    async def executemany(self, query, args):
+        self.queries.append(("prepare", query))
+
+    async def fetch(self, query, *args):
+        if self.broken:
+            raise ConnectionResetError("connection reset by peer")
+        self.queries.append(query)
+        return [{"id": 1}]
+
+
+class FakePool:
+    def __init__(self, dsn="", size=2, setup=None):
+        self.dsn = dsn
+        self.connections = [FakeConnection(pid) for pid in range(size)]
+        self.idle = list(self.connections)
+        self.setup = setup
+
+    async def acquire(self, timeout=None):
+        if not self.idle:
+            await asyncio.sleep(timeout)
+            raise asyncio.TimeoutError
+        connection = self.idle.pop()
+        if self.setup:
+            await self.setup(connection)
+        return connection
+
+    async def release(self, connection):
+        self.idle.append(connection)
+
+    async def close(self):
+        pass
+
+    def get_size(self):
+        return len(self.connections)
+
+    def get_idle_size(self):
+        return len(self.idle)
+
+    def get_min_size(self):
+        return 1
+
+    def get_max_size(self):
+        return len(self.connections)
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    pools = []
+
+    async def create_pool(dsn, **kwargs):
+        pool = FakePool(dsn, setup=kwargs.get("setup"))
+        if kwargs.get("init"):
+            for connection in pool.connections:
+                await kwargs["init"](connection)
+        pools.append(pool)
+        return pool
+
+    monkeypatch.setattr(postgres_connector.asyncpg, "create_pool", create_pool)
+    return pools
+
+
+@pytest.mark.asyncio
+async def test_pool_mode_runs_queries_concurrently(fake_pool):
+    db = AsyncDatabaseConnector("postgresql://test", use_pool=True, acquire_timeout=0.01)
+    await db.connect()
+
+    results = await asyncio.gather(db.fetch("SELECT 1"), db.fetch("SELECT 2"))
+
+    assert results == [[{"id": 1}], [{"id": 1}]]
+    stats = db.pool_stats()
+    assert stats["mode"] == "pool"
+    assert stats["acquired"] == 2
+    assert stats["idle"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_acquire_timeout_is_counted(fake_pool):
+    db = AsyncDatabaseConnector("postgresql://test", use_pool=True, acquire_timeout=0.01)
+    await db.connect()
+    fake_pool[0].idle.clear()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await db.fetchval("SELECT 1")
+
+    assert db.pool_stats()["acquire_timeouts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_health_check_only_pings_idle_connections(fake_pool):
+    db = AsyncDatabaseConnector(
+        "postgresql://test", use_pool=True, health_check_interval=60, prepare_statements=False
+    )
+    await db.connect()
+
+    await db.fetch("SELECT 42")
+    await db.fetch("SELECT 42")
+
+    connection = fake_pool[0].connections[-1]
+    assert connection.queries == ["SELECT 1", "SELECT 42", "SELECT 42"]
+
+
+@pytest.mark.asyncio
+async def test_registered_statements_are_prepared_on_every_connection(fake_pool):
+    statements = StatementRegistry()
+    statements.register("newest", "SELECT id FROM awesome_chat.messages ORDER BY id DESC LIMIT $1")
+    statements.register("insert", "INSERT INTO awesome_chat.messages (user_id) VALUES ($1) RETURNING id")
+    db = AsyncDatabaseConnector(
+        "postgresql://primary", use_pool=True, replica_urls=["postgresql://replica"], statements=statements
+    )
+    await db.connect()
+    primary, replica = fake_pool
+
+    assert await db.run("fetch", "newest", 20) == [{"id": 1}]
+    assert [query for query in primary.connections[0].queries if query[0] == "prepare"] == [
+        ("prepare", statements["newest"]),
+        ("prepare", statements["insert"]),
+    ]
+    # The replica never runs writes, so it only prepares the reads.
+    assert replica.connections[0].queries[0] == ("prepare", statements["newest"])
+    assert ("prepare", statements["insert"]) not in replica.connections[0].queries
+    assert db.pool_stats()["statements_prepared"] == 4
+
+
+def test_registry_rejects_a_different_query_under_the_same_name():
+    statements = StatementRegistry()
+    statements.register("one", "SELECT 1")
+    statements.register("one", "SELECT 1")
+
+    with pytest.raises(ValueError):
+        statements.register("one", "SELECT 2")
+    assert "session_user" in STATEMENTS
+
+
+def test_rate_limiter_and_write_batcher_statements_are_registered():
+    for name in ("acquire_message_limit", "flush_message_limits", "load_message_limits", "insert_message_batch"):
+        assert name in STATEMENTS
+    assert not is_read_only(STATEMENTS["acquire_message_limit"])
+    assert is_read_only(STATEMENTS["load_message_limits"])
+
+
+def executed(pool):
+    return [
+        query
+        for connection in pool.connections
+        for query in connection.queries
+        if query != "SELECT 1" and query[0] != "prepare"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reads_go_round_robin_to_replicas_and_writes_to_the_primary(fake_pool):
+    db = AsyncDatabaseConnector(
+        "postgresql://primary", use_pool=True, replica_urls=["postgresql://replica1", "postgresql://replica2"]
+    )
+    await db.connect()
+    primary, replica1, replica2 = fake_pool
+
+    for _ in range(4):
+        await db.fetch("SELECT 42")
+    await db.fetch("INSERT INTO awesome_chat.messages (user_id) VALUES ($1) RETURNING id", 1)
+    await db.fetch("SELECT 43", primary=True)
+
+    assert executed(replica1) == ["SELECT 42", "SELECT 42"]
+    assert executed(replica2) == ["SELECT 42", "SELECT 42"]
+    assert executed(primary) == ["INSERT INTO awesome_chat.messages (user_id) VALUES ($1) RETURNING id", "SELECT 43"]
+    assert db.pool_stats()["replica_reads"] == 4
+
+
+@pytest.mark.asyncio
+async def test_failed_replica_is_skipped_until_retry_interval(fake_pool):
+    db = AsyncDatabaseConnector(
+        "postgresql://primary",
+        use_pool=True,
+        replica_urls=["postgresql://replica1", "postgresql://replica2"],
+        replica_retry_interval=60,
+    )
+    await db.connect()
+    primary, replica1, replica2 = fake_pool
+    for connection in replica1.connections:
+        connection.broken = True
+
+    for _ in range(3):
+        await db.fetch("SELECT 42")
+
+    assert executed(primary) == ["SELECT 42"]
+    assert executed(replica2) == ["SELECT 42", "SELECT 42"]
+    stats = db.pool_stats()
+    assert stats["healthy_replicas"] == 1
+    assert stats["replica_failovers"] == 1
+
+
+@pytest.mark.parametrize(
+    "query, read_only",
+    [
+        (STATEMENTS["latest_common"], True),
+        (STATEMENTS["common_since"], True),
+        (STATEMENTS["send_private"], False),
+        ("SELECT message_count FROM awesome_chat.message_limits WHERE user_id = $1 FOR UPDATE", False),
+        ("SELECT pg_try_advisory_xact_lock($1)", False),
+        ("UPDATE awesome_chat.user_sessions SET is_active = False WHERE user_id = $1 RETURNING session_token", False),
+    ],
+)
+def test_only_plain_selects_are_read_only(query, read_only):
+    assert is_read_only(query) is read_only
+
+
+class RoutingDB:
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, method, name, *args, **kwargs):
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def fetchval(self, query, *args, primary=False):
+        self.calls.append(primary)
+        return 7
+
+    async def fetchrow(self, query, *args, primary=False):
+        self.calls.append(primary)
+        return {"user_id": 7}
+
+    async def fetch(self, query, *args, primary=False):
+        self.calls.append(primary)
+        return []
+
+    async def execute(self, query, *args):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_storage_reads_own_writes_from_the_primary(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    db = RoutingDB()
+    storage = PostgresStorage(db, read_your_writes_window=5)
+
+    await storage.create_session(7, "token")
+    await storage.insert_message(7, "hi")
+    db.calls.clear()
+    assert await storage.get_session_user("token") == 7
+    await storage.common_messages(20, since_id=1, user_id=7)
+    await storage.private_messages(7, 8, 20)
+    await storage.private_messages(8, 7, 20)
+
+    now[0] += 6
+    await storage.common_messages(20, since_id=1, user_id=7)
+    await storage.get_session_user("token")
+
+    assert db.calls == [True, True, True, False, False, False]
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.launcher.event_loop import install_event_loop
+from src.launcher.launcher import WorkerSupervisor
+
+
+def crash_once(path):
+    with open(path, "a") as f:
+        f.write(f"{os.getpid()}\n")
+    with open(path) as f:
+        if len(f.readlines()) == 1:
+            os._exit(1)
+    while True:
+        time.sleep(1)
+
+
+def test_supervisor_restarts_crashed_worker_and_stops_all(tmp_path):
+    path = tmp_path / "starts.log"
+    supervisor = WorkerSupervisor(crash_once, (str(path),), workers=1, shutdown_timeout=2, poll_interval=0.05)
+    threading.Timer(2, supervisor.stop).start()
+
+    supervisor.run()
+
+    pids = path.read_text().split()
+    assert len(pids) == 2
+    assert supervisor.slots[0].restarts == 1
+    assert not supervisor.slots[0].process.is_alive()
+
+
+def test_install_event_loop_falls_back_to_asyncio(monkeypatch):
+    monkeypatch.setitem(sys.modules, "uvloop", None)
+    try:
+        assert install_event_loop("uvloop") == "asyncio"
+        assert install_event_loop("auto") == "asyncio"
+        assert install_event_loop("asyncio") == "asyncio"
+        with pytest.raises(ValueError):
+            install_event_loop("trio")
+    finally:
+        asyncio.set_event_loop_policy(None)
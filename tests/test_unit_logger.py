@@ -0,0 +1,56 @@
+import sys
+import queue
+import logging
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.logger import LogQueueHandler, SamplingFilter
+
+
+def make_record(name, level=logging.INFO, msg="message %s", args=("arg",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_sampling_uses_longest_prefix_and_keeps_warnings():
+    sampling_filter = SamplingFilter({"src": 1.0, "src.http_protocol": 0.0})
+
+    assert not sampling_filter.filter(make_record("src.http_protocol.http_protocol"))
+    assert sampling_filter.filter(make_record("src.http_protocol.http_protocol", level=logging.WARNING))
+    assert sampling_filter.filter(make_record("src.message_sender"))
+    assert sampling_filter.filter(make_record("main"))
+    assert sampling_filter.dropped == 1
+
+
+def test_rate_limit_per_logger_and_window():
+    sampling_filter = SamplingFilter(rate_limit=2)
+    with mock.patch("config.logger.time.monotonic", return_value=100.0):
+        results = [sampling_filter.filter(make_record("a")) for _ in range(3)]
+        assert sampling_filter.filter(make_record("b"))
+    assert results == [True, True, False]
+    with mock.patch("config.logger.time.monotonic", return_value=101.0):
+        assert sampling_filter.filter(make_record("a"))
+    assert sampling_filter.dropped == 1
+
+
+def test_decision_is_shared_between_handlers():
+    sampling_filter = SamplingFilter(rate_limit=1)
+    record = make_record("a")
+
+    assert sampling_filter.filter(record)
+    assert sampling_filter.filter(record)
+    assert not sampling_filter.filter(make_record("a"))
+
+
+def test_queue_handler_renders_message_before_enqueueing():
+    handler_queue = queue.SimpleQueue()
+    handler = LogQueueHandler(handler_queue)
+    buffer = bytearray(b"before")
+
+    handler.handle(make_record("a", args=(buffer,)))
+    buffer.extend(b" after")
+
+    record = handler_queue.get_nowait()
+    assert record.getMessage() == "message bytearray(b'before')"
+    assert record.args is None
@@ -0,0 +1,110 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.config import settings
+from src.auth.auth_simple import Auth
+from src.message_sender.message_sender import MessageLimitReachedError, MessageSender, RecipientNotFoundError
+from src.rate_limiter.rate_limiter import InMemoryRateLimiter
+from src.storage.memory_storage import InMemoryStorage
+from src.storage.storage import create_storage
+
+
+def ids(messages):
+    return [message["id"] for message in messages]
+
+
+@pytest.mark.asyncio
+async def test_common_history_pages_like_postgres():
+    storage = InMemoryStorage()
+    for number in range(10):
+        await storage.insert_message(1, f"m{number}")
+
+    assert ids(await storage.common_messages(3)) == [10, 9, 8]
+    assert ids(await storage.common_messages(3, since_id=4)) == [5, 6, 7]
+    assert ids(await storage.common_messages(3, since_id=10)) == []
+    assert ids(await storage.latest_common_messages(2)) == [10, 9]
+
+
+@pytest.mark.asyncio
+async def test_private_history_is_per_conversation():
+    storage = InMemoryStorage()
+    for user_id in (1, 2, 3):
+        await storage.create_user(f"user{user_id}")
+    for number in range(6):
+        sender, recipient = (1, 2) if number % 2 else (2, 1)
+        await storage.insert_private_message(sender, recipient, f"m{number}")
+    await storage.insert_private_message(1, 3, "other conversation")
+    await storage.insert_message(1, "common")
+
+    assert ids(await storage.private_messages(1, 2, limit=4)) == [6, 5, 4, 3]
+    assert ids(await storage.private_messages(2, 1, limit=4, before_id=4)) == [3, 2, 1]
+    assert ids(await storage.private_messages(1, 2, limit=2, since_id=2)) == [3, 4]
+    assert ids(await storage.private_messages(1, 3, limit=10)) == [7]
+    assert await storage.private_messages(2, 3, limit=10) == []
+
+
+@pytest.mark.asyncio
+async def test_history_keeps_latest_messages():
+    storage = InMemoryStorage(history_size=3)
+    for number in range(5):
+        await storage.insert_message(1, f"m{number}")
+
+    assert ids(await storage.common_messages(10)) == [5, 4, 3]
+    assert ids(await storage.common_messages(10, since_id=0)) == [3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_auth_and_sender_run_without_database():
+    storage = create_storage("memory")
+    auth = Auth(storage)
+    sender = MessageSender(storage, rate_limiter=InMemoryRateLimiter(max_messages=2))
+
+    token = await auth.create_user_and_token()
+    other_token = await auth.create_user_and_token("other")
+    user_id = await auth.get_user_id_from_token(token)
+    other_id = await auth.get_user_id_from_token(other_token)
+
+    assert await auth.create_user_and_token("other") is None
+    assert await sender.send_message(user_id, "hello") == 1
+    assert await sender.send_private_message(user_id, other_id, "hi") == 2
+    assert ids(await sender.retrieve_private_messages(other_id, user_id)) == [2]
+    with pytest.raises(MessageLimitReachedError):
+        await sender.send_message(user_id, "over the limit")
+    with pytest.raises(RecipientNotFoundError):
+        await sender.send_private_message(other_id, 999, "nobody")
+
+    await auth.deactivate_user_sessions(user_id)
+    assert await auth.get_user_id_from_token(token) is None
+    assert await auth.get_user_id_from_token(other_token) == other_id
+
+
+@pytest.mark.asyncio
+async def test_batch_sends_and_reads_several_conversations():
+    storage = create_storage("memory")
+    sender = MessageSender(storage, rate_limiter=InMemoryRateLimiter(max_messages=2))
+    for user_id in (1, 2, 3):
+        await storage.create_user(f"user{user_id}")
+
+    results = await sender.send_private_messages(1, [(2, "a"), (999, "b"), (3, "c"), (2, "d")])
+
+    assert results[0] == 1 and results[2] == 2
+    assert isinstance(results[1], RecipientNotFoundError)
+    # The missing recipient takes no quota, the second message to an existing one does.
+    assert isinstance(results[3], MessageLimitReachedError)
+    assert await storage.existing_users([3, 999, 2]) == {2, 3}
+    pages = await sender.retrieve_private_conversations(2, [(1, None), (3, None)])
+    assert {recipient_id: ids(page) for recipient_id, page in pages.items()} == {1: [1], 3: []}
+    assert ids((await sender.retrieve_private_conversations(3, [(1, 1)]))[1]) == [2]
+
+
+def test_memory_storage_uses_memory_rate_limiter(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limiter_backend", "postgres")
+
+    limiter = InMemoryStorage().create_rate_limiter()
+
+    assert isinstance(limiter, InMemoryRateLimiter)
+    assert limiter.db_connector is None
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.pubsub.hub import MessageHub
+
+
+@pytest.mark.asyncio
+async def test_common_messages_fan_out_to_everyone():
+    hub = MessageHub()
+    first, second = hub.subscribe(1), hub.subscribe(2)
+
+    hub.publish({"id": 10, "user_id": 3, "text": "hi"})
+
+    assert (await first.get())["id"] == 10
+    assert (await second.get())["id"] == 10
+
+
+@pytest.mark.asyncio
+async def test_private_messages_reach_only_participants():
+    hub = MessageHub()
+    sender, recipient, other = hub.subscribe(1), hub.subscribe(2), hub.subscribe(3)
+
+    hub.publish({"id": 11, "user_id": 1, "text": "psst"}, recipient_id=2)
+
+    assert (await sender.get())["id"] == 11
+    assert (await recipient.get())["id"] == 11
+    assert other.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_disconnected():
+    hub = MessageHub(max_queue_size=2)
+    slow = hub.subscribe(1)
+
+    for message_id in range(3):
+        hub.publish({"id": message_id, "user_id": 2, "text": "spam"})
+
+    assert await slow.get() is None
+    assert hub.stats() == {"subscribers": 0, "published": 3, "dropped": 0, "disconnected": 1}
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_drops_messages():
+    hub = MessageHub(max_queue_size=2, slow_consumer_policy="drop")
+    slow = hub.subscribe(1)
+
+    for message_id in range(3):
+        hub.publish({"id": message_id, "user_id": 2, "text": "spam"})
+
+    assert [(await slow.get())["id"], (await slow.get())["id"]] == [0, 1]
+    assert slow.dropped == 1
+    assert hub.stats()["subscribers"] == 1
@@ -0,0 +1,203 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.config import settings
+from src.message_sender.message_sender import MessageLimitReachedError, MessageSender, RecipientNotFoundError
+from src.rate_limiter.rate_limiter import InMemoryRateLimiter, PostgresRateLimiter
+from src.db_connector.statements import STATEMENTS
+from src.storage.postgres_storage import NO_TIME_BOUND, PostgresStorage
+
+
+class MockDB:
+    def __init__(self, message_ids):
+        self.messages = [{"id": message_id, "user_id": 1, "text": f"m{message_id}"} for message_id in message_ids]
+        self.fetch_calls = []
+        self.statement_names = []
+        self.next_id = max(message_ids, default=0) + 1
+
+    async def run(self, method, name, *args, **kwargs):
+        self.statement_names.append(name)
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def fetch(self, query, *args):
+        self.fetch_calls.append(args)
+        if "m.id > $1" in query:
+            since_id, limit = args[:2]
+            return [message for message in self.messages if message["id"] > since_id][:limit]
+        limit = args[0]
+        return sorted(self.messages, key=lambda message: -message["id"])[:limit]
+
+    async def fetchval(self, query, *args):
+        message_id = self.next_id
+        self.next_id += 1
+        return message_id
+
+
+def make_sender(db, buffer_size=5):
+    return MessageSender(PostgresStorage(db), rate_limiter=InMemoryRateLimiter(max_messages=100), history_buffer_size=buffer_size)
+
+
+@pytest.fixture(autouse=True)
+def history_limit(monkeypatch):
+    monkeypatch.setattr(settings, "common_history_limit", 3)
+
+
+@pytest.mark.asyncio
+async def test_reads_are_served_from_buffer_after_warm_up():
+    db = MockDB(range(1, 11))
+    sender = make_sender(db)
+    await sender.warm_up()
+    db.fetch_calls.clear()
+
+    newest = await sender.retrieve_messages()
+    since = await sender.retrieve_messages(since_id=7)
+
+    assert [message["id"] for message in newest] == [10, 9, 8]
+    assert [message["id"] for message in since] == [8, 9, 10]
+    assert db.fetch_calls == []
+
+
+@pytest.mark.asyncio
+async def test_sent_messages_are_appended_and_evict_oldest():
+    db = MockDB(range(1, 6))
+    sender = make_sender(db)
+    await sender.warm_up()
+
+    await sender.send_message(1, "hello")
+    db.fetch_calls.clear()
+
+    assert [message["id"] for message in await sender.retrieve_messages(since_id=4)] == [5, 6]
+    assert db.fetch_calls == []
+    # Message 1 has been evicted, so a cursor before it has to go to the DB.
+    await sender.retrieve_messages(since_id=0)
+    assert db.fetch_calls == [(0, 3, NO_TIME_BOUND)]
+
+
+@pytest.mark.asyncio
+async def test_out_of_order_sends_keep_buffer_sorted():
+    db = MockDB([1, 2])
+    sender = make_sender(db)
+    await sender.warm_up()
+
+    sender._remember({"id": 5, "user_id": 1, "text": "late"})
+    sender._remember({"id": 4, "user_id": 1, "text": "early"})
+
+    assert [message["id"] for message in await sender.retrieve_messages(since_id=1)] == [2, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_cold_buffer_reads_from_db():
+    db = MockDB(range(1, 4))
+    sender = make_sender(db, buffer_size=0)
+    await sender.warm_up()
+
+    assert [message["id"] for message in await sender.retrieve_messages()] == [3, 2, 1]
+    assert db.fetch_calls == [(3,)]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_and_reads_without_cursor_use_the_same_statement():
+    db = MockDB(range(1, 4))
+    await make_sender(db).warm_up()
+    await make_sender(db, buffer_size=0).retrieve_messages()
+
+    assert db.statement_names == ["latest_common", "latest_common"]
+
+
+class MockSendDB:
+    def __init__(self, recipient_exists=True, within_limit=True):
+        self.result = {
+            "recipient_exists": recipient_exists,
+            "within_limit": within_limit,
+            "message_id": 42 if recipient_exists and within_limit else None,
+        }
+        self.calls = 0
+
+    async def run(self, method, name, *args, **kwargs):
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def fetchrow(self, query, *args):
+        self.calls += 1
+        return self.result
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("limiter_type", ["memory", "postgres"])
+async def test_private_send_is_one_round_trip(limiter_type):
+    db = MockSendDB()
+    limiter = InMemoryRateLimiter(max_messages=5) if limiter_type == "memory" else PostgresRateLimiter(db, 5)
+
+    assert await MessageSender(PostgresStorage(db), rate_limiter=limiter).send_private_message(1, 2, "hi") == 42
+    assert db.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_private_send_to_missing_recipient_leaves_the_quota_alone():
+    limiter = InMemoryRateLimiter(max_messages=1)
+    sender = MessageSender(PostgresStorage(MockSendDB(recipient_exists=False)), rate_limiter=limiter)
+
+    for _ in range(3):
+        with pytest.raises(RecipientNotFoundError):
+            await sender.send_private_message(1, 2, "hi")
+
+    assert await limiter.try_acquire(1)
+
+
+@pytest.mark.asyncio
+async def test_private_send_reports_missing_recipient_and_limit():
+    with pytest.raises(RecipientNotFoundError):
+        await MessageSender(PostgresStorage(MockSendDB(recipient_exists=False))).send_private_message(1, 2, "hi")
+    with pytest.raises(MessageLimitReachedError):
+        await MessageSender(PostgresStorage(MockSendDB(within_limit=False))).send_private_message(1, 2, "hi")
+
+
+class MockBatchDB:
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, method, name, *args, **kwargs):
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def fetch(self, query, user_id, recipient_ids=None, texts=None, *quota):
+        if query == STATEMENTS["existing_users"]:
+            return [{"id": recipient_id} for recipient_id in user_id if recipient_id != 9]
+        self.calls.append((query, recipient_ids, texts, quota))
+        return [
+            {"recipient_exists": recipient_id != 9, "within_limit": position < 2, "message_id": 40 + position}
+            for position, recipient_id in enumerate(recipient_ids)
+        ]
+
+
+@pytest.mark.asyncio
+async def test_batch_send_takes_the_quota_in_the_same_statement():
+    db = MockBatchDB()
+    sender = MessageSender(PostgresStorage(db), rate_limiter=PostgresRateLimiter(db, 5))
+
+    results = await sender.send_private_messages(1, [(2, "a"), (9, "b"), (3, "c")])
+
+    assert results[0] == 40
+    assert isinstance(results[1], RecipientNotFoundError)
+    assert isinstance(results[2], MessageLimitReachedError)
+    [(query, recipient_ids, texts, quota)] = db.calls
+    assert query == STATEMENTS["send_private_batch_with_quota"]
+    assert (recipient_ids, texts) == ([2, 9, 3], ["a", "b", "c"])
+    assert len(quota) == 3 and quota[2] == 5
+
+
+@pytest.mark.asyncio
+async def test_batch_send_with_in_process_limiter_only_stores_the_granted_messages():
+    db = MockBatchDB()
+    sender = MessageSender(PostgresStorage(db), rate_limiter=InMemoryRateLimiter(max_messages=2))
+
+    results = await sender.send_private_messages(1, [(2, "a"), (9, "b"), (3, "c"), (4, "d")])
+
+    assert [results[0], results[2]] == [40, 41]
+    assert isinstance(results[1], RecipientNotFoundError)
+    assert isinstance(results[3], MessageLimitReachedError)
+    [(query, recipient_ids, texts, quota)] = db.calls
+    assert query == STATEMENTS["send_private_batch"]
+    assert (recipient_ids, texts) == ([2, 3], ["a", "c"]) and quota == ()
@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.metrics.metrics import Metric, MetricsRegistry
+from test_unit_protocol import FakeTransport, HEALTH_REQUEST, MockAuth, MockMessageSender, serve_requests
+
+
+def test_render_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ["route"])
+    latency = registry.histogram("latency_seconds", "Latency", buckets=[0.1, 1])
+    connections = registry.gauge("connections", "Connections")
+    registry.register_stats("pool", lambda: {"size": 3, "mode": "pool", "enabled": True}, "Pool")
+
+    requests.labels('/a"b').inc()
+    requests.labels('/a"b').inc(2)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+    connections.inc()
+    connections.inc()
+    connections.dec()
+
+    lines = registry.render().decode().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="/a\\"b"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3" in lines
+    assert "connections 1" in lines
+    assert "pool_size 3" in lines
+    assert not any(line.startswith(("pool_mode", "pool_enabled")) for line in lines)
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+
+    assert registry.counter("hits_total", "Hits") is registry.counter("hits_total", "Hits")
+    with pytest.raises(ValueError):
+        registry.gauge("hits_total", "Hits")
+    with pytest.raises(ValueError):
+        registry.counter("labelled_total", "Labelled", ["route"]).labels()
+
+
+def test_metric_without_children_cannot_be_created():
+    class Summary(Metric):
+        type = "summary"
+
+    with pytest.raises(TypeError):
+        Summary("latency_seconds", "Latency", ["route"])
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_requests():
+    from src.http_protocol.http_protocol import HTTPProtocol
+
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, HEALTH_REQUEST + b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+
+    response = bytes(transport.written).split(b"HTTP/1.1 200 ")[2]
+    assert b"text/plain; version=0.0.4" in response
+    assert b'chat_http_requests_total{route="/health",status="200"}' in response
+    assert b'chat_http_request_duration_seconds_count{route="/health"}' in response
+    assert b"chat_http_requests_in_flight 1" in response
+    protocol.connection_lost(None)
@@ -0,0 +1,136 @@
+import sys
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.partitions.partition_maintainer import PartitionMaintainer, add_months, partition_name
+
+
+class FakeConnection:
+    def __init__(self, now, partitions, locked=True):
+        self.now = now
+        self.partitions = set(partitions)
+        self.detached = set()
+        self.locked = locked
+        self.executed = []
+        # The statements of every transaction, in order.
+        self.transactions = []
+        self._transaction = None
+
+    @asynccontextmanager
+    async def transaction(self):
+        self._transaction = []
+        yield
+        self.transactions.append(self._transaction)
+        self._transaction = None
+
+    async def fetchval(self, query, *args):
+        if "pg_try_advisory_lock" in query:
+            return self.locked
+        return self.now
+
+    async def fetch(self, query, *args):
+        names = self.detached if "relispartition" in query else self.partitions
+        return [{"relname": name} for name in sorted(names)]
+
+    async def execute(self, query, *args):
+        query = " ".join(query.split())
+        self.executed.append(query)
+        if self._transaction is not None:
+            self._transaction.append(query)
+        if "DETACH PARTITION" in query:
+            name = query.rsplit(".", 1)[1]
+            self.partitions.discard(name)
+            self.detached.add(name)
+
+
+class FakeConnector:
+    def __init__(self, connection):
+        self.connection = connection
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.connection
+
+
+def test_add_months_wraps_years():
+    assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name(date(2027, 2, 1)) == "messages_p2027_02"
+
+
+@pytest.mark.asyncio
+async def test_creates_missing_future_partitions():
+    connection = FakeConnection(datetime(2026, 11, 20, 12), ["messages_p2026_11", "messages_p2026_12"])
+    maintainer = PartitionMaintainer(FakeConnector(connection), premake_months=3, interval=0)
+
+    await maintainer.run()
+
+    assert connection.executed == [
+        "CREATE TABLE IF NOT EXISTS awesome_chat.messages_p2027_01 PARTITION OF awesome_chat.messages "
+        "FOR VALUES FROM ('2027-01-01') TO ('2027-02-01')",
+        "CREATE TABLE IF NOT EXISTS awesome_chat.messages_p2027_02 PARTITION OF awesome_chat.messages "
+        "FOR VALUES FROM ('2027-02-01') TO ('2027-03-01')",
+    ]
+    assert maintainer.stats()["created"] == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("action", ["archive", "drop"])
+async def test_retires_partitions_past_retention(action):
+    # With 30 days of retention on 2026-11-20 September has ended long enough ago, October hasn't.
+    partitions = ["messages_p2026_08", "messages_p2026_09", "messages_p2026_10", "messages_p2026_11"]
+    connection = FakeConnection(datetime(2026, 11, 20), partitions)
+    maintainer = PartitionMaintainer(
+        FakeConnector(connection), premake_months=0, retention_days=30, retention_action=action, interval=0
+    )
+
+    await maintainer.run()
+
+    # Each detach commits on its own, the private rows are handled in the transactions after them.
+    assert connection.transactions[1:3] == [
+        ["ALTER TABLE awesome_chat.messages DETACH PARTITION awesome_chat.messages_p2026_08"],
+        ["ALTER TABLE awesome_chat.messages DETACH PARTITION awesome_chat.messages_p2026_09"],
+    ]
+    assert len(connection.transactions) == 5
+    assert all("DETACH PARTITION" not in query for transaction in connection.transactions[3:] for query in transaction)
+    if action == "archive":
+        assert "ALTER TABLE awesome_chat.messages_p2026_09 SET SCHEMA awesome_chat_archive" in connection.executed
+        assert maintainer.stats()["archived"] == 2
+    else:
+        assert "DROP TABLE awesome_chat.messages_p2026_09" in connection.executed
+        assert maintainer.stats()["dropped"] == 2
+
+
+@pytest.mark.asyncio
+async def test_skips_run_while_another_worker_holds_the_lock():
+    connection = FakeConnection(datetime(2026, 11, 20), [], locked=False)
+    maintainer = PartitionMaintainer(FakeConnector(connection), interval=0)
+
+    await maintainer.run()
+
+    assert connection.executed == []
+    assert maintainer.stats()["skipped_runs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_retires_partitions_left_detached_by_a_failed_run():
+    connection = FakeConnection(datetime(2026, 11, 20), ["messages_p2026_11"])
+    connection.detached.add("messages_p2026_08")
+    maintainer = PartitionMaintainer(
+        FakeConnector(connection), premake_months=0, retention_days=30, retention_action="drop", interval=0
+    )
+
+    await maintainer.run()
+
+    assert "DROP TABLE awesome_chat.messages_p2026_08" in connection.executed
+    assert maintainer.stats()["dropped"] == 1
+
+
+def test_rejects_unknown_retention_action():
+    with pytest.raises(ValueError):
+        PartitionMaintainer(FakeConnector(None), retention_action="truncate")
@@ -1,5 +1,6 @@
 import sys
 import json
+import urllib.parse
 from pathlib import Path
 
 import pytest
@@ -10,6 +11,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config.config import settings
 from src.http_protocol.http_protocol import HTTPProtocol
+from src.message_sender.message_sender import MessageLimitReachedError, RecipientNotFoundError
+from src.pubsub.hub import MessageHub
 
 
 # Mock classes for auth_instance and message_sender_instance
@@ -22,11 +25,34 @@ class MockAuth:
 
 
 class MockMessageSender:
-    async def retrieve_messages(self):
-        return ["message1", "message2"]
+    messages = [{"id": 2, "user_id": 1, "text": "message2"}, {"id": 1, "user_id": 1, "text": "message1"}]
 
-    async def retrieve_private_messages(self, user_id, recipient_id):
-        return ["private_message1"] if user_id and recipient_id else []
+    async def retrieve_messages(self, since_id=None, user_id=None):
+        return [message for message in self.messages if since_id is None or message["id"] > since_id]
+
+    async def retrieve_private_messages(self, user_id, recipient_id, since_id=None, before_id=None, limit=None):
+        history = [{"id": message_id, "user_id": user_id, "text": f"private_{message_id}"} for message_id in range(10, 0, -1)]
+        if before_id is not None:
+            history = [message for message in history if message["id"] < before_id]
+        return history[:limit]
+
+    async def is_user_exists(self, user_id):
+        return True
+
+    async def existing_users(self, user_ids):
+        return {user_id for user_id in user_ids if user_id < 100}
+
+    async def retrieve_private_conversations(self, user_id, conversations, limit=None):
+        return {
+            recipient_id: await self.retrieve_private_messages(user_id, recipient_id, since_id=since_id, limit=limit)
+            for recipient_id, since_id in conversations
+        }
+
+    async def send_private_messages(self, user_id, messages):
+        return [
+            RecipientNotFoundError() if recipient_id >= 100 else MessageLimitReachedError() if text == "spam" else 50
+            for recipient_id, text in messages
+        ]
 
     async def insert_message(self, user_id, text):
         return 1  # Mock message ID
@@ -45,9 +71,8 @@ async def test_handle_connect_success():
     await protocol.handle_connect()
 
     protocol.send_response.assert_called_once()
-    response = protocol.send_response.call_args[0][0]
-    assert b'"status": "success"' in response
-    assert b'"user_id": 123' in response
+    response = json.loads(protocol.send_response.call_args[0][0])
+    assert response == {"status": "success", "user_id": 123}
 
 
 @pytest.mark.asyncio
@@ -74,8 +99,7 @@ async def delayed_response(*args, **kwargs):
 @pytest.mark.asyncio
 async def test_handle_request_timeout():
     protocol = HTTPProtocol(MockAuth(), MockMessageSender())
-    protocol.handle_get_request = AsyncMock(side_effect=delayed_response)
-    protocol.handle_post_request = AsyncMock(side_effect=delayed_response)
+    protocol.handle_health = AsyncMock(side_effect=delayed_response)
     protocol.send_error_response = AsyncMock()
 
     # Simulate a GET request
@@ -90,10 +114,343 @@ async def test_handle_request_timeout():
 @pytest.mark.asyncio
 async def test_handle_health():
     protocol = HTTPProtocol(MockAuth(), MockMessageSender())
-    protocol.send_response = AsyncMock()
+    protocol.send_prepared = Mock()
 
     await protocol.handle_health()
 
-    protocol.send_response.assert_called_once()
-    response = protocol.send_response.call_args[0][0]
-    assert b'"status": "OK"' in response
+    protocol.send_prepared.assert_called_once()
+    response = protocol.send_prepared.call_args[0][0]
+    assert json.loads(response.body) == {"status": "OK"}
+
+
+def make_target(target):
+    return urllib.parse.urlparse(target)
+
+
+@pytest.mark.asyncio
+async def test_handle_status_returns_cursor():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    protocol.send_response = Mock()
+
+    await protocol.handle_status(make_target("/status?chat_type=common"), "mock_token")
+
+    response = json.loads(protocol.send_response.call_args[0][0])
+    assert [message["text"] for message in response["messages"]] == ["message2", "message1"]
+    assert response["cursor"] == 2
+
+
+@pytest.mark.asyncio
+async def test_handle_status_since_id_returns_only_newer_messages():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    protocol.send_response = Mock()
+
+    await protocol.handle_status(make_target("/status?chat_type=common&since_id=1"), "mock_token")
+    response = json.loads(protocol.send_response.call_args[0][0])
+    assert [message["id"] for message in response["messages"]] == [2]
+    assert response["cursor"] == 2
+
+    await protocol.handle_status(make_target("/status?chat_type=common&since_id=2"), "mock_token")
+    response = json.loads(protocol.send_response.call_args[0][0])
+    assert response == {"messages": [], "cursor": 2}
+
+
+@pytest.mark.asyncio
+async def test_handle_status_rejects_invalid_since_id():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    protocol.send_error_response = Mock()
+
+    await protocol.handle_status(make_target("/status?chat_type=common&since_id=abc"), "mock_token")
+
+    protocol.send_error_response.assert_called_once_with(settings.error_messages.invalid_parameters)
+
+
+@pytest.mark.asyncio
+async def test_handle_subscribe_streams_published_messages():
+    hub = MessageHub()
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender(), message_hub=hub)
+    protocol.transport = Mock()
+    protocol.transport.is_closing.return_value = False
+    protocol.connection.receive_data(b"GET /subscribe HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    protocol.connection.next_event()
+    protocol.connection.next_event()
+
+    task = asyncio.create_task(protocol.handle_subscribe("mock_token"))
+    await asyncio.sleep(0)
+    protocol._publish(7, 123, "hello", None)
+    await asyncio.sleep(0)
+    protocol.connection_lost(None)
+    await task
+
+    written = b"".join(call.args[0] for call in protocol.transport.write.call_args_list)
+    assert b"text/event-stream" in written
+    assert b'id: 7\nevent: message\ndata: {"id":7,"user_id":123,"text":"hello","chat_type":"common"}' in written
+    assert hub.stats()["subscribers"] == 0
+
+
+@pytest.mark.asyncio
+async def test_handle_status_paginates_private_history(monkeypatch):
+    monkeypatch.setattr(settings, "private_history_max_page_size", 4)
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    protocol.send_response = Mock()
+
+    await protocol.handle_status(make_target("/status?chat_type=private&recipient_id=5&limit=100"), "mock_token")
+    first_page = json.loads(protocol.send_response.call_args[0][0])
+    assert [message["id"] for message in first_page["messages"]] == [10, 9, 8, 7]
+    assert first_page["cursor"] == 10
+    assert first_page["next_cursor"] == 7
+
+    await protocol.handle_status(
+        make_target("/status?chat_type=private&recipient_id=5&limit=3&before_id=3"), "mock_token"
+    )
+    last_page = json.loads(protocol.send_response.call_args[0][0])
+    assert [message["id"] for message in last_page["messages"]] == [2, 1]
+    assert last_page["next_cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_handle_send_batch_reports_every_message():
+    hub = MessageHub()
+    subscription = hub.subscribe(5)
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender(), message_hub=hub)
+    protocol.send_response = Mock()
+    messages = [(5, "hi"), (500, "hi"), (6, "spam")]
+    body = json.dumps({"messages": [{"recipient_id": recipient_id, "text": text} for recipient_id, text in messages]})
+
+    await protocol.handle_send_batch(body.encode(), "mock_token")
+
+    response = json.loads(protocol.send_response.call_args[0][0])
+    assert response["results"] == [
+        {"recipient_id": 5, "status_code": 200, "message_id": 50},
+        {"recipient_id": 500, "status_code": 400, "error": "User has not been found"},
+        {"recipient_id": 6, "status_code": 429, "error": "Message limit reached"},
+    ]
+    assert (await subscription.get())["recipient_id"] == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body", [{"messages": []}, {"messages": {"recipient_id": 5}}, {"messages": [{"recipient_id": "x", "text": "hi"}]}]
+)
+async def test_handle_send_batch_rejects_invalid_batches(body):
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    protocol.send_error_response = Mock()
+
+    await protocol.handle_send_batch(json.dumps(body).encode(), "mock_token")
+
+    protocol.send_error_response.assert_called_once_with(settings.error_messages.invalid_parameters)
+
+
+@pytest.mark.asyncio
+async def test_handle_status_batch_pages_every_conversation(monkeypatch):
+    monkeypatch.setattr(settings, "private_history_max_page_size", 4)
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    protocol.send_response = Mock()
+    body = {"conversations": [{"recipient_id": 5}, {"recipient_id": 500}, {"recipient_id": 6, "since_id": 8}]}
+
+    await protocol.handle_status_batch(json.dumps({**body, "limit": 10}).encode(), "mock_token")
+
+    first, missing, since = json.loads(protocol.send_response.call_args[0][0])["conversations"]
+    assert [message["id"] for message in first["messages"]] == [10, 9, 8, 7]
+    assert (first["recipient_id"], first["cursor"], first["next_cursor"]) == (5, 10, 7)
+    assert missing == {"recipient_id": 500, "status_code": 400, "error": "User has not been found"}
+    assert since["recipient_id"] == 6 and since["cursor"] == 10
+
+
+@pytest.mark.asyncio
+async def test_handle_status_batch_rejects_duplicate_conversations():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    protocol.send_error_response = Mock()
+    body = {"conversations": [{"recipient_id": 5}, {"recipient_id": 5, "since_id": 1}]}
+
+    await protocol.handle_status_batch(json.dumps(body).encode(), "mock_token")
+
+    protocol.send_error_response.assert_called_once_with(settings.error_messages.invalid_parameters)
+
+
+class FakeTransport:
+    def __init__(self):
+        self.written = bytearray()
+        self.closed = False
+        self.reading = True
+
+    def write(self, data):
+        self.written.extend(data)
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        pass
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+
+async def serve_requests(protocol, data):
+    protocol.data_received(data)
+    while protocol.request_task is not None:
+        await protocol.request_task
+
+
+HEALTH_REQUEST = b"GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n"
+STATUS_REQUEST = b"GET /status?chat_type=common HTTP/1.1\r\nHost: localhost\r\nAuthorization: mock_token\r\n\r\n"
+
+
+@pytest.mark.asyncio
+async def test_pipelined_requests_are_answered_in_order_on_one_connection():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, STATUS_REQUEST + HEALTH_REQUEST)
+    await serve_requests(protocol, HEALTH_REQUEST)
+
+    responses = bytes(transport.written).split(b"HTTP/1.1 200 ")
+    assert len(responses) == 4
+    assert b'"cursor":2' in responses[1]
+    assert b'{"status":"OK"}' in responses[2]
+    assert b'{"status":"OK"}' in responses[3]
+    assert not transport.closed
+    protocol.connection_lost(None)
+
+
+@pytest.mark.asyncio
+async def test_connection_closes_after_max_requests(monkeypatch):
+    monkeypatch.setattr(settings, "keep_alive_max_requests", 2)
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, HEALTH_REQUEST + HEALTH_REQUEST + HEALTH_REQUEST)
+
+    responses = bytes(transport.written).split(b"HTTP/1.1 200 ")
+    assert len(responses) == 3
+    assert b"connection: close" not in responses[1]
+    assert b"connection: close" in responses[2]
+    assert transport.closed
+
+
+@pytest.mark.asyncio
+async def test_idle_connection_is_closed(monkeypatch):
+    monkeypatch.setattr(settings, "keep_alive_timeout", 0.01)
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, HEALTH_REQUEST)
+    assert not transport.closed
+    await asyncio.sleep(0.05)
+
+    assert transport.closed
+
+
+@pytest.mark.asyncio
+async def test_unknown_path_gets_not_found_and_keeps_connection():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, b"GET /missing HTTP/1.1\r\nHost: localhost\r\n\r\n" + HEALTH_REQUEST)
+
+    assert bytes(transport.written).startswith(b"HTTP/1.1 404 ")
+    assert b"HTTP/1.1 200 " in transport.written
+    assert not transport.closed
+    protocol.connection_lost(None)
+
+
+@pytest.mark.asyncio
+async def test_oversized_body_is_rejected_before_it_is_read(monkeypatch):
+    monkeypatch.setattr(settings, "max_body_size", 10)
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, b"POST /send HTTP/1.1\r\nHost: localhost\r\nContent-Length: 100\r\n\r\n")
+
+    assert bytes(transport.written).startswith(b"HTTP/1.1 413 ")
+    assert b"connection: close" in transport.written
+    assert transport.closed
+
+
+@pytest.mark.asyncio
+async def test_oversized_headers_are_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "max_header_size", 64)
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, b"GET /health HTTP/1.1\r\nHost: localhost\r\nX-Padding: " + b"a" * 100)
+
+    assert bytes(transport.written).startswith(b"HTTP/1.1 431 ")
+    assert transport.closed
+
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, b"GET /health HTTP/1.1\r\nHost: localhost\r\nX-Padding: " + b"a" * 100 + b"\r\n\r\n")
+
+    assert bytes(transport.written).startswith(b"HTTP/1.1 431 ")
+
+
+@pytest.mark.asyncio
+async def test_reading_pauses_while_client_does_not_read_responses():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    protocol.pause_writing()
+    protocol.data_received(HEALTH_REQUEST + HEALTH_REQUEST)
+    await asyncio.sleep(0.01)
+    assert not transport.reading
+    assert bytes(transport.written).count(b"HTTP/1.1 200 ") == 1
+
+    protocol.resume_writing()
+    while protocol.request_task is not None:
+        await protocol.request_task
+    assert transport.reading
+    assert bytes(transport.written).count(b"HTTP/1.1 200 ") == 2
+    protocol.connection_lost(None)
+
+
+@pytest.mark.asyncio
+async def test_wrong_method_gets_method_not_allowed_with_allow_header():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(protocol, b"DELETE /send HTTP/1.1\r\nHost: localhost\r\n\r\n" + HEALTH_REQUEST)
+
+    assert bytes(transport.written).startswith(b"HTTP/1.1 405 ")
+    assert b"Allow: POST\r\n" in transport.written
+    assert b"HTTP/1.1 200 " in transport.written
+    protocol.connection_lost(None)
+
+
+@pytest.mark.asyncio
+async def test_head_requests_get_the_response_head_only():
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender())
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+
+    await serve_requests(
+        protocol,
+        b"HEAD /health HTTP/1.1\r\nHost: localhost\r\n\r\n"
+        + b"HEAD /missing HTTP/1.1\r\nHost: localhost\r\n\r\n"
+        + b"HEAD /send HTTP/1.1\r\nHost: localhost\r\n\r\n"
+        + HEALTH_REQUEST,
+    )
+
+    head_ok, not_found, not_allowed, health = bytes(transport.written).split(b"HTTP/1.1 ")[1:]
+    assert head_ok.startswith(b"200 ") and head_ok.endswith(b"\r\n\r\n")
+    assert not_found.startswith(b"404 ") and not_found.endswith(b"\r\n\r\n")
+    assert not_allowed.startswith(b"405 ") and b"Allow: POST\r\n" in not_allowed
+    assert health.endswith(b'{"status":"OK"}')
+    assert not transport.closed
+    protocol.connection_lost(None)
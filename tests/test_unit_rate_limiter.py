@@ -0,0 +1,77 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db_connector.statements import STATEMENTS
+from src.rate_limiter import rate_limiter as rate_limiter_module
+from src.rate_limiter.rate_limiter import InMemoryRateLimiter, PostgresRateLimiter
+
+
+class MockDB:
+    def __init__(self, fetchval_result=1):
+        self.executed = []
+        self.fetchval_result = fetchval_result
+
+    async def run(self, method, name, *args, **kwargs):
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def execute(self, query, *args):
+        self.executed.append(args)
+
+    async def fetchval(self, query, *args):
+        return self.fetchval_result
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sends_never_exceed_limit():
+    limiter = InMemoryRateLimiter(max_messages=20)
+
+    results = await asyncio.gather(*(limiter.try_acquire(1) for _ in range(50)))
+
+    assert results.count(True) == 20
+    assert await limiter.try_acquire(2)
+
+
+@pytest.mark.asyncio
+async def test_window_slides(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limiter_module.time, "time", lambda: now[0])
+    limiter = InMemoryRateLimiter(max_messages=2, window_seconds=60)
+
+    assert await limiter.try_acquire(1)
+    now[0] += 30
+    assert await limiter.try_acquire(1)
+    assert not await limiter.try_acquire(1)
+    now[0] += 31
+    assert await limiter.try_acquire(1)
+    assert not await limiter.try_acquire(1)
+
+
+@pytest.mark.asyncio
+async def test_flush_upserts_dirty_users_in_batches():
+    db = MockDB()
+    limiter = InMemoryRateLimiter(max_messages=5, db_connector=db, flush_batch_size=2)
+    for user_id in (1, 2, 3):
+        await limiter.try_acquire(user_id)
+    await limiter.try_acquire(1)
+
+    await limiter.flush()
+
+    assert len(db.executed) == 2
+    flushed = {}
+    for user_ids, counts, reset_times in db.executed:
+        flushed.update(zip(user_ids, counts))
+    assert flushed == {1: 2, 2: 1, 3: 1}
+
+    await limiter.flush()
+    assert len(db.executed) == 2
+
+
+@pytest.mark.asyncio
+async def test_postgres_limiter_rejects_when_upsert_returns_nothing():
+    assert await PostgresRateLimiter(MockDB(fetchval_result=3), max_messages=20).try_acquire(1)
+    assert not await PostgresRateLimiter(MockDB(fetchval_result=None), max_messages=20).try_acquire(1)
@@ -0,0 +1,41 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.http_protocol.http_protocol import HTTPProtocol
+from src.http_protocol.reaper import ConnectionReaper
+from test_unit_protocol import FakeTransport, HEALTH_REQUEST, MockAuth, MockMessageSender, serve_requests
+
+
+def open_connection(reaper):
+    protocol = HTTPProtocol(MockAuth(), MockMessageSender(), connection_reaper=reaper)
+    transport = FakeTransport()
+    protocol.connection_made(transport)
+    return protocol, transport
+
+
+@pytest.mark.asyncio
+async def test_reaper_closes_connections_with_incomplete_request_head():
+    reaper = ConnectionReaper(header_timeout=5)
+    stalled, stalled_transport = open_connection(reaper)
+    served, served_transport = open_connection(reaper)
+    idle, idle_transport = open_connection(reaper)
+
+    stalled.data_received(b"GET /health HTTP/1.1\r\nHost: loc")
+    await serve_requests(served, HEALTH_REQUEST)
+
+    assert reaper.sweep(time.monotonic() + 1) == 0
+    assert reaper.sweep(time.monotonic() + 6) == 1
+
+    assert stalled_transport.closed
+    assert not served_transport.closed
+    assert not idle_transport.closed
+    assert reaper.stats() == {"connections": 2, "reaped": 1, "sweeps": 2}
+
+    served.connection_lost(None)
+    idle.connection_lost(None)
+    assert reaper.stats()["connections"] == 0
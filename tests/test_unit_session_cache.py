@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.auth import session_cache as session_cache_module
+from src.auth.auth_simple import Auth
+from src.auth.session_cache import SessionCache
+from src.db_connector.statements import STATEMENTS
+from src.storage.postgres_storage import PostgresStorage
+
+
+class MockDB:
+    def __init__(self):
+        self.sessions = {"token_1": 1, "token_2": 2}
+        self.fetchrow_calls = 0
+
+    async def run(self, method, name, *args, **kwargs):
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def fetchrow(self, query, token):
+        self.fetchrow_calls += 1
+        user_id = self.sessions.get(token)
+        return {"user_id": user_id} if user_id is not None else None
+
+    async def execute(self, query, value):
+        if isinstance(value, str):
+            self.sessions.pop(value, None)
+        else:
+            self.sessions = {token: user_id for token, user_id in self.sessions.items() if user_id != value}
+
+
+def test_cache_evicts_least_recently_used():
+    cache = SessionCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+
+def test_cache_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(session_cache_module.time, "monotonic", lambda: now[0])
+    cache = SessionCache(max_size=10, ttl=5)
+    cache.set("a", 1)
+
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_auth_serves_repeated_lookups_from_cache():
+    db = MockDB()
+    auth = Auth(PostgresStorage(db), session_cache=SessionCache())
+
+    assert await auth.get_user_id_from_token("token_1") == 1
+    assert await auth.get_user_id_from_token("token_1") == 1
+    assert await auth.get_user_id_from_token("unknown") is None
+    assert await auth.get_user_id_from_token("unknown") is None
+
+    assert db.fetchrow_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_deactivated_session_is_invalidated():
+    db = MockDB()
+    auth = Auth(PostgresStorage(db), session_cache=SessionCache())
+    assert await auth.get_user_id_from_token("token_1") == 1
+    assert await auth.get_user_id_from_token("token_2") == 2
+
+    await auth.deactivate_session("token_1")
+    await auth.deactivate_user_sessions(2)
+
+    assert await auth.get_user_id_from_token("token_1") is None
+    assert await auth.get_user_id_from_token("token_2") is None
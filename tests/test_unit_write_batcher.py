@@ -0,0 +1,69 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.db_connector.statements import STATEMENTS
+from src.message_sender.write_batcher import MessageWriteBatcher
+
+
+class MockDB:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.next_id = 100
+        self.fail = fail
+
+    async def run(self, method, name, *args, **kwargs):
+        return await getattr(self, method)(STATEMENTS[name], *args, **kwargs)
+
+    async def fetch(self, query, user_ids, texts):
+        if self.fail:
+            raise OSError("connection lost")
+        self.batches.append(list(zip(user_ids, texts)))
+        # Postgres doesn't promise RETURNING order, the batcher has to sort.
+        ids = list(range(self.next_id, self.next_id + len(user_ids)))
+        self.next_id += len(user_ids)
+        return [{"id": message_id} for message_id in reversed(ids)]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inserts_share_one_statement():
+    db = MockDB()
+    batcher = MessageWriteBatcher(db, max_batch_size=10, max_wait=0.01)
+    await batcher.start()
+
+    message_ids = await asyncio.gather(*(batcher.insert(user_id, f"text {user_id}") for user_id in range(5)))
+    await batcher.close()
+
+    assert message_ids == [100, 101, 102, 103, 104]
+    assert db.batches == [[(user_id, f"text {user_id}") for user_id in range(5)]]
+    assert batcher.stats()["average_fill"] == 5
+    assert batcher.stats()["fill_ratio"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_written_without_waiting():
+    db = MockDB()
+    batcher = MessageWriteBatcher(db, max_batch_size=3, max_wait=10)
+    await batcher.start()
+
+    message_ids = await asyncio.wait_for(asyncio.gather(*(batcher.insert(1, "x") for _ in range(6))), timeout=1)
+    await batcher.close()
+
+    assert message_ids == list(range(100, 106))
+    assert [len(batch) for batch in db.batches] == [3, 3]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_fails_every_caller():
+    batcher = MessageWriteBatcher(MockDB(fail=True), max_batch_size=10, max_wait=0.001)
+    await batcher.start()
+
+    results = await asyncio.gather(batcher.insert(1, "a"), batcher.insert(2, "b"), return_exceptions=True)
+    await batcher.close()
+
+    assert all(isinstance(result, OSError) for result in results)
+    assert batcher.stats()["failed_batches"] == 1